@@ -0,0 +1,375 @@
+"""
+Headless batch tool for project files.
+
+Works on many project JSON files at once, without opening the interface.
+The files are loaded with the same import logic as the application and
+processed in parallel; one result per file is streamed to stdout or to
+--output as soon as it is ready.
+
+    python batch.py validate archive/
+    python batch.py summary archive/ --format csv --output bilan.csv
+    python batch.py convert archive/ --to json --output-dir normalises/
+    python batch.py preview archive/ --output-dir plans/
+    python batch.py report archive/ --output-dir rapports/
+    python batch.py route archive/ --output-dir gaines/
+    python batch.py check archive/ --format csv
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from collections import Counter
+from multiprocessing import Pool
+
+from controller.controller import load_project
+from model.schema import ProjectValidationError
+from model.ventilation import collect_summary_data, compute_summary, VENT_TYPE_NAMES
+from model.duct_network import project_networks
+from model.duct_routing import routed_networks, path_length
+from model.geometry_check import ZERO_LENGTH, DUPLICATE, CROSSING, GAP, ORPHAN_OPENING, VENT_OUTSIDE
+from view import plan_renderer, cad_export, report
+
+
+def find_project_files(paths):
+    """Expand directories into the JSON files they contain (recursively)"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _dirs, names in os.walk(path):
+                files.extend(os.path.join(root, n) for n in sorted(names) if n.endswith(".json"))
+        else:
+            files.append(path)
+    return files
+
+
+def output_names(files):
+    """
+    Base name of the output files of each project: its file name, or its
+    path relative to the common directory (separators as "_") when several
+    projects share a file name, so no output overwrites another.
+    """
+    bases = [os.path.splitext(os.path.basename(path))[0] for path in files]
+    counts = Counter(bases)
+    root = os.path.commonpath([os.path.abspath(os.path.dirname(path)) for path in files]) if files else ""
+    names, used = {}, set()
+    for path, base in zip(files, bases):
+        if counts[base] > 1:
+            relative = os.path.relpath(os.path.splitext(os.path.abspath(path))[0], root)
+            base = relative.replace(os.sep, "_")
+        name, suffix = base, 2
+        while name in used:
+            name, suffix = f"{base}-{suffix}", suffix + 1
+        used.add(name)
+        names[path] = name
+    return names
+
+
+def _output_base(path, options):
+    return options.get("name") or os.path.splitext(os.path.basename(path))[0]
+
+
+# ------------------------------------------------------------------------------------
+# Tasks, run in the worker processes. Each one gets (path, options) and returns a dict.
+# options["processes"] is the pool the task may use for the floors of its project:
+# 1 inside a worker, --jobs when a single project is processed (see process()).
+# ------------------------------------------------------------------------------------
+
+def _validate_task(path, floors, options):
+    return {
+        "floors": len(floors),
+        "walls": sum(len(f.walls) for f in floors),
+        "vents": sum(len(f.vents) for f in floors),
+        "plenums": sum(len(f.plenums) for f in floors),
+    }
+
+
+def _summary_task(path, floors, options):
+    summary = compute_summary(collect_summary_data(floors))
+    result = {
+        "floors": len(floors),
+        "total_vents": summary["total_vents"],
+        "total_inflow": summary["total_inflow"],
+        "total_outflow": summary["total_outflow"],
+        "plenum_simple_count": summary["plenum_simple_count"],
+        "plenum_double_count": summary["plenum_double_count"],
+        "plenum_total_area": round(summary["plenum_total_area"], 2),
+        "rah": round(summary["rah"], 2) if summary["rah"] is not None else "",
+        "rah_compliant": summary["rah_compliant"],
+    }
+    for function, count in summary["category_counts"].items():
+        result[f"count_{function}"] = count
+    checks = [floor.ventilation_check() for floor in floors]
+    result["under_ventilated_rooms"] = sum(len(check.under_ventilated) for check in checks)
+    result["regulation_compliant"] = all(check.compliant for check in checks)
+    networks = project_networks(floors)
+    result["fan_pressure"] = round(max((n.fan_pressure for n in networks), default=0.0), 1)
+    result["plenum_capacity_ok"] = all(n.fan_capacity_ok for n in networks)
+    return result
+
+
+def _convert_json(floors, out_path):
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump([floor.to_dict() for floor in floors], f, indent=4, ensure_ascii=False)
+
+
+def _convert_pdf(floors, out_path):
+    # Already inside a pool worker: render the floors in this process
+    plan_renderer.export_pdf(floors, out_path, processes=1)
+
+
+# Output format -> (file extension, writer(floors, out_path))
+CONVERTERS = {
+    "json": (".json", _convert_json),
+    "pdf": (".pdf", _convert_pdf),
+    "svg": (".svg", cad_export.export_svg),
+    "dxf": (".dxf", cad_export.export_dxf),
+}
+
+
+def _convert_task(path, floors, options):
+    extension, writer = CONVERTERS[options["to"]]
+    base = _output_base(path, options)
+    out_path = os.path.join(options["output_dir"], base + extension)
+    writer(floors, out_path)
+    return {"output": out_path}
+
+
+def _preview_task(path, floors, options):
+    base = _output_base(path, options)
+    paths = plan_renderer.export_png(floors, options["output_dir"], prefix=f"{base}_",
+                                     scale=options["scale"], processes=options.get("processes", 1))
+    return {"images": len(paths)}
+
+
+def _report_task(path, floors, options):
+    base = _output_base(path, options)
+    out_path = os.path.join(options["output_dir"], f"{base}_rapport.pdf")
+    report.export_report(floors, out_path, project_name=base, plans=options["plans"],
+                         processes=options.get("processes", 1))
+    return {"output": out_path}
+
+
+def _route_task(path, floors, options):
+    networks, routes = routed_networks(floors, processes=options.get("processes", 1))
+    result = {
+        "branches": len(routes),
+        "unrouted": sum(1 for route in routes.values() if route is None),
+        "duct_length": round(sum(path_length(route) for route in routes.values() if route), 1),
+        "fan_pressure": round(max((n.fan_pressure for n in networks), default=0.0), 1),
+    }
+    if options["output_dir"]:
+        base = _output_base(path, options)
+        out_path = os.path.join(options["output_dir"], f"{base}_gaines.json")
+        with open(out_path, "w", encoding="utf-8") as f:
+            # Vent IDs only live for the session: name the vents by floor, name and position
+            json.dump([{"floor": floor.name, "vent": vent.name, "position": vent.start,
+                        "path": routes[vent.id]}
+                       for floor in floors for vent in floor.vents if vent.id in routes],
+                      f, ensure_ascii=False)
+        result["output"] = out_path
+    return result
+
+
+GEOMETRY_KINDS = (ZERO_LENGTH, DUPLICATE, CROSSING, GAP, ORPHAN_OPENING, VENT_OUTSIDE)
+
+
+def _check_task(path, floors, options):
+    # A plan with geometry problems fails, so the exit code can gate a CI job
+    issues = [(floor, issue) for floor in floors for issue in floor.geometry_check()]
+    result = {kind: sum(1 for _floor, issue in issues if issue.kind == kind) for kind in GEOMETRY_KINDS}
+    if issues:
+        result["status"] = "invalid"
+        result["issues"] = [f"{floor.name}: {issue.message}" for floor, issue in issues]
+    return result
+
+
+TASKS = {
+    "validate": _validate_task,
+    "summary": _summary_task,
+    "convert": _convert_task,
+    "preview": _preview_task,
+    "report": _report_task,
+    "route": _route_task,
+    "check": _check_task,
+}
+
+# Columns of the CSV output for each command (after "file", "status" and "issues")
+COLUMNS = {
+    "validate": ["floors", "walls", "vents", "plenums"],
+    "summary": ["floors", "total_vents"]
+               + [f"count_{function}" for function in VENT_TYPE_NAMES]
+               + ["total_inflow", "total_outflow", "plenum_simple_count", "plenum_double_count",
+                  "plenum_total_area", "rah", "rah_compliant",
+                  "under_ventilated_rooms", "regulation_compliant",
+                  "fan_pressure", "plenum_capacity_ok"],
+    "convert": ["output"],
+    "preview": ["images"],
+    "report": ["output"],
+    "route": ["branches", "unrouted", "duct_length", "fan_pressure", "output"],
+    "check": list(GEOMETRY_KINDS),
+}
+
+
+def run_task(job):
+    """Load one project and run the requested task on it (worker entry point)"""
+    command, path, options = job
+    result = {"file": path, "status": "ok", "issues": []}
+    try:
+        floors = load_project(path)
+        result.update(TASKS[command](path, floors, options))
+    except ProjectValidationError as e:
+        result["status"] = "invalid"
+        result["issues"] = e.issues
+    except Exception as e:
+        result["status"] = "error"
+        result["issues"] = [f"{type(e).__name__}: {e}"]
+    return result
+
+
+# ------------------------------------------------------------------------------------
+# Result streaming
+# ------------------------------------------------------------------------------------
+
+class CsvResultWriter:
+    def __init__(self, stream, columns):
+        self.stream = stream
+        self.writer = csv.DictWriter(stream, fieldnames=["file", "status", "issues"] + columns,
+                                     extrasaction="ignore")
+        self.writer.writeheader()
+
+    def write(self, result):
+        row = dict(result)
+        row["issues"] = " | ".join(result["issues"])
+        self.writer.writerow(row)
+        self.stream.flush()
+
+    def close(self):
+        pass
+
+
+class JsonResultWriter:
+    """Writes a JSON array one element at a time"""
+
+    def __init__(self, stream, columns):
+        self.stream = stream
+        self.count = 0
+        self.stream.write("[\n")
+
+    def write(self, result):
+        if self.count:
+            self.stream.write(",\n")
+        self.stream.write("    " + json.dumps(result, ensure_ascii=False))
+        self.stream.flush()
+        self.count += 1
+
+    def close(self):
+        self.stream.write("\n]\n")
+
+
+WRITERS = {"csv": CsvResultWriter, "json": JsonResultWriter}
+
+
+def process(command, files, options, output, fmt="json", jobs=None, quiet=False):
+    """
+    Run a command on every file with a process pool, streaming results to output.
+
+    A single file is processed in this process instead, and the pool goes
+    to its floors (routing, rendering), which are independent.
+
+    Returns:
+        int: number of files that were not processed successfully
+    """
+    writer = WRITERS[fmt](output, COLUMNS[command])
+    failures = 0
+    names = output_names(files)
+    job_list = [(command, path, dict(options, name=names[path], processes=1)) for path in files]
+
+    def write(done, result):
+        nonlocal failures
+        writer.write(result)
+        if result["status"] != "ok":
+            failures += 1
+        if not quiet:
+            print(f"[{done}/{len(files)}] {result['status']:7} {result['file']}", file=sys.stderr)
+
+    if len(job_list) == 1:
+        command, path, job_options = job_list[0]
+        write(1, run_task((command, path, dict(job_options, processes=jobs))))
+    else:
+        with Pool(processes=jobs) as pool:
+            for done, result in enumerate(pool.imap_unordered(run_task, job_list, chunksize=4), 1):
+                write(done, result)
+
+    writer.close()
+    return failures
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Traitement par lots de projets VMC")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="nombre de processus (par défaut : nombre de coeurs)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="ne pas afficher la progression")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for command, help_text in (("validate", "valider les fichiers"),
+                               ("summary", "calculer le bilan aéraulique"),
+                               ("convert", "convertir les projets"),
+                               ("preview", "générer les plans des étages en PNG"),
+                               ("report", "générer les rapports PDF de ventilation"),
+                               ("route", "tracer les gaines du plénum aux bouches"),
+                               ("check", "vérifier la géométrie des plans")):
+        sub = subparsers.add_parser(command, help=help_text)
+        sub.add_argument("paths", nargs="+", help="fichiers JSON ou dossiers")
+        sub.add_argument("--format", choices=sorted(WRITERS), default="json",
+                         help="format des résultats (json ou csv)")
+        sub.add_argument("-o", "--output", help="fichier de résultats (par défaut : sortie standard)")
+        if command == "convert":
+            sub.add_argument("--to", choices=sorted(CONVERTERS), default="json", help="format cible")
+            sub.add_argument("--output-dir", default=".", help="dossier des fichiers convertis")
+        if command == "preview":
+            sub.add_argument("--output-dir", default=".", help="dossier des images")
+            sub.add_argument("--scale", type=float, default=1.0, help="échelle des images")
+        if command == "report":
+            sub.add_argument("--output-dir", default=".", help="dossier des rapports")
+            sub.add_argument("--no-plans", action="store_true", help="ne pas inclure les plans des étages")
+        if command == "route":
+            sub.add_argument("--output-dir", default=None, help="dossier des tracés (JSON par projet)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    files = find_project_files(args.paths)
+    if not files:
+        print("Aucun fichier projet trouvé", file=sys.stderr)
+        return 1
+
+    options = {}
+    if args.command == "convert":
+        os.makedirs(args.output_dir, exist_ok=True)
+        options = {"to": args.to, "output_dir": args.output_dir}
+    elif args.command == "preview":
+        os.makedirs(args.output_dir, exist_ok=True)
+        options = {"output_dir": args.output_dir, "scale": args.scale}
+    elif args.command == "report":
+        os.makedirs(args.output_dir, exist_ok=True)
+        options = {"output_dir": args.output_dir, "plans": not args.no_plans}
+    elif args.command == "route":
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+        options = {"output_dir": args.output_dir}
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as output:
+            failures = process(args.command, files, options, output, args.format, args.jobs, args.quiet)
+    else:
+        failures = process(args.command, files, options, sys.stdout, args.format, args.jobs, args.quiet)
+
+    if not args.quiet:
+        print(f"{len(files) - failures}/{len(files)} fichier(s) traité(s) sans erreur", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
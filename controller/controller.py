@@ -1,14 +1,56 @@
-import os, json, math
+import os, json, math, threading
+from contextlib import contextmanager
 from datetime import datetime
-from PIL import Image, ImageDraw
 from ivy.ivy_bus import ivy_bus
 from model.wall import Wall
-from model.floor import Floor
+from model.floor import Floor, kind_of, copy_object
 from model.window import Window
 from model.door import Door
 from model.vent import Vent
 from model.plenum import Plenum
-from tkinter import simpledialog
+from model.selection import (object_points, transform_points, selection_center, ROTATE_CLOCKWISE,
+                             ROTATE_COUNTERCLOCKWISE, MIRROR_HORIZONTAL, MIRROR_VERTICAL)
+from model.schema import load_project_file, ProjectValidationError
+from model.ventilation import collect_summary_data, floor_regulation, VentilationStats
+from model.vent_import import read_vent_csv, repeat_vents
+from model.geometry_check import ORPHAN_OPENING
+from model.units import PIXELS_PER_METER
+from controller.history import History, FLOOR_INSERTED, FLOOR_REMOVED
+
+
+# Most floors shown as ghost layers on each side of the selected floor
+MAX_ONION_SKIN_LEVELS = 5
+
+# Drawing order of the objects in a batched View update, as when a floor is shown
+DRAW_ORDER = {"wall": 0, "window": 1, "door": 2, "vent": 3, "plenum": 4}
+
+
+def load_project(json_path):
+    """
+    Load a project file into Floor objects.
+
+    Raises:
+        ProjectValidationError: listing every problem found in the file
+    """
+    floors = [Floor.from_dict(f_dict) for f_dict in load_project_file(json_path)]
+    # Snap near-duplicate coordinates and merge wall fragments
+    for floor in floors:
+        floor.normalize_walls()
+    return floors
+
+
+def _write_project(snapshots, json_file_path):
+    """Write FloorSnapshots to a project file (runs in the save thread)"""
+    try:
+        with open(json_file_path, "w", encoding="utf-8") as f:
+            json.dump([snapshot.to_dict() for snapshot in snapshots], f, indent=4, ensure_ascii=False)
+    except OSError as e:
+        print(f"[Controller] Saving to {json_file_path} failed: {e}")
+        return
+
+    # Success alert removed for a cleaner experience
+    print(f"[Controller] Project saved to: {json_file_path}")
+
 
 class Controller:
     def __init__(self):
@@ -17,9 +59,22 @@ class Controller:
         self.current_tool = 'select'
         self.floor_count = 0
 
+        # Objects of the selected floor picked with the select tool
+        self.selection = []
+        # Copies of the objects of the last copy, pasted on any floor
+        self.clipboard = []
+        # Object events held back by _batched_view_update()
+        self._view_batch = None
+
+        # Running ventilation totals of the project, fed by the floors' own totals
+        self.stats = VentilationStats()
+
+        # Undo/redo of the edits, see history.py
+        self.history = History(self._insert_floor, self._remove_floor)
+
         # Create default Floor 0
         default_floor = Floor("Etage 0")
-        self.floors.append(default_floor)
+        self._set_floors([default_floor])
         self.selected_floor_index = 0
 
         # Subscribe the events that UI has published
@@ -44,12 +99,15 @@ class Controller:
         ivy_bus.subscribe("set_floor_height_request", self.handle_set_floor_height_request)
         ivy_bus.subscribe("delete_floor_request", self.handle_delete_floor_request)
         ivy_bus.subscribe("onion_skin_preview_request", self.handle_onion_skin_preview_request)
+        ivy_bus.subscribe("onion_skin_settings_request", self.handle_onion_skin_settings_request)
 
         ivy_bus.subscribe("save_project_request", self.handle_save_project_request)
         ivy_bus.subscribe("import_project_request", self.handle_import_project_request)
         
         # Add a handler for ventilation summary requests
         ivy_bus.subscribe("get_ventilation_summary_request", self.handle_get_ventilation_summary_request)
+        ivy_bus.subscribe("regulation_summary_request", self.handle_regulation_summary_request)
+        ivy_bus.subscribe("export_report_request", self.handle_export_report_request)
         
         # Add a handler for reset application requests
         ivy_bus.subscribe("reset_app_request", self.handle_reset_app_request)
@@ -59,6 +117,19 @@ class Controller:
         # Add a handler for floor duplication
         ivy_bus.subscribe("duplicate_floor_request", self.handle_duplicate_floor_request)
 
+        ivy_bus.subscribe("undo_request", self.handle_undo_request)
+        ivy_bus.subscribe("redo_request", self.handle_redo_request)
+
+        ivy_bus.subscribe("select_request", self.handle_select_request)
+        ivy_bus.subscribe("selection_transform_request", self.handle_selection_transform_request)
+        ivy_bus.subscribe("selection_delete_request", self.handle_selection_delete_request)
+        ivy_bus.subscribe("copy_selection_request", self.handle_copy_selection_request)
+        ivy_bus.subscribe("paste_request", self.handle_paste_request)
+        ivy_bus.subscribe("import_vents_request", self.handle_import_vents_request)
+        ivy_bus.subscribe("replicate_vents_request", self.handle_replicate_vents_request)
+        ivy_bus.subscribe("check_geometry_request", self.handle_check_geometry_request)
+        ivy_bus.subscribe("snap_settings_request", self.handle_snap_settings_request)
+
         self.wall_start_point = None
         self.is_canceled_wall_draw = False
 
@@ -78,14 +149,133 @@ class Controller:
         self.temp_vent_role  = None
         self.temp_vent_color = None
 
+        # The plenum object being created, and whether the project has its plenum
         self.the_plenum = None
+        self.plenum_exists = False
+
+        # Ghost layers: floors shown below and above the selected one
+        self.onion_skin_below = 1
+        self.onion_skin_above = 0
+
+        # Grid snapping is opt-in, the plan targets are always on
+        self.snap_to_grid = False
+
+        # Background save in progress, see handle_save_project_request()
+        self._save_thread = None
 
         # Initialize floor height
         self._publish_height(default_floor)
 
+    def _set_floors(self, floors):
+        """Replace all floors, and the project totals with theirs. The history starts over."""
+        for floor in self.floors:
+            floor.stats.detach()
+            floor.remove_observer(self.history.record)
+            floor.remove_observer(self._publish_floor_change)
+        self.floors = floors
+        for floor in floors:
+            floor.stats.attach(self.stats)
+            floor.add_observer(self.history.record)
+            floor.add_observer(self._publish_floor_change)
+        self.history.clear()
+
+    def _insert_floor(self, index, floor):
+        """Put a floor in the project, its figures in the totals and its edits in the history"""
+        self.floors.insert(index, floor)
+        floor.stats.attach(self.stats)
+        floor.add_observer(self.history.record)
+        floor.add_observer(self._publish_floor_change)
+
+    def _remove_floor(self, index):
+        floor = self.floors.pop(index)
+        floor.stats.detach()
+        floor.remove_observer(self.history.record)
+        floor.remove_observer(self._publish_floor_change)
+        return floor
+
+    def _publish_floor_change(self, floor, change, obj, details):
+        """
+        Floor observer: tell the View about each object added, removed or
+        moved on the selected floor, so it only redraws that object.
+        """
+        if obj is None or self.selected_floor_index is None:
+            return
+        if not (0 <= self.selected_floor_index < len(self.floors)) or self.floors[self.selected_floor_index] is not floor:
+            return
+        if self._view_batch is not None:
+            self._batch_change(obj, change)
+            return
+        self._publish_object_event(obj.id, change, obj)
+
+    def _publish_object_event(self, obj_id, change, obj):
+        if change == "removed":
+            ivy_bus.publish("object_removed", {"id": obj_id})
+        else:
+            kind, data = self._object_data(obj)
+            ivy_bus.publish("object_added" if change == "added" else "object_changed", dict(data, kind=kind))
+
+    def _batch_change(self, obj, change):
+        """
+        Fold a change into the held back events: an object added then removed
+        in the same block was never drawn, one removed then added back changed.
+        """
+        previous = self._view_batch.get(obj.id, (None, None))[0]
+        if previous == "added":
+            if change == "removed":
+                del self._view_batch[obj.id]
+                return
+            change = "added"
+        elif previous is not None and change != "removed":
+            change = "changed"
+        self._view_batch[obj.id] = (change, obj)
+
+    @contextmanager
+    def _batched_view_update(self):
+        """
+        Collect the object events of the selected floor made inside the block.
+        A single object is sent as its own event; more are sent as one
+        objects_update message: the ids of the removed objects and the draw
+        data of the others, in drawing order.
+        """
+        if self._view_batch is not None:
+            yield
+            return
+        self._view_batch = {}
+        try:
+            yield
+        finally:
+            batch, self._view_batch = self._view_batch, None
+            if len(batch) == 1:
+                (obj_id, (change, obj)), = batch.items()
+                self._publish_object_event(obj_id, change, obj)
+            elif batch:
+                drawn = sorted((dict(data, kind=kind) for kind, data in
+                                (self._object_data(obj) for change, obj in batch.values() if change != "removed")),
+                               key=lambda data: DRAW_ORDER[data["kind"]])
+                ivy_bus.publish("objects_update", {
+                    "removed": [obj_id for obj_id, (change, _obj) in batch.items() if change == "removed"],
+                    "drawn": drawn,
+                })
+
     def attach_view(self,view):
         self.view = view
 
+    def _snap(self, x, y):
+        """
+        Cursor point snapped to the plan of the selected floor (see
+        model/snapping.py); the View shows where it snapped.
+        """
+        snap = self.floors[self.selected_floor_index].snap_index().snap((x, y), grid=self.snap_to_grid)
+        if snap is None:
+            ivy_bus.publish("snap_indicator_update", {})
+            return x, y
+        ivy_bus.publish("snap_indicator_update", {"point": snap.point, "kind": snap.kind})
+        return snap.point
+
+    def handle_snap_settings_request(self, data):
+        """Switch snapping to the 0.5 m grid on or off"""
+        self.snap_to_grid = bool(data.get("grid", self.snap_to_grid))
+
     def handle_draw_wall_request(self, data):
         x, y = data.get("x"), data.get("y")
         is_click = data.get("is_click", False)
@@ -93,6 +283,7 @@ class Controller:
 
         if self.selected_floor_index is None or self.current_tool!='wall':
             return
+        x, y = self._snap(x, y)
 
         if is_click:
             if self.wall_start_point is None:
@@ -104,34 +295,14 @@ class Controller:
                 wall_obj = Wall(start, end)
 
                 current_floor = self.floors[self.selected_floor_index]
-                current_floor.add_wall(wall_obj)
+                with self._batched_view_update(), self.history.step("Mur"):
+                    current_floor.add_wall(wall_obj)
+                    current_floor.normalize_walls(around=[wall_obj])
                 print(f"in floor {current_floor.name} create wall : {wall_obj}")
 
-                ivy_bus.publish("draw_wall_update", {
-                    "start": wall_obj.start,
-                    "end":   wall_obj.end,
-                    "fill":  "black",
-                })
-
+                # The View got the new wall, and the walls it was merged with, from the floor events
                 self.wall_start_point = None
 
-                # If this is the floor below the current selected floor,
-                # update the onion skin in the floor above
-                if len(self.floors) > self.selected_floor_index + 1:
-                    # Save current floor index
-                    current_idx = self.selected_floor_index
-                    # Temporarily set selected floor to the one above
-                    self.selected_floor_index = current_idx + 1
-                    # Send onion skin update
-                    self._send_onion_skin_preview()
-                    # Restore current floor index
-                    self.selected_floor_index = current_idx
-
-                # Also refresh the onion skin of the current floor if we're above floor 0
-                # Not using elif so both conditions can be true for middle floors
-                if self.selected_floor_index > 0:
-                    self._send_onion_skin_preview()
-
         elif is_preview:
             if self.wall_start_point is not None:
                 start = self.wall_start_point
@@ -152,6 +323,7 @@ class Controller:
     def handle_cancal_to_draw_wall_request(self,data):
         self.is_canceled_wall_draw = True
         self.wall_start_point = None
+        ivy_bus.publish("snap_indicator_update", {})
 
         ivy_bus.publish("draw_wall_update",{
             "start": (0, 0), "end": (0, 0), "fill": "gray"
@@ -164,6 +336,7 @@ class Controller:
 
         if self.selected_floor_index is None or self.current_tool!='window':
             return
+        x, y = self._snap(x, y)
 
         if is_click:
             if self.window_start_point is None:
@@ -172,100 +345,27 @@ class Controller:
                 start = self.window_start_point
                 end   = (x, y)
 
-                # Check if window overlaps with any wall and modify the wall
-                wall_modified, aligned_start, aligned_end = self._check_wall_overlap(start, end, is_window=True)
-                
-                # Create window with aligned coordinates if a wall was modified
-                if wall_modified:
-                    window_obj = Window(aligned_start, aligned_end, thickness=5)
-                else:
-                    window_obj = Window(start, end, thickness=5)
-
                 current_floor = self.floors[self.selected_floor_index]
-                current_floor.add_window(window_obj)
+                # The wall split and the window are undone together
+                with self._batched_view_update(), self.history.step("Fenêtre"):
+                    # Check if window overlaps with any wall and modify the wall
+                    wall_modified, aligned_start, aligned_end = self._check_wall_overlap(start, end, is_window=True)
+
+                    # Create window with aligned coordinates if a wall was modified
+                    if wall_modified:
+                        window_obj = Window(aligned_start, aligned_end, thickness=5)
+                    else:
+                        window_obj = Window(start, end, thickness=5)
+
+                    current_floor.add_window(window_obj)
+                    current_floor.normalize_walls(around=[window_obj])
                 print(f"in floor {current_floor.name} create window : {window_obj}")
+                self._warn_orphan_opening(current_floor, window_obj, "La fenêtre")
 
-                ivy_bus.publish(
-                    "draw_window_update",
-                    {
-                        "start": window_obj.start,
-                        "end": window_obj.end,
-                        "fill": "#ffafcc",
-                        "thickness": window_obj.thickness,
-                    },
-                )
-
-                # Redraw all walls to reflect any modifications made by _check_wall_overlap
-                ivy_bus.publish("clear_canvas_update", {"redraw_operation": True})
-                
-                # Redraw all walls
-                for wall_obj in current_floor.walls:
-                    ivy_bus.publish("draw_wall_update", {
-                        "start": wall_obj.start,
-                        "end":   wall_obj.end,
-                        "fill":  "black",
-                    })
-                
-                # Redraw all windows
-                for window_item in current_floor.windows:
-                    ivy_bus.publish("draw_window_update", {
-                        "start": window_item.start,
-                        "end": window_item.end,
-                        "fill": "#ffafcc",
-                        "thickness": window_item.thickness,
-                    })
-                
-                # Redraw all doors
-                for door_item in current_floor.doors:
-                    ivy_bus.publish("draw_door_update", {
-                        "start": door_item.start,
-                        "end": door_item.end,
-                        "fill": "#dda15e",
-                        "thickness": door_item.thickness,
-                    })
-                
-                # Redraw all vents
-                for vent_item in current_floor.vents:
-                    ivy_bus.publish("draw_vent_update", {
-                        "start": vent_item.start,
-                        "end": vent_item.end,
-                        "color": vent_item.color,
-                        "name": vent_item.name,
-                        "diameter": vent_item.diameter,
-                        "flow": vent_item.flow_rate,
-                        "role": vent_item.function
-                    })
-                
-                # Redraw plenum if it exists
-                if hasattr(current_floor, "plenums") and current_floor.plenums:
-                    for plenum in current_floor.plenums:
-                        ivy_bus.publish("draw_plenum_update", {
-                            "start": plenum.start,
-                            "end": plenum.end,
-                            "max_flow": plenum.max_flow,
-                            "type": plenum.type,
-                            "area": plenum.area
-                        })
+                # The floor events already told the View about the window and the split wall
 
                 self.window_start_point = None
 
-                # If this is the floor below the current selected floor,
-                # update the onion skin in the floor above
-                if len(self.floors) > self.selected_floor_index + 1:
-                    # Save current floor index
-                    current_idx = self.selected_floor_index
-                    # Temporarily set selected floor to the one above
-                    self.selected_floor_index = current_idx + 1
-                    # Send onion skin update
-                    self._send_onion_skin_preview()
-                    # Restore current floor index
-                    self.selected_floor_index = current_idx
-
-                # Also refresh the onion skin of the current floor if we're above floor 0
-                # Not using elif so both conditions can be true for middle floors
-                if self.selected_floor_index > 0:
-                    self._send_onion_skin_preview()
-
         elif is_preview:
             if self.window_start_point is not None:
                 start = self.window_start_point
@@ -287,11 +387,20 @@ class Controller:
     def handle_cancal_to_draw_window_request(self,data):
         self.is_canceled_window_draw = True
         self.window_start_point = None
+        ivy_bus.publish("snap_indicator_update", {})
 
         ivy_bus.publish("draw_window_update",{
             "start": (0, 0), "end": (0, 0), "fill": "gray"
         })
 
+    def _warn_orphan_opening(self, floor, opening, label):
+        """Tell the user when a new door or window touches no wall (it is kept as drawn)"""
+        if any(issue.kind == ORPHAN_OPENING and opening in issue.objects for issue in floor.geometry_check()):
+            ivy_bus.publish("show_alert_request", {
+                "title": "Ouverture hors mur",
+                "message": f"{label} n'est posée sur aucun mur."
+            })
+
     def handle_draw_door_request(self, data):
         x, y = data.get("x"), data.get("y")
         is_click = data.get("is_click", False)
@@ -299,6 +408,7 @@ class Controller:
 
         if self.selected_floor_index is None or self.current_tool != 'door':
             return
+        x, y = self._snap(x, y)
 
         if is_click:
             if self.door_start_point is None:
@@ -307,101 +417,27 @@ class Controller:
                 start = self.door_start_point
                 end = (x, y)
 
-                # Check if door overlaps with any wall and modify the wall
-                wall_modified, aligned_start, aligned_end = self._check_wall_overlap(start, end, is_door=True)
-                
-                # Create door with aligned coordinates if a wall was modified
-                if wall_modified:
-                    door_obj = Door(aligned_start, aligned_end, thickness=5)
-                else:
-                    door_obj = Door(start, end, thickness=5)
-
                 current_floor = self.floors[self.selected_floor_index]
-                current_floor.add_door(door_obj)
+                # The wall split and the door are undone together
+                with self._batched_view_update(), self.history.step("Porte"):
+                    # Check if door overlaps with any wall and modify the wall
+                    wall_modified, aligned_start, aligned_end = self._check_wall_overlap(start, end, is_door=True)
+
+                    # Create door with aligned coordinates if a wall was modified
+                    if wall_modified:
+                        door_obj = Door(aligned_start, aligned_end, thickness=5)
+                    else:
+                        door_obj = Door(start, end, thickness=5)
+
+                    current_floor.add_door(door_obj)
+                    current_floor.normalize_walls(around=[door_obj])
                 print(f"in floor {current_floor.name} create door : {door_obj}")
+                self._warn_orphan_opening(current_floor, door_obj, "La porte")
 
-                ivy_bus.publish(
-                    "draw_door_update",
-                    {
-                        "start": door_obj.start,
-                        "end": door_obj.end,
-                        "fill": "#dda15e",
-                        "thickness": door_obj.thickness,
-                    },
-                )
-
-                # Redraw all walls to reflect any modifications made by _check_wall_overlap
-                # Mark this as a redraw operation, not a full clear
-                ivy_bus.publish("clear_canvas_update", {"redraw_operation": True})
-                
-                # Redraw all walls
-                for wall_obj in current_floor.walls:
-                    ivy_bus.publish("draw_wall_update", {
-                        "start": wall_obj.start,
-                        "end":   wall_obj.end,
-                        "fill":  "black",
-                    })
-                
-                # Redraw all windows
-                for window_item in current_floor.windows:
-                    ivy_bus.publish("draw_window_update", {
-                        "start": window_item.start,
-                        "end": window_item.end,
-                        "fill": "#ffafcc",
-                        "thickness": window_item.thickness,
-                    })
-                
-                # Redraw all doors
-                for door_item in current_floor.doors:
-                    ivy_bus.publish("draw_door_update", {
-                        "start": door_item.start,
-                        "end": door_item.end,
-                        "fill": "#dda15e",
-                        "thickness": door_item.thickness,
-                    })
-                
-                # Redraw all vents
-                for vent_item in current_floor.vents:
-                    ivy_bus.publish("draw_vent_update", {
-                        "start": vent_item.start,
-                        "end": vent_item.end,
-                        "color": vent_item.color,
-                        "name": vent_item.name,
-                        "diameter": vent_item.diameter,
-                        "flow": vent_item.flow_rate,
-                        "role": vent_item.function
-                    })
-                
-                # Redraw plenum if it exists
-                if hasattr(current_floor, "plenums") and current_floor.plenums:
-                    for plenum in current_floor.plenums:
-                        ivy_bus.publish("draw_plenum_update", {
-                            "start": plenum.start,
-                            "end": plenum.end,
-                            "max_flow": plenum.max_flow,
-                            "type": plenum.type,
-                            "area": plenum.area
-                        })
+                # The floor events already told the View about the door and the split wall
 
                 self.door_start_point = None
 
-                # If this is the floor below the current selected floor,
-                # update the onion skin in the floor above
-                if len(self.floors) > self.selected_floor_index + 1:
-                    # Save current floor index
-                    current_idx = self.selected_floor_index
-                    # Temporarily set selected floor to the one above
-                    self.selected_floor_index = current_idx + 1
-                    # Send onion skin update
-                    self._send_onion_skin_preview()
-                    # Restore current floor index
-                    self.selected_floor_index = current_idx
-
-                # Also refresh the onion skin of the current floor if we're above floor 0
-                # Not using elif so both conditions can be true for middle floors
-                if self.selected_floor_index > 0:
-                    self._send_onion_skin_preview()
-
         elif is_preview:
             if self.door_start_point is not None:
                 start = self.door_start_point
@@ -423,6 +459,7 @@ class Controller:
     def handle_cancal_to_draw_door_request(self, data):
         self.is_canceled_door_draw = True
         self.door_start_point = None
+        ivy_bus.publish("snap_indicator_update", {})
 
         ivy_bus.publish("draw_door_update",{
             "start": (0, 0), "end": (0, 0), "fill": "gray"
@@ -498,38 +535,13 @@ class Controller:
 
         if self.selected_floor_index is not None:
             current_floor = self.floors[self.selected_floor_index]
-            current_floor.add_vent(vent_obj)
+            # Drawn with the saved properties through the object_added event
+            with self._batched_view_update(), self.history.step("Bouche"):
+                current_floor.add_vent(vent_obj)
 
-            # Redraw with the saved properties
-            ivy_bus.publish("draw_vent_update", {
-                "start": vent_obj.start, "end": vent_obj.end,
-                "color": vent_obj.color,
-                "name": vent_obj.name,
-                "diameter": vent_obj.diameter,
-                "flow": vent_obj.flow_rate,
-                "role": vent_obj.function
-            })
-            
             # Send update for ventilation summary
             self.handle_get_ventilation_summary_request({})
 
-            # If this is the floor below the current selected floor,
-            # update the onion skin in the floor above
-            if len(self.floors) > self.selected_floor_index + 1:
-                # Save current floor index
-                current_idx = self.selected_floor_index
-                # Temporarily set selected floor to the one above
-                self.selected_floor_index = current_idx + 1
-                # Send onion skin update
-                self._send_onion_skin_preview()
-                # Restore current floor index
-                self.selected_floor_index = current_idx
-
-            # Also refresh the onion skin of the current floor if we're above floor 0
-            # Not using elif so both conditions can be true for middle floors
-            if self.selected_floor_index > 0:
-                self._send_onion_skin_preview()
-
         # Reset temporary variables
         self.temp_vent_start = self.temp_vent_end = None
 
@@ -542,66 +554,15 @@ class Controller:
             self.selected_floor_index = floor_idx
             selected_floor = self.floors[floor_idx]
             print(f"[Controller] the floor is chosen now : {selected_floor.name} (index={floor_idx})")
+            self.selection = []
 
             ivy_bus.publish("clear_canvas_update", {})
 
-            # Check if the selected floor has plenums and update the state
-            has_plenum = hasattr(selected_floor, "plenums") and len(selected_floor.plenums) > 0
-            if has_plenum:
-                self.the_plenum = True
-                ivy_bus.publish("disable_tool_button", {"tool": "plenum"})
-            else:
-                self.the_plenum = None
-                ivy_bus.publish("enable_tool_button", {"tool": "plenum"})
-
-            # told View to redraw all the walls      Il faut dire tous les objets apres iciiiiiiiiiiii
-            for wall_obj in selected_floor.walls:
-                ivy_bus.publish("draw_wall_update", {
-                    "start": wall_obj.start,
-                    "end":   wall_obj.end,
-                    "fill":  "black",
-                })
+            # The plenum tool follows the plenum of the project
+            self._publish_plenum_state()
 
-            for window_obj in selected_floor.windows:
-                ivy_bus.publish(
-                    "draw_window_update",
-                    {
-                        "start": window_obj.start,
-                        "end": window_obj.end,
-                        "fill": "#ffafcc",
-                        "thickness": window_obj.thickness,
-                    },
-                )
-
-            for door_objet in selected_floor.doors:
-                ivy_bus.publish(
-                    "draw_door_update",
-                    {
-                        "start": door_objet.start,
-                        "end": door_objet.end,
-                        "fill": "#dda15e",
-                        "thickness": door_objet.thickness,
-                    },
-                )
-
-            for v in selected_floor.vents:
-                ivy_bus.publish("draw_vent_update", {
-                    "start": v.start, "end": v.end,
-                    "color": v.color,
-                    "name": v.name,
-                    "diameter": v.diameter,
-                    "flow": v.flow_rate,
-                    "role": v.function
-                })
-
-            for p in getattr(selected_floor, "plenums", []):
-                ivy_bus.publish("draw_plenum_update", {
-                    "start": p.start,
-                    "end": p.end,
-                    "max_flow": p.max_flow,
-                    "type": p.type,
-                    "area": p.area
-                })
+            # told View to redraw all the objects of the floor
+            self._publish_floor_objects(selected_floor)
 
             ivy_bus.publish("floor_selected_update", {
                 "selected_floor_index": floor_idx,
@@ -619,6 +580,65 @@ class Controller:
             # Send onion skin preview data if applicable
             self._send_onion_skin_preview()
 
+    def _has_plenum(self):
+        """Whether the project has its plenum: there is one for the whole building"""
+        return any(floor.plenums for floor in self.floors)
+
+    def _publish_plenum_state(self):
+        """The plenum tool is available until the project has a plenum"""
+        self.plenum_exists = self._has_plenum()
+        if self.plenum_exists:
+            ivy_bus.publish("disable_tool_button", {"tool": "plenum"})
+        else:
+            self.the_plenum = None
+            ivy_bus.publish("enable_tool_button", {"tool": "plenum"})
+
+    def _object_data(self, obj):
+        """Kind of an object and the data the View draws it from, with its ID"""
+        if isinstance(obj, Vent):
+            return "vent", {
+                "id": obj.id,
+                "start": obj.start, "end": obj.end,
+                "color": obj.color,
+                "name": obj.name,
+                "diameter": obj.diameter,
+                "flow": obj.flow_rate,
+                "role": obj.function
+            }
+        if isinstance(obj, Plenum):
+            return "plenum", {
+                "id": obj.id,
+                "start": obj.start,
+                "end": obj.end,
+                "max_flow": obj.max_flow,
+                "type": obj.type,
+                "area": obj.area
+            }
+        if isinstance(obj, (Window, Door)):
+            kind = "window" if isinstance(obj, Window) else "door"
+            return kind, {
+                "id": obj.id,
+                "start": obj.start,
+                "end": obj.end,
+                "fill": "#ffafcc" if kind == "window" else "#dda15e",
+                "thickness": obj.thickness,
+            }
+        return "wall", {
+            "id": obj.id,
+            "start": obj.start,
+            "end":   obj.end,
+            "fill":  "black",
+        }
+
+    def _publish_object(self, obj):
+        """Tell the View to draw one object of the selected floor"""
+        kind, data = self._object_data(obj)
+        ivy_bus.publish(f"draw_{kind}_update", data)
+
+    def _publish_floor_objects(self, floor):
+        for obj in floor.walls + floor.windows + floor.doors + floor.vents + floor.plenums:
+            self._publish_object(obj)
+
     def handle_new_floor_request(self, data):
         """
         When the user clicks the "New floor" button: insert a new floor above the selected floor
@@ -634,7 +654,9 @@ class Controller:
         else:
             insert_index = self.selected_floor_index + 1
 
-        self.floors.insert(insert_index, new_floor)
+        self._insert_floor(insert_index, new_floor)
+        with self.history.step("Nouvel étage"):
+            self.history.record_floor(FLOOR_INSERTED, insert_index, new_floor)
 
         self.selected_floor_index = insert_index
 
@@ -647,9 +669,8 @@ class Controller:
 
         self._publish_height(new_floor)
 
-        # Send onion skin preview if we're not on the first floor
-        if self.selected_floor_index > 0:
-            self._send_onion_skin_preview()
+        # Ghost layers of the floors around the new one
+        self._send_onion_skin_preview()
 
     #def handle_modifier_the_maxflow_request(self,data):
 
@@ -660,7 +681,7 @@ class Controller:
         """
         tool = data.get("tool")
 
-        if tool == 'plenum' and self.the_plenum is not None:
+        if tool == 'plenum' and self.plenum_exists:
              ivy_bus.publish("show_alert_request", {
                  "title": "Plenum Existant",
                  "message": "Un seul plenum peut être créé dans l'application."
@@ -679,6 +700,8 @@ class Controller:
 
         self.current_tool = tool
         print(f"[Controller] current tool = {tool}")
+        if tool != 'select':
+            self._set_selection([])
 
         ivy_bus.publish("tool_selected_update", {
             "tool": tool
@@ -701,7 +724,8 @@ class Controller:
             return
 
         floor_obj = self.floors[floor_index]
-        floor_obj.name = new_name
+        with self.history.step("Renommer l'étage"):
+            floor_obj.rename(new_name)
 
         ivy_bus.publish("new_floor_update", {
         "floors": [f.name for f in self.floors],
@@ -712,6 +736,10 @@ class Controller:
         if self.selected_floor_index is None:
             return
 
+        with self._batched_view_update(), self.history.step("Suppression"):
+            self._delete_item(data)
+
+    def _delete_item(self, data):
         # Unpack data
         obj_type = data.get("type")
         coords = data.get("coords")
@@ -751,7 +779,7 @@ class Controller:
                 # Delete identified vents (in reverse order to avoid index issues)
                 for i in sorted(vents_to_delete, reverse=True):
                     print(f"[Controller] Deleting vent at index {i} with start {floor.vents[i].start}")
-                    del floor.vents[i]
+                    floor.remove_vent(floor.vents[i])
                 
                 # Send update for ventilation summary if a vent was deleted
                 if vents_to_delete:
@@ -765,7 +793,8 @@ class Controller:
                 def same_segment(o):
                     return ({o.start, o.end} == {start, end})
                 
-                floor.vents = [v for v in floor.vents if not same_segment(v)]
+                for vent in [v for v in floor.vents if same_segment(v)]:
+                    floor.remove_vent(vent)
                 self.handle_get_ventilation_summary_request({})
         else:
             # For walls, windows, doors, plenums - use the original method
@@ -778,41 +807,235 @@ class Controller:
                     return ({o.start, o.end} == {start, end})
 
                 if obj_type == "wall":
-                    floor.walls = [w for w in floor.walls if not same_segment(w)]
+                    for wall in [w for w in floor.walls if same_segment(w)]:
+                        floor.remove_wall(wall)
                 elif obj_type == "window":
-                    floor.windows = [w for w in floor.windows if not same_segment(w)]
+                    for window in [w for w in floor.windows if same_segment(w)]:
+                        floor.remove_window(window)
                 elif obj_type == "door":
-                    floor.doors = [d for d in floor.doors if not same_segment(d)]
+                    for door in [d for d in floor.doors if same_segment(d)]:
+                        floor.remove_door(door)
                 elif obj_type == "plenum":
                     # Delete the plenum from both the controller reference and the floor's plenums list
                     self.the_plenum = None
                     if hasattr(floor, "plenums"):
                         # Match plenum by coordinates (start and end)
-                        floor.plenums = [p for p in floor.plenums if not same_segment(p)]
+                        for plenum in [p for p in floor.plenums if same_segment(p)]:
+                            floor.remove_plenum(plenum)
                         print(f"[Controller] Deleted plenum, remaining: {len(floor.plenums)}")
+                        self.handle_get_ventilation_summary_request({})
                         
                         # Re-enable the plenum button when a plenum is deleted
                         if len(floor.plenums) == 0:
+                            self.plenum_exists = False
                             ivy_bus.publish("enable_tool_button", {"tool": "plenum"})
 
-        # Always refresh the onion skin display after deletion
-        # This will ensure the onion skin is correctly updated
+        # The ghost layers show the other floors: deleting here leaves them as they are
+
+    def _set_selection(self, objects):
+        self.selection = list(objects)
+        ivy_bus.publish("selection_update", {"ids": [obj.id for obj in self.selection]})
+
+    def _live_selection(self):
+        """The selected objects still on the selected floor"""
+        if self.selected_floor_index is None:
+            return []
+        present = {obj.id for obj in self.floors[self.selected_floor_index].selection_index().objects}
+        return [obj for obj in self.selection if obj.id in present]
+
+    def handle_select_request(self, data):
+        """
+        Rubber band (mode "rectangle", points: two corners) or lasso (mode
+        "lasso", points: the polygon) selection on the selected floor. With
+        "add", the objects found join the current selection.
+        """
+        if self.selected_floor_index is None:
+            return
+        index = self.floors[self.selected_floor_index].selection_index()
+        points = data.get("points") or []
+        if data.get("mode") == "lasso":
+            found = index.in_lasso(points)
+        elif len(points) >= 2:
+            found = index.in_rectangle(points[0], points[1])
+        else:
+            found = []
+        if data.get("add"):
+            found = list({obj.id: obj for obj in self._live_selection() + found}.values())
+        self._set_selection(found)
+
+    def handle_selection_transform_request(self, data):
+        """
+        Move (dx, dy), turn a quarter turn (direction "clockwise" or
+        "counterclockwise") or mirror (flip "horizontal" or "vertical") the
+        selection about its centre. All the points are transformed at once;
+        the edit is one undo step and one View update.
+        """
+        objects = self._live_selection()
+        if not objects:
+            return
+        operation = data.get("operation")
+        points = object_points(objects)
+        if operation == "move":
+            moved = transform_points(points, offset=(data.get("dx", 0), data.get("dy", 0)))
+            label = "Déplacement"
+        elif operation == "rotate":
+            matrix = ROTATE_COUNTERCLOCKWISE if data.get("direction") == "counterclockwise" else ROTATE_CLOCKWISE
+            moved = transform_points(points, matrix, selection_center(points))
+            label = "Rotation"
+        elif operation == "mirror":
+            matrix = MIRROR_VERTICAL if data.get("flip") == "vertical" else MIRROR_HORIZONTAL
+            moved = transform_points(points, matrix, selection_center(points))
+            label = "Symétrie"
+        else:
+            return
+
+        floor = self.floors[self.selected_floor_index]
+        with self._batched_view_update(), self.history.step(label):
+            floor.move_objects(objects, moved)
+            # Moved walls may now meet others
+            floor.normalize_walls(around=objects)
+        self._set_selection(self._live_selection())
+
+    def handle_selection_delete_request(self, data):
+        """Delete all the selected objects: one undo step, one View update"""
+        objects = self._live_selection()
+        if not objects:
+            return
+        floor = self.floors[self.selected_floor_index]
+        with self._batched_view_update(), self.history.step("Suppression"):
+            for obj in objects:
+                floor.remove_object(obj)
+        self._set_selection([])
+        if any(kind_of(obj) in ("vent", "plenum") for obj in objects):
+            self._publish_plenum_state()
+            self.handle_get_ventilation_summary_request({})
+
+    def handle_copy_selection_request(self, data):
+        """Keep copies of the selected objects, to paste on any floor"""
+        objects = self._live_selection()
+        if objects:
+            self.clipboard = [copy_object(obj) for obj in objects]
+
+    def handle_paste_request(self, data):
+        """
+        Paste the copied objects, at the same place, on the floors given by
+        floor_indexes (the selected floor by default). All the floors are
+        one undo step and one View update; the summary and the ghost layers
+        are refreshed once at the end.
+        """
+        if not self.clipboard:
+            return
+        indexes = data.get("floor_indexes")
+        if indexes is None:
+            indexes = [] if self.selected_floor_index is None else [self.selected_floor_index]
+        targets = [self.floors[i] for i in sorted(set(indexes)) if 0 <= i < len(self.floors)]
+        if not targets:
+            return
+
+        selected_floor = None if self.selected_floor_index is None else self.floors[self.selected_floor_index]
+        # One plenum for the whole project: a copied plenum goes to the first target, if the project has none
+        copies_plenum = any(isinstance(template, Plenum) for template in self.clipboard)
+        had_plenum = self._has_plenum()
+        pasted = []
+        with self._batched_view_update(), self.history.step("Coller"):
+            for floor in targets:
+                added = []
+                for template in self.clipboard:
+                    if isinstance(template, Plenum) and self._has_plenum():
+                        continue
+                    obj = copy_object(template)
+                    floor.add_object(obj)
+                    added.append(obj)
+                if floor is selected_floor:
+                    pasted.extend(added)
+                floor.normalize_walls(around=added)
+
+        # The pasted objects become the selection, ready to be moved
+        if pasted:
+            self.selection = pasted
+            self._set_selection(self._live_selection())
+        self._publish_plenum_state()
+        self.handle_get_ventilation_summary_request({})
         self._send_onion_skin_preview()
+        if copies_plenum and (had_plenum or len(targets) > 1):
+            ivy_bus.publish("show_alert_request", {
+                "title": "Plenum Existant",
+                "message": "Un seul plenum peut être créé dans l'application. "
+                           + ("Le plenum n'a pas été collé." if had_plenum
+                              else "Le plenum n'a été collé que sur le premier étage.")
+            })
 
-        # Additionally, if this is the floor below the current selected floor,
-        # update the onion skin in the floor above
-        if len(self.floors) > self.selected_floor_index + 1:
-            # Save current floor index
-            current_idx = self.selected_floor_index
-            # Temporarily set selected floor to the one above
-            self.selected_floor_index = current_idx + 1
-            # Send onion skin update
-            self._send_onion_skin_preview()
-            # Restore current floor index
-            self.selected_floor_index = current_idx
-            
-        # Force view to refresh onion skin after deletion
-        ivy_bus.publish("ensure_onion_skin_refresh", {})
+    def _place_vents(self, placements, label):
+        """
+        Add (floor index, Vent) pairs in one transaction: one undo step and
+        one View update; the summary and the ghost layers are recomputed
+        once at the end.
+        """
+        with self._batched_view_update(), self.history.step(label):
+            for index, vent in placements:
+                self.floors[index].add_vent(vent)
+        self.handle_get_ventilation_summary_request({})
+        self._send_onion_skin_preview()
+
+    def handle_import_vents_request(self, data):
+        """Place the vents of a CSV file (see model/vent_import.py) on their floors"""
+        csv_path = data.get("csv_path")
+        try:
+            placements = read_vent_csv(csv_path, self.floors)
+        except ProjectValidationError as e:
+            self._publish_issues("L'importation des bouches a échoué", e.issues)
+            return
+        self._place_vents(placements, "Import de bouches")
+        print(f"[Controller] Imported {len(placements)} vents from {csv_path}")
+
+    def handle_replicate_vents_request(self, data):
+        """
+        Repeat the selected vents on the floors of floor_indexes: repeats
+        copies on each floor, dx and dy metres apart (one per identical
+        dwelling). The copies that would fall on the selected vents
+        themselves are left out.
+        """
+        vents = [obj for obj in self._live_selection() if isinstance(obj, Vent)]
+        if not vents:
+            ivy_bus.publish("show_alert_request", {
+                "title": "Aucune bouche sélectionnée",
+                "message": "Sélectionnez d'abord les bouches à répéter."
+            })
+            return
+        repeats = max(1, int(data.get("repeats", 1)))
+        step = (data.get("dx", 0) * PIXELS_PER_METER, data.get("dy", 0) * PIXELS_PER_METER)
+
+        placements = []
+        for index in sorted(set(data.get("floor_indexes") or [])):
+            if not 0 <= index < len(self.floors):
+                continue
+            copies = repeat_vents(vents, repeats, step)
+            if index == self.selected_floor_index:
+                copies = copies[len(vents):]
+            placements.extend((index, vent) for vent in copies)
+        if placements:
+            self._place_vents(placements, "Répétition de bouches")
+
+    def handle_check_geometry_request(self, data):
+        """
+        Report the geometry problems of a floor (see model/geometry_check.py).
+        On the selected floor, the objects at fault are selected as well.
+        """
+        index = data.get("floor_index", self.selected_floor_index)
+        if index is None or not 0 <= index < len(self.floors):
+            return
+        floor = self.floors[index]
+        issues = floor.geometry_check()
+        if index == self.selected_floor_index:
+            self._set_selection(list({id(obj): obj for issue in issues for obj in issue.objects}.values()))
+        if not issues:
+            ivy_bus.publish("show_alert_request", {
+                "title": "Vérification de la géométrie",
+                "message": f"Aucun problème trouvé sur l'étage {floor.name}."
+            })
+            return
+        self._publish_issues(f"{len(issues)} problème(s) sur l'étage {floor.name}",
+                             [issue.message for issue in issues])
 
     def _publish_height(self, floor):
         ivy_bus.publish("floor_height_update", {"height": floor.height})
@@ -821,9 +1044,12 @@ class Controller:
         idx    = data["floor_index"]
         height = data["height"]
         if 0 <= idx < len(self.floors):
-            self.floors[idx].set_height(height)
+            with self.history.step("Hauteur d'étage"):
+                self.floors[idx].set_height(height)
             if idx == self.selected_floor_index:
                 self._publish_height(self.floors[idx])
+            # The plenum volume follows the floor height
+            self.handle_get_ventilation_summary_request({})
 
     def handle_delete_floor_request(self, data):
         floor_index = data.get("floor_index")
@@ -841,8 +1067,10 @@ class Controller:
         # Store the floor name for logging
         deleted_floor_name = self.floors[floor_index].name
 
-        # Remove the floor
-        self.floors.pop(floor_index)
+        # Remove the floor, and its figures from the project totals
+        removed = self._remove_floor(floor_index)
+        with self.history.step("Suppression d'étage"):
+            self.history.record_floor(FLOOR_REMOVED, floor_index, removed)
 
         # Adjust the selected floor index if needed
         if self.selected_floor_index == floor_index:
@@ -866,9 +1094,10 @@ class Controller:
         # Select and draw the new floor
         selected_floor = self.floors[self.selected_floor_index]
         self.handle_floor_selected_request({"floor_index": self.selected_floor_index})
+        self.handle_get_ventilation_summary_request({})
 
     def handle_onion_skin_preview_request(self, data):
-        """Handle request for onion skin preview of the floor below"""
+        """Handle request for the ghost layers of the floors around the selected one"""
         self._send_onion_skin_preview()
 
     def handle_create_plenum_request(self, data):
@@ -877,7 +1106,7 @@ class Controller:
         end_x   = data["end_x"]
         end_y   = data["end_y"]
 
-        if self.the_plenum:
+        if self.plenum_exists:
             ivy_bus.publish("show_alert_request", {
                 "title": "Plenum Existant",
                 "message": "Un seul plenum peut être créé dans l'application. L'opération a été annulée." 
@@ -1107,20 +1336,15 @@ class Controller:
             print(f"[Controller] Created the single plenum object on floor {plenum_obj.floor_index}: {plenum_obj} with Type: {plenum_obj.type}")
             
             current_floor = self.floors[self.selected_floor_index] 
-            if not hasattr(current_floor, "plenums"):
-                 current_floor.plenums = []
-            current_floor.plenums.append(plenum_obj)
-
-            ivy_bus.publish("draw_plenum_update", {
-                "start": plenum_obj.start,
-                "end": plenum_obj.end,
-                "max_flow": plenum_obj.max_flow,
-                "type": plenum_obj.type,
-                "area": plenum_obj.area
-            })
+            with self._batched_view_update(), self.history.step("Plénum"):
+                current_floor.add_plenum(plenum_obj)
+            self.plenum_exists = True
 
             # Disable the plenum button
             ivy_bus.publish("disable_tool_button", {"tool": "plenum"})
+
+            # The plenum volume changes the RAH
+            self.handle_get_ventilation_summary_request({})
             
             # Switch to the selection tool automatically after placing a plenum
             self.current_tool = 'select'
@@ -1132,88 +1356,42 @@ class Controller:
              self.the_plenum = None
 
     def _send_onion_skin_preview(self):
-        """Send data for onion skin preview of the floor below current floor"""
-        if self.selected_floor_index is None or self.selected_floor_index <= 0:
-            # No floor below to show
-            return
-
-        # Get the floor below
-        floor_below_index = self.selected_floor_index - 1
-        floor_below = self.floors[floor_below_index]
-
-        # Prepare items to be drawn in onion skin
-        items = []
+        """
+        Send the ghost floors of the selected floor: up to onion_skin_below
+        floors below and onion_skin_above floors above, as snapshots the View
+        renders (and caches per floor version). Farthest levels come first,
+        so the View puts the nearest on top.
+        """
+        levels = []
+        if self.selected_floor_index is not None:
+            offsets = ([-d for d in range(self.onion_skin_below, 0, -1)]
+                       + list(range(self.onion_skin_above, 0, -1)))
+            for offset in sorted(offsets, key=lambda o: -abs(o)):
+                index = self.selected_floor_index + offset
+                if 0 <= index < len(self.floors):
+                    floor = self.floors[index]
+                    levels.append({
+                        "floor_index": index,
+                        "floor_name": floor.name,
+                        "offset": offset,
+                        "floor_id": floor.id,
+                        "snapshot": floor.snapshot(),
+                    })
 
-        # Add walls
-        for wall in floor_below.walls:
-            items.append({
-                "type": "wall",
-                "coords": (wall.start, wall.end),
-                "fill": "black"
-            })
+        ivy_bus.publish("onion_skin_preview_update", {"levels": levels})
 
-        # Add windows
-        for window in floor_below.windows:
-            items.append(
-                {
-                    "type": "window",
-                    "coords": (window.start, window.end),
-                    "fill": "#ffafcc",
-                    "thickness": window.thickness,
-                }
-            )
-
-        # Add doors
-        for door in floor_below.doors:
-            items.append(
-                {
-                    "type": "door",
-                    "coords": (door.start, door.end),
-                    "fill": "#dda15e",
-                    "thickness": door.thickness,
-                }
-            )
-
-        # Add vents
-        for vent in floor_below.vents:
-            items.append({
-                "type": "vent",
-                "coords": (vent.start, vent.end),
-                "fill": vent.color,
-                "additional_data": {
-                    "name": vent.name,
-                    "diameter": vent.diameter,
-                    "flow_rate": vent.flow_rate,
-                    "function": vent.function
-                }
-            })
-            
-        # Add plenums
-        if hasattr(floor_below, "plenums"):
-            for plenum in floor_below.plenums:
-                items.append({
-                    "type": "plenum",
-                    "coords": (plenum.start, plenum.end),
-                    "fill": "blue",
-                    "additional_data": {
-                        "max_flow": plenum.max_flow,
-                        "type": plenum.type,
-                        "area": plenum.area
-                    }
-                })
-
-        # Send the data to the view
-        ivy_bus.publish("onion_skin_preview_update", {
-            "items": items,
-            "floor_below_index": floor_below_index,
-            "floor_below_name": floor_below.name
-        })
+    def handle_onion_skin_settings_request(self, data):
+        """Number of floors shown as ghost layers below and above the selected floor"""
+        self.onion_skin_below = max(0, min(int(data.get("below", self.onion_skin_below)), MAX_ONION_SKIN_LEVELS))
+        self.onion_skin_above = max(0, min(int(data.get("above", self.onion_skin_above)), MAX_ONION_SKIN_LEVELS))
+        self._send_onion_skin_preview()
 
     def handle_save_project_request(self, data):
         """
-        Save project to the selected JSON file
+        Save project to the selected JSON file, in the background: the floors
+        are snapshotted first, so editing can go on during the write
         """
-        json_data = [floor.to_dict() for floor in self.floors]
+        snapshots = [floor.snapshot() for floor in self.floors]
 
         # Get the JSON file path from the data
         json_file_path = data.get("json_file_path")
@@ -1223,12 +1401,22 @@ class Controller:
             ts = datetime.now().strftime("%Y%m%d_%H%M%S")
             json_file_path = os.path.join(os.getcwd(), f"floors_{ts}.json")
 
-        # Save the JSON file
-        with open(json_file_path, "w", encoding="utf-8") as f:
-            json.dump(json_data, f, indent=4, ensure_ascii=False)
-
-        # Success alert removed for a cleaner experience
-        print(f"[Controller] Project saved to: {json_file_path}")
+        # One save at a time, so two saves to the same file cannot interleave
+        if self._save_thread is not None:
+            self._save_thread.join()
+        self._save_thread = threading.Thread(target=_write_project,
+                                             args=(snapshots, json_file_path), name="save-project")
+        self._save_thread.start()
+
+    def _publish_issues(self, title, issues):
+        """Report every problem at once, with the path of the faulty field"""
+        shown = issues[:15]
+        if len(issues) > len(shown):
+            shown.append(f"... et {len(issues) - len(shown)} autre(s) problème(s)")
+        ivy_bus.publish("show_alert_request", {
+            "title": title,
+            "message": "\n".join(shown)
+        })
 
     def handle_import_project_request(self, data):
 
@@ -1241,92 +1429,23 @@ class Controller:
             return
 
         try:
-            with open(json_path, "r", encoding="utf-8") as f:
-                floors_data = json.load(f)
-        except Exception as e:
-            ivy_bus.publish("show_alert_request", {
-                "title": "L'importation a échoué",
-                "message": f"Erreur lors de l'analyse de JSON：{e}"
-            })
+            new_floors = load_project(json_path)
+        except ProjectValidationError as e:
+            self._publish_issues("L'importation a échoué", e.issues)
             return
 
-        new_floors = []
-        plenum_found_in_import = False
-        for f_dict in floors_data:
-            floor_obj = Floor(f_dict.get("name", "Etage ?"))
-            floor_obj.height = f_dict.get("height", 2.5)
-
-            # walls
-            for w in f_dict.get("walls", []):
-                floor_obj.add_wall(Wall(tuple(w["start"]), tuple(w["end"])))
-
-            # windows
-            for w in f_dict.get("windows", []):
-                floor_obj.add_window(
-                    Window(tuple(w["start"]), tuple(w["end"]),
-                        thickness=w.get("thickness", 5))
-                )
-
-            # doors
-            for d in f_dict.get("doors", []):
-                floor_obj.add_door(
-                    Door(tuple(d["start"]), tuple(d["end"]),
-                        thickness=d.get("thickness", 5))
-                )
-
-            # vents
-            for v in f_dict.get("vents", []):
-                flow_rate = v.get("flow_rate", "") or v.get("flow", "")  # Try both keys for compatibility
-                function = v.get("function", "") or v.get("role", "extraction_interne")  # Default to extraction_interne if missing
-                
-                # Determine color based on function if not provided
-                color = v.get("color", "")
-                if not color:
-                    if function == "extraction_interne":
-                        color = "#ff0000"  # Red
-                    elif function == "insufflation_interne":
-                        color = "#ff9900"  # Orange
-                    elif function == "extraction_externe":
-                        color = "#4c7093"  # Dark blue
-                    elif function == "admission_externe":
-                        color = "#66ccff"  # Light blue
-                    else:
-                        color = "#000000"  # Black fallback
-                        
-                floor_obj.add_vent(
-                    Vent(tuple(v["start"]), tuple(v["end"]),
-                        v.get("name", ""), v.get("diameter", ""),
-                        flow_rate, function, color)
-                )
-            
-            if "plenums" in f_dict: 
-                 if not hasattr(floor_obj, 'plenums'): floor_obj.plenums = [] 
-                 for p_data in f_dict["plenums"]:
-                     try:
-                         plenum_instance = Plenum.from_dict(p_data) 
-                         floor_obj.add_plenum(plenum_instance) 
-                         plenum_found_in_import = True 
-                     except Exception as e_plenum:
-                         print(f"Error loading plenum data {p_data}: {e_plenum}") 
-
-            new_floors.append(floor_obj)
-
-        if not new_floors:
-            ivy_bus.publish("show_alert_request", {
-                "title": "L'importation a échoué",
-                "message": "Aucune donnée d'étage trouvée dans JSON"
-            })
-            return
+        plenum_found_in_import = any(floor.plenums for floor in new_floors)
 
-        self.floors = new_floors
+        self._set_floors(new_floors)
         self.selected_floor_index = 0
 
         if plenum_found_in_import:
-            self.the_plenum = True # **恢复你的布尔标记**
+            self.plenum_exists = True # **恢复你的布尔标记**
             print("[Controller] Plenum(s) found in import. Setting flag and disabling button.")
             ivy_bus.publish("disable_tool_button", {"tool": "plenum"}) # **禁用按钮**
         else:
             self.the_plenum = None # **重置标记为 None**
+            self.plenum_exists = False
             print("[Controller] No plenums found in import. Resetting flag and enabling button.")
             ivy_bus.publish("enable_tool_button", {"tool": "plenum"}) # **启用按钮**
 
@@ -1342,10 +1461,6 @@ class Controller:
         # Send ventilation summary data after importing
         self.handle_get_ventilation_summary_request({})
 
-        # If the first floor is selected and there's more than one floor, force onion skin refresh
-        if self.selected_floor_index > 0:
-            self._send_onion_skin_preview()
-        
         # Force view to refresh onion skin
         ivy_bus.publish("ensure_onion_skin_refresh", {})
 
@@ -1353,41 +1468,29 @@ class Controller:
         print(f"[Controller] Project imported successfully from: {json_path}")
 
     def handle_get_ventilation_summary_request(self, data):
-        """Handle request for ventilation summary data from all floors"""
-        all_vents_data = []
-        all_plenums_data = []
-        
-        # Collect vents and plenums from all floors
-        for floor_idx, floor in enumerate(self.floors):
-            # Add vents
-            for vent in floor.vents:
-                all_vents_data.append({
-                    "floor_name": floor.name,
-                    "floor_index": floor_idx,
-                    "name": vent.name,
-                    "diameter": vent.diameter,
-                    "flow_rate": vent.flow_rate,
-                    "function": vent.function,
-                    "color": vent.color
-                })
-            
-            # Add plenums if present
-            if hasattr(floor, "plenums") and floor.plenums:
-                for plenum in floor.plenums:
-                    if hasattr(plenum, 'to_dict'):
-                        plenum_data = plenum.to_dict()
-                        plenum_data['floor_name'] = floor.name
-                        plenum_data['floor_index'] = floor_idx
-                        plenum_data['height'] = floor.height
-                        all_plenums_data.append(plenum_data)
-        
-        # Debug output to verify data
-        print(f"[Controller] Sending ventilation summary with {len(all_vents_data)} vents and {len(all_plenums_data)} plenums")
-        
-        # Send the combined data to the view
-        ivy_bus.publish("ventilation_summary_update", {
-            "vents": all_vents_data,
-            "plenums": all_plenums_data
+        """
+        Send the ventilation summary: the running totals and the vent records
+        of each floor, nothing recounted (see collect_summary_data())
+        """
+        summary_data = collect_summary_data(self.floors, self.stats)
+        ivy_bus.publish("ventilation_summary_update", summary_data)
+
+    def handle_regulation_summary_request(self, data):
+        """Send the regulatory figures of each floor, computed only when the summary window asks"""
+        ivy_bus.publish("regulation_summary_update", {"floors": [
+            dict(floor_regulation(floor), floor_name=floor.name, floor_index=index)
+            for index, floor in enumerate(self.floors)]})
+
+    def handle_export_report_request(self, data):
+        """Send the floors to write the PDF ventilation report of the whole project from"""
+        pdf_path = data.get("pdf_path")
+        if not pdf_path:
+            return
+
+        ivy_bus.publish("report_data_update", {
+            "pdf_path": pdf_path,
+            "project_name": os.path.splitext(os.path.basename(pdf_path))[0],
+            "floors": list(self.floors),
         })
 
     def _check_wall_overlap(self, start, end, is_door=False, is_window=False):
@@ -1414,83 +1517,79 @@ class Controller:
         dy = abs(end[1] - start[1])
         is_horizontal = dx >= dy
         
-        for i, wall in enumerate(current_floor.walls):
-            wall_dx = abs(wall.end[0] - wall.start[0])
-            wall_dy = abs(wall.end[1] - wall.start[1])
-            is_wall_horizontal = wall_dx >= wall_dy
-            
-            # Check if orientations match (both horizontal or both vertical)
-            if is_horizontal == is_wall_horizontal:
-                if is_horizontal:
-                    # For horizontal elements, check if y-coordinates match
-                    if abs(start[1] - wall.start[1]) < 10:  # Allow small tolerance
-                        # Check for overlap in x-coordinates
-                        min_x = min(start[0], end[0])
-                        max_x = max(start[0], end[0])
-                        wall_min_x = min(wall.start[0], wall.end[0])
-                        wall_max_x = max(wall.start[0], wall.end[0])
+        # Only the walls of the same orientation lying near the line of the element, nearest first
+        nearby = current_floor.snap_index().walls_on_line(is_horizontal, start[1] if is_horizontal else start[0], 10)
+        for wall in nearby:
+            if is_horizontal:
+                # For horizontal elements, check if y-coordinates match
+                if abs(start[1] - wall.start[1]) < 10:  # Allow small tolerance
+                    # Check for overlap in x-coordinates
+                    min_x = min(start[0], end[0])
+                    max_x = max(start[0], end[0])
+                    wall_min_x = min(wall.start[0], wall.end[0])
+                    wall_max_x = max(wall.start[0], wall.end[0])
+                    
+                    # If there's an overlap
+                    if max_x >= wall_min_x and min_x <= wall_max_x:
+                        overlap_min_x = max(min_x, wall_min_x)
+                        overlap_max_x = min(max_x, wall_max_x)
                         
-                        # If there's an overlap
-                        if max_x >= wall_min_x and min_x <= wall_max_x:
-                            overlap_min_x = max(min_x, wall_min_x)
-                            overlap_max_x = min(max_x, wall_max_x)
+                        # If the overlap is significant
+                        if overlap_max_x - overlap_min_x > 5:
+                            # Align the door/window exactly with the overlapping segment
+                            # Use the wall's exact y-coordinate for perfect alignment
+                            aligned_start = (overlap_min_x, wall.start[1])
+                            aligned_end = (overlap_max_x, wall.start[1])
                             
-                            # If the overlap is significant
-                            if overlap_max_x - overlap_min_x > 5:
-                                # Align the door/window exactly with the overlapping segment
-                                # Use the wall's exact y-coordinate for perfect alignment
-                                aligned_start = (overlap_min_x, wall.start[1])
-                                aligned_end = (overlap_max_x, wall.start[1])
-                                
-                                # Remove the original wall
-                                current_floor.walls.pop(i)
-                                
-                                # Create two new walls if needed (before and after the door/window)
-                                y = wall.start[1]
-                                if wall_min_x < overlap_min_x:
-                                    new_wall1 = Wall((wall_min_x, y), (overlap_min_x, y))
-                                    current_floor.add_wall(new_wall1)
-                                    
-                                if overlap_max_x < wall_max_x:
-                                    new_wall2 = Wall((overlap_max_x, y), (wall_max_x, y))
-                                    current_floor.add_wall(new_wall2)
+                            # Remove the original wall
+                            current_floor.remove_wall(wall)
+                            
+                            # Create two new walls if needed (before and after the door/window)
+                            y = wall.start[1]
+                            if wall_min_x < overlap_min_x:
+                                new_wall1 = Wall((wall_min_x, y), (overlap_min_x, y))
+                                current_floor.add_wall(new_wall1)
                                 
-                                return True, aligned_start, aligned_end
-                else:
-                    # For vertical elements, check if x-coordinates match
-                    if abs(start[0] - wall.start[0]) < 10:  # Allow small tolerance
-                        # Check for overlap in y-coordinates
-                        min_y = min(start[1], end[1])
-                        max_y = max(start[1], end[1])
-                        wall_min_y = min(wall.start[1], wall.end[1])
-                        wall_max_y = max(wall.start[1], wall.end[1])
+                            if overlap_max_x < wall_max_x:
+                                new_wall2 = Wall((overlap_max_x, y), (wall_max_x, y))
+                                current_floor.add_wall(new_wall2)
+                            
+                            return True, aligned_start, aligned_end
+            else:
+                # For vertical elements, check if x-coordinates match
+                if abs(start[0] - wall.start[0]) < 10:  # Allow small tolerance
+                    # Check for overlap in y-coordinates
+                    min_y = min(start[1], end[1])
+                    max_y = max(start[1], end[1])
+                    wall_min_y = min(wall.start[1], wall.end[1])
+                    wall_max_y = max(wall.start[1], wall.end[1])
+                    
+                    # If there's an overlap
+                    if max_y >= wall_min_y and min_y <= wall_max_y:
+                        overlap_min_y = max(min_y, wall_min_y)
+                        overlap_max_y = min(max_y, wall_max_y)
                         
-                        # If there's an overlap
-                        if max_y >= wall_min_y and min_y <= wall_max_y:
-                            overlap_min_y = max(min_y, wall_min_y)
-                            overlap_max_y = min(max_y, wall_max_y)
+                        # If the overlap is significant
+                        if overlap_max_y - overlap_min_y > 5:
+                            # Align the door/window exactly with the overlapping segment
+                            # Use the wall's exact x-coordinate for perfect alignment
+                            aligned_start = (wall.start[0], overlap_min_y)
+                            aligned_end = (wall.start[0], overlap_max_y)
                             
-                            # If the overlap is significant
-                            if overlap_max_y - overlap_min_y > 5:
-                                # Align the door/window exactly with the overlapping segment
-                                # Use the wall's exact x-coordinate for perfect alignment
-                                aligned_start = (wall.start[0], overlap_min_y)
-                                aligned_end = (wall.start[0], overlap_max_y)
-                                
-                                # Remove the original wall
-                                current_floor.walls.pop(i)
-                                
-                                # Create two new walls if needed (before and after the door/window)
-                                x = wall.start[0]
-                                if wall_min_y < overlap_min_y:
-                                    new_wall1 = Wall((x, wall_min_y), (x, overlap_min_y))
-                                    current_floor.add_wall(new_wall1)
-                                    
-                                if overlap_max_y < wall_max_y:
-                                    new_wall2 = Wall((x, overlap_max_y), (x, wall_max_y))
-                                    current_floor.add_wall(new_wall2)
+                            # Remove the original wall
+                            current_floor.remove_wall(wall)
+                            
+                            # Create two new walls if needed (before and after the door/window)
+                            x = wall.start[0]
+                            if wall_min_y < overlap_min_y:
+                                new_wall1 = Wall((x, wall_min_y), (x, overlap_min_y))
+                                current_floor.add_wall(new_wall1)
                                 
-                                return True, aligned_start, aligned_end
+                            if overlap_max_y < wall_max_y:
+                                new_wall2 = Wall((x, overlap_max_y), (x, wall_max_y))
+                                current_floor.add_wall(new_wall2)
+                            
+                            return True, aligned_start, aligned_end
         
         return False, start, end
 
@@ -1503,7 +1602,7 @@ class Controller:
         default_floor = Floor("Etage 0")
         
         # Reset all app state
-        self.floors = [default_floor]
+        self._set_floors([default_floor])
         self.selected_floor_index = 0
         self.current_tool = 'select'
         self.floor_count = 0
@@ -1526,6 +1625,7 @@ class Controller:
         
         # Reset plenum state
         self.the_plenum = None
+        self.plenum_exists = False
         
         # Clear the canvas
         ivy_bus.publish("clear_canvas_update", {})
@@ -1569,11 +1669,14 @@ class Controller:
     def handle_plenum_cleared(self, data):
         """Handle notification that the plenum has been cleared"""
         self.the_plenum = None
+        self.plenum_exists = False
         ivy_bus.publish("enable_tool_button", {"tool": "plenum"})
 
     def handle_duplicate_floor_request(self, data):
         """
-        Duplicates a floor with all its contents (walls, windows, doors, vents, plenums)
+        Duplicates a floor with all its contents (walls, windows, doors, vents, plenums),
+        count times (1 by default). The copies go above the source floor in one undo step,
+        and the View gets the new floor list once.
         """
         floor_index = data.get("floor_index")
         
@@ -1586,96 +1689,67 @@ class Controller:
             
         # Get the source floor to duplicate
         source_floor = self.floors[floor_index]
+        count = max(1, int(data.get("count", 1)))
         
-        # Create a new floor with a derived name
-        new_floor_name = f"{source_floor.name} (copie)"
-        
-        # Create a deep copy of the floor by serializing and deserializing
-        source_dict = source_floor.to_dict()
-        
-        # Create new floor with the new name
-        from model.floor import Floor
-        from model.wall import Wall
-        from model.window import Window
-        from model.door import Door
-        from model.vent import Vent
-        from model.plenum import Plenum
-        
-        new_floor = Floor(new_floor_name)
-        new_floor.height = source_dict["height"]
-        
-        # Copy walls
-        for wall_dict in source_dict["walls"]:
-            new_wall = Wall(tuple(wall_dict["start"]), tuple(wall_dict["end"]))
-            new_floor.add_wall(new_wall)
-            
-        # Copy windows
-        for window_dict in source_dict["windows"]:
-            new_window = Window(
-                tuple(window_dict["start"]), 
-                tuple(window_dict["end"]),
-                thickness=window_dict.get("thickness", 5)
-            )
-            new_floor.add_window(new_window)
-            
-        # Copy doors
-        for door_dict in source_dict["doors"]:
-            new_door = Door(
-                tuple(door_dict["start"]), 
-                tuple(door_dict["end"]),
-                thickness=door_dict.get("thickness", 5)
-            )
-            new_floor.add_door(new_door)
-            
-        # Copy vents
-        for vent_dict in source_dict["vents"]:
-            new_vent = Vent(
-                tuple(vent_dict["start"]),
-                tuple(vent_dict["end"]),
-                vent_dict.get("name", ""),
-                vent_dict.get("diameter", ""),
-                vent_dict.get("flow_rate", ""),
-                vent_dict.get("function", "extraction_interne"),
-                vent_dict.get("color", "#ff0000")
-            )
-            new_floor.add_vent(new_vent)
-            
-        # Copy plenums
-        if "plenums" in source_dict:
-            for plenum_dict in source_dict["plenums"]:
-                new_plenum = Plenum(
-                    tuple(plenum_dict["start"]),
-                    tuple(plenum_dict["end"]),
-                    max_flow=plenum_dict.get("max_flow", 1000)
-                )
-                new_plenum.type = plenum_dict.get("type")
-                new_plenum.area = plenum_dict.get("area")
-                new_floor.add_plenum(new_plenum)
-        
-        # Insert the new floor after the source floor
+        # Insert the new floors after the source floor, copying the objects directly
         insert_index = floor_index + 1
-        self.floors.insert(insert_index, new_floor)
-        
-        # Update selected floor index to the new floor
-        self.selected_floor_index = insert_index
-        
-        # Clear the canvas
-        ivy_bus.publish("clear_canvas_update", {})
-        
-        # Update the floor list and select the new floor
-        ivy_bus.publish("new_floor_update", {
-            "floors": [f.name for f in self.floors],
-            "selected_floor_index": self.selected_floor_index
-        })
-        
-        # Publish the height of the new floor
-        self._publish_height(new_floor)
+        with self.history.step("Dupliquer l'étage"):
+            for n in range(count):
+                name = f"{source_floor.name} (copie)" if count == 1 else f"{source_floor.name} (copie {n + 1})"
+                new_floor = source_floor.clone(name)
+                self._insert_floor(insert_index + n, new_floor)
+                self.history.record_floor(FLOOR_INSERTED, insert_index + n, new_floor)
         
-        # Request to draw the floor contents
+        # Show the first copy: redraws the canvas and sends the floor list once
         self.handle_floor_selected_request({"floor_index": insert_index})
-        
-        # Send onion skin preview if we're not on the first floor
-        if self.selected_floor_index > 0:
-            self._send_onion_skin_preview()
+        self.handle_get_ventilation_summary_request({})
             
-        print(f"[Controller] Duplicated floor {floor_index} ({source_floor.name}) to position {insert_index} ({new_floor_name})")
+        print(f"[Controller] Duplicated floor {floor_index} ({source_floor.name}) {count} time(s) from position {insert_index}")
+
+    def handle_undo_request(self, data):
+        with self._batched_view_update():
+            step = self.history.undo()
+        self._publish_history_step(step)
+
+    def handle_redo_request(self, data):
+        with self._batched_view_update():
+            step = self.history.redo()
+        self._publish_history_step(step)
+
+    def _publish_history_step(self, step):
+        """Bring the View up to date after an undo or redo, redrawing only what the step touched"""
+        if step is None:
+            return
+        print(f"[Controller] undo/redo: {step.label}")
+        self._set_selection([])
+
+        floor_changes = [details for _f, change, _o, details in step.changes
+                         if change in (FLOOR_INSERTED, FLOOR_REMOVED)]
+        touched_floors = [f for f in step.floors if any(f is other for other in self.floors)]
+        if self.selected_floor_index is None:
+            self.selected_floor_index = 0
+        self.selected_floor_index = min(self.selected_floor_index, len(self.floors) - 1)
+        selected_floor = self.floors[self.selected_floor_index]
+
+        if floor_changes:
+            # The floor list changed: show the floor where it happened
+            index = min(floor_changes[-1]["index"], len(self.floors) - 1)
+            self.handle_floor_selected_request({"floor_index": index})
+        elif touched_floors and all(f is not selected_floor for f in touched_floors):
+            # The step happened on another floor: go there to show it
+            self.handle_floor_selected_request({"floor_index": self.floors.index(touched_floors[0])})
+        else:
+            # The objects themselves were redrawn by the floor events
+            if any(f is selected_floor and obj is not None for f, _c, obj, _d in step.changes):
+                self._publish_plenum_state()
+
+            changes = {change for _f, change, _o, _d in step.changes}
+            if "height" in changes:
+                self._publish_height(selected_floor)
+            if "renamed" in changes:
+                ivy_bus.publish("new_floor_update", {
+                    "floors": [f.name for f in self.floors],
+                    "selected_floor_index": self.selected_floor_index
+                })
+
+        self.handle_get_ventilation_summary_request({})
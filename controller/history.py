@@ -0,0 +1,168 @@
+"""
+Undo/redo history of the edits.
+
+The floors report every change to their observers (see Floor._changed):
+an object added, removed or moved, a new height, a new name. The history
+keeps these changes as they come, which is all an undo needs: an added
+object is removed again, a moved object goes back to its old end points.
+Nothing is copied, the records point at the objects themselves.
+
+Changes made while a step is open (History.step()) form one undo step, so
+a door cutting a wall (the wall removed, its two remaining parts added,
+the door added) is undone at once. Adding and removing floors is recorded
+by the controller with record_floor().
+
+The history is bounded by a memory budget rather than a number of steps:
+the oldest steps are dropped once their estimated size goes over it.
+"""
+from contextlib import contextmanager
+from itertools import groupby
+
+MAX_HISTORY_BYTES = 4 * 1024 * 1024
+# Rough size of one recorded change, and of each object of a floor added or removed whole
+CHANGE_BYTES = 200
+OBJECT_BYTES = 300
+
+FLOOR_INSERTED = "floor_inserted"
+FLOOR_REMOVED = "floor_removed"
+
+
+class Step:
+    """The changes of one user action, in the order they were made"""
+
+    def __init__(self, label):
+        self.label = label
+        self.changes = []   # (floor, change, obj, details)
+        self.size = 0
+
+    def add(self, floor, change, obj, details):
+        self.changes.append((floor, change, obj, details))
+        self.size += CHANGE_BYTES
+        if change in (FLOOR_INSERTED, FLOOR_REMOVED):
+            self.size += OBJECT_BYTES * (len(floor.objects) + len(floor.vents) + len(floor.plenums))
+
+    @property
+    def floors(self):
+        """Floors touched by the step, in order"""
+        return list(dict.fromkeys(floor for floor, _c, _o, _d in self.changes))
+
+
+class History:
+    """
+    Undo and redo stacks of Steps.
+
+    Args:
+        insert_floor: callable(index, floor) putting a floor back in the project
+        remove_floor: callable(index) taking a floor out of the project
+        max_bytes: memory budget of the undo stack
+    """
+
+    def __init__(self, insert_floor, remove_floor, max_bytes=MAX_HISTORY_BYTES):
+        self.insert_floor = insert_floor
+        self.remove_floor = remove_floor
+        self.max_bytes = max_bytes
+        self.undo_stack = []
+        self.redo_stack = []
+        self.size = 0
+        self._open = None
+        self._replaying = False
+
+    @contextmanager
+    def step(self, label):
+        """Group the changes made inside the block in one step; nested steps join the outer one"""
+        if self._open is not None:
+            yield self._open
+            return
+        self._open = Step(label)
+        try:
+            yield self._open
+        finally:
+            step, self._open = self._open, None
+            if step.changes:
+                self._push(step)
+
+    def record(self, floor, change, obj=None, details=None):
+        """Floor observer: keep a change (ignored while undoing or redoing)"""
+        if self._replaying:
+            return
+        if self._open is None:
+            with self.step(change):
+                self._open.add(floor, change, obj, details or {})
+        else:
+            self._open.add(floor, change, obj, details or {})
+
+    def record_floor(self, change, index, floor):
+        """Keep a floor inserted at, or removed from, index"""
+        self.record(floor, change, None, {"index": index})
+
+    def _push(self, step):
+        self.undo_stack.append(step)
+        self.size += step.size
+        self.redo_stack.clear()
+        # Keep at least the last step, whatever its size
+        while self.size > self.max_bytes and len(self.undo_stack) > 1:
+            self.size -= self.undo_stack.pop(0).size
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def undo(self):
+        """Revert the last step. Returns it, or None when there is nothing to undo."""
+        if not self.undo_stack:
+            return None
+        step = self.undo_stack.pop()
+        self.size -= step.size
+        self._replay(reversed(step.changes), undo=True)
+        self.redo_stack.append(step)
+        return step
+
+    def redo(self):
+        """Apply the last undone step again. Returns it, or None."""
+        if not self.redo_stack:
+            return None
+        step = self.redo_stack.pop()
+        self._replay(step.changes, undo=False)
+        self.undo_stack.append(step)
+        self.size += step.size
+        return step
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.size = 0
+
+    def _replay(self, changes, undo):
+        self._replaying = True
+        try:
+            # A run of moves on one floor (a moved selection) is replayed in one call
+            for (floor, moved), run in groupby(changes, key=lambda c: (c[0], c[1] == "moved")):
+                if moved:
+                    run = list(run)
+                    floor.move_objects([obj for _f, _c, obj, _d in run],
+                                       [details["old" if undo else "new"] for _f, _c, _o, details in run])
+                    continue
+                for floor, change, obj, details in run:
+                    self._apply(floor, change, obj, details, undo)
+        finally:
+            self._replaying = False
+
+    def _apply(self, floor, change, obj, details, undo):
+        if change in ("added", "removed"):
+            if (change == "added") == undo:
+                floor.remove_object(obj)
+            else:
+                floor.add_object(obj)
+        elif change == "moved":
+            floor.move_object(obj, *details["old" if undo else "new"])
+        elif change == "height":
+            floor.set_height(details["old" if undo else "new"])
+        elif change == "renamed":
+            floor.rename(details["old" if undo else "new"])
+        elif change in (FLOOR_INSERTED, FLOOR_REMOVED):
+            if (change == FLOOR_INSERTED) == undo:
+                self.remove_floor(details["index"])
+            else:
+                self.insert_floor(details["index"], floor)
@@ -0,0 +1,271 @@
+"""
+Duct networks of a project and their pressure drops.
+
+The plans do not draw the ducts, so each network is laid out the way a
+VMC installer would run it: a vertical riser through every floor at the
+centre of the plenum, and on each floor a rectilinear branch from the
+riser to each vent. A plenum serves the vents of its kind (a simple flux
+plenum only extracts, a double flux plenum also blows air in), each vent
+going to the nearest plenum that can serve it; extraction and insufflation
+are separate networks.
+
+The solver works on all the segments of a network at once with NumPy:
+flows, diameters and lengths are arrays, velocities and pressure drops
+(Darcy-Weisbach, Swamee-Jain friction factor) are array expressions, and
+flows and pressures are accumulated along the tree one depth level at a
+time (a handful of levels: the floors of the riser, then the branches). The fan of a plenum must move the total flow of each of
+its networks (checked against Plenum.max_flow) at the pressure of the
+worst path.
+"""
+from math import pi
+
+import numpy as np
+
+from model.units import PIXELS_PER_METER, known
+from model.ventilation import INFLOW_FUNCTIONS, OUTFLOW_FUNCTIONS
+
+AIR_DENSITY = 1.2               # kg/m³
+AIR_VISCOSITY = 1.5e-5          # m²/s, kinematic
+DUCT_ROUGHNESS = 0.15e-3        # m, galvanised steel
+# Singular losses (bends, tees, terminal) per segment, as a number of dynamic pressures
+BRANCH_LOSS_FACTOR = 1.5
+RISER_LOSS_FACTOR = 0.3
+DEFAULT_TERMINAL_DIAMETER = 125  # mm, for vents whose diameter is unknown
+# Riser sections are sized to stay under this velocity, from the standard diameters
+RISER_VELOCITY = 4.0            # m/s
+STANDARD_DIAMETERS = (80, 100, 125, 160, 200, 250, 315, 355, 400, 450, 500, 560, 630)
+MAX_BRANCH_VELOCITY = 3.0       # m/s, above this a terminal branch is noisy
+
+EXTRACTION = "extraction"
+INSUFFLATION = "insufflation"
+NETWORK_FUNCTIONS = {EXTRACTION: OUTFLOW_FUNCTIONS, INSUFFLATION: INFLOW_FUNCTIONS}
+
+
+def floor_elevations(floors):
+    """Elevation (m) of each floor, the first floor at 0"""
+    elevations = []
+    level = 0.0
+    for floor in floors:
+        elevations.append(level)
+        level += float(floor.height)
+    return elevations
+
+
+def riser_diameter(flow):
+    """Smallest standard diameter (mm) keeping a flow (m³/h) under RISER_VELOCITY"""
+    needed = 1000 * (4 * flow / 3600 / (pi * RISER_VELOCITY)) ** 0.5
+    for diameter in STANDARD_DIAMETERS:
+        if diameter >= needed:
+            return diameter
+    return STANDARD_DIAMETERS[-1]
+
+
+class DuctNetwork:
+    """
+    One network (extraction or insufflation) of a plenum, as a tree of segments.
+
+    Segments are stored parent first: segment i carries the air between
+    node i + 1 and its parent node parents[i] (node 0 is the plenum).
+    """
+
+    def __init__(self, plenum, floor_index, kind):
+        self.plenum = plenum
+        self.floor_index = floor_index
+        self.kind = kind
+        self.terminals = []     # (vent, floor index, segment index of its branch)
+        self.parents = []
+        self.lengths = []       # m
+        self.diameters = []     # mm
+        self.loss_factors = []
+        self.labels = []
+        self.result = None
+
+    def _add_segment(self, parent, length, diameter, loss_factor, label):
+        self.parents.append(parent)
+        self.lengths.append(length)
+        self.diameters.append(diameter)
+        self.loss_factors.append(loss_factor)
+        self.labels.append(label)
+        return len(self.parents)  # Node at the far end of the new segment
+
+    @property
+    def total_flow(self):
+        return sum(known(vent.flow_rate) for vent, _floor, _segment in self.terminals)
+
+    def build(self, vents_by_floor, floors, elevations, branch_lengths=None):
+        """
+        Lay out the riser and the branches for the vents of each floor.
+        Branches are straight rectilinear runs, or the lengths (m) given by
+        vent ID in branch_lengths (see duct_routing.py).
+        """
+        branch_lengths = branch_lengths or {}
+        cx = (self.plenum.start[0] + self.plenum.end[0]) / 2
+        cy = (self.plenum.start[1] + self.plenum.end[1]) / 2
+        floor_nodes = {self.floor_index: 0}
+        # Riser up and down from the plenum floor, one section per floor crossed
+        served = sorted(vents_by_floor)
+        for step, stop in ((1, max(served, default=self.floor_index)),
+                           (-1, min(served, default=self.floor_index))):
+            node = 0
+            for index in range(self.floor_index + step, stop + step, step):
+                length = abs(elevations[index] - elevations[index - step])
+                node = self._add_segment(node, length, None, RISER_LOSS_FACTOR,
+                                         f"Colonne {floors[index - step].name} - {floors[index].name}")
+                floor_nodes[index] = node
+
+        for index in served:
+            for vent in vents_by_floor[index]:
+                x, y = vent.start
+                length = branch_lengths.get(vent.id)
+                if length is None:
+                    length = (abs(x - cx) + abs(y - cy)) / PIXELS_PER_METER
+                diameter = vent.diameter if vent.diameter else DEFAULT_TERMINAL_DIAMETER
+                node = self._add_segment(floor_nodes[index], length, diameter, BRANCH_LOSS_FACTOR,
+                                         f"{floors[index].name} : {vent.name}")
+                self.terminals.append((vent, index, node - 1))
+
+        self._index()
+        # Size the riser sections from the flow they carry
+        flows = self._segment_flows()
+        for i, diameter in enumerate(self.diameters):
+            if diameter is None:
+                self.diameters[i] = riser_diameter(flows[i])
+        return self
+
+    def _index(self):
+        """Arrays of the tree: upstream segment of each segment, segments grouped by depth"""
+        upstream = np.array(self.parents, dtype=int) - 1     # -1: connected to the plenum
+        depths = np.zeros(len(upstream), dtype=int)
+        for i, up in enumerate(upstream):
+            if up >= 0:
+                depths[i] = depths[up] + 1
+        self._upstream = upstream
+        self._levels = [np.flatnonzero(depths == depth) for depth in range(1, depths.max(initial=0) + 1)]
+        self._terminal_segments = np.array([segment for _v, _f, segment in self.terminals], dtype=int)
+
+    def _segment_flows(self):
+        # Air through a segment is the sum of the terminal flows downstream of it,
+        # accumulated from the deepest segments up, one level at a time
+        flows = np.zeros(len(self.parents))
+        flows[self._terminal_segments] = [known(vent.flow_rate) for vent, _floor, _segment in self.terminals]
+        for level in reversed(self._levels):
+            np.add.at(flows, self._upstream[level], flows[level])
+        return flows
+
+    def solve(self):
+        """Velocity and pressure drop of every segment, pressure of every terminal"""
+        flows = self._segment_flows()
+        diameters = np.array(self.diameters, float) / 1000
+        lengths = np.array(self.lengths, float)
+        zetas = np.array(self.loss_factors, float)
+
+        sections = pi * diameters ** 2 / 4
+        velocities = flows / 3600 / sections
+        reynolds = np.maximum(velocities * diameters / AIR_VISCOSITY, 1.0)
+        # Swamee-Jain (turbulent), 64/Re below the laminar limit
+        turbulent = 0.25 / np.log10(DUCT_ROUGHNESS / (3.7 * diameters) + 5.74 / reynolds ** 0.9) ** 2
+        friction = np.where(reynolds < 2300, 64 / reynolds, turbulent)
+        dynamic = AIR_DENSITY * velocities ** 2 / 2
+        drops = (friction * lengths / diameters + zetas) * dynamic
+
+        # Pressure from the plenum to the end of each segment, accumulated down the tree
+        pressures = drops.copy()
+        for level in self._levels:
+            pressures[level] += pressures[self._upstream[level]]
+
+        self.result = {
+            "flows": flows,
+            "velocities": velocities,
+            "pressure_drops": drops,
+            "terminal_pressures": pressures[self._terminal_segments],
+        }
+        return self.result
+
+    @property
+    def fan_pressure(self):
+        """Pa, the pressure of the worst path (index circuit)"""
+        result = self.result or self.solve()
+        pressures = result["terminal_pressures"]
+        return float(pressures.max()) if len(pressures) else 0.0
+
+    @property
+    def fan_capacity_ok(self):
+        """Whether the plenum can move the flow of this network (True when max_flow is unknown)"""
+        max_flow = self.plenum.max_flow
+        return max_flow is None or self.total_flow <= max_flow
+
+    def noisy_branches(self):
+        """Labels of the terminal branches above MAX_BRANCH_VELOCITY"""
+        velocities = (self.result or self.solve())["velocities"]
+        return [self.labels[segment] for _vent, _floor, segment in self.terminals
+                if velocities[segment] > MAX_BRANCH_VELOCITY]
+
+    def to_dict(self):
+        result = self.result or self.solve()
+        return {
+            "kind": self.kind,
+            "floor_index": self.floor_index,
+            "plenum_type": self.plenum.type,
+            "max_flow": self.plenum.max_flow,
+            "total_flow": self.total_flow,
+            "fan_capacity_ok": self.fan_capacity_ok,
+            "fan_pressure": round(self.fan_pressure, 1),
+            "max_velocity": round(float(result["velocities"].max()), 2) if self.parents else 0.0,
+            "segments": len(self.parents),
+            "noisy_branches": self.noisy_branches(),
+        }
+
+
+def build_networks(floors, branch_lengths=None):
+    """
+    Duct networks of a project: one per plenum and per kind of air it moves.
+
+    Vents are served by the nearest plenum able to serve them (distance
+    along the plan plus the height between floors); vents no plenum can
+    serve are left out. branch_lengths (m, by vent ID) replaces the
+    straight branch runs, e.g. with routed ones.
+    """
+    elevations = floor_elevations(floors)
+    plenums = [(plenum, index) for index, floor in enumerate(floors) for plenum in floor.plenums]
+    networks = {}
+    vents = {}  # network key -> floor index -> vents
+    for floor_index, floor in enumerate(floors):
+        for vent in floor.vents:
+            kind = next((k for k, functions in NETWORK_FUNCTIONS.items() if vent.function in functions), None)
+            if kind is None:
+                continue
+            candidates = [(plenum, index) for plenum, index in plenums
+                          if kind == EXTRACTION or plenum.type == "Double"]
+            if not candidates:
+                continue
+
+            def distance(candidate):
+                plenum, index = candidate
+                cx = (plenum.start[0] + plenum.end[0]) / 2
+                cy = (plenum.start[1] + plenum.end[1]) / 2
+                return ((abs(vent.start[0] - cx) + abs(vent.start[1] - cy)) / PIXELS_PER_METER
+                        + abs(elevations[floor_index] - elevations[index]))
+
+            plenum, index = min(candidates, key=distance)
+            key = (plenum.id, kind)
+            if key not in networks:
+                networks[key] = DuctNetwork(plenum, index, kind)
+            vents.setdefault(key, {}).setdefault(floor_index, []).append(vent)
+
+    return [network.build(vents[key], floors, elevations, branch_lengths)
+            for key, network in networks.items()]
+
+
+_networks_cache = (None, None)
+
+
+def project_networks(floors):
+    """build_networks() solved, reused until a floor changes (by Floor.version)"""
+    global _networks_cache
+    key = tuple((id(floor), floor.version) for floor in floors)
+    if _networks_cache[0] != key:
+        networks = build_networks(floors)
+        for network in networks:
+            network.solve()
+        _networks_cache = (key, networks)
+    return _networks_cache[1]
@@ -0,0 +1,273 @@
+"""
+Automatic routing of the duct branches on each floor.
+
+A floor is rasterized into a grid of GRID_STEP pixels. Free cells cost 1,
+cells on a wall cost WALL_COST (the duct has to go through it), door
+cells cost 1 and window cells are blocked. A Dijkstra run from the riser
+(the centre of the plenum, see duct_network.py) gives the distance of
+every cell; each vent then walks back down the field to the riser,
+keeping its direction on ties so the branches have as few bends as
+possible. One distance field serves every vent on the floor.
+
+Obstacle grids and distance fields are cached per floor version, and
+route_building() routes the floors in a process pool, since they are
+independent of each other. The caches live in the process that routes:
+the pool workers send their grids and fields back with the routes, so
+the calling process keeps them and only floors that changed since the
+last routing go to the pool again. batch.py routes the floors of a single
+project with its pool (--jobs), and each project of a batch inside one
+worker (processes=1), where a floor's grid is built once and serves all
+its risers.
+"""
+import heapq
+from multiprocessing import Pool
+from weakref import WeakKeyDictionary
+
+import numpy as np
+
+from model.units import PIXELS_PER_METER
+from model.duct_network import build_networks
+
+GRID_STEP = 10          # px, half a metre
+WALL_COST = 50          # Going through a wall costs as much as 50 cells of run
+MARGIN = 5              # Free cells around the plan
+BLOCKED = 0             # Cost of a cell the ducts cannot use
+
+_DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+# floor -> (version, origin, shape) -> obstacle grid, and
+# floor -> (version, origin, shape, source) -> distance field
+_grids = WeakKeyDictionary()
+_fields = WeakKeyDictionary()
+
+
+def _cached(cache, floor, key):
+    """Entries of floor in cache, dropping those of older versions"""
+    entries = cache.setdefault(floor, {})
+    for old in [k for k in entries if k[0] != key[0]]:
+        del entries[old]
+    return entries
+
+
+def plan_bounds(floors):
+    """Grid origin (px) and shape (rows, columns) covering the geometry of all floors"""
+    points = [p for floor in floors
+              for obj in floor.walls + floor.doors + floor.windows + floor.vents + floor.plenums
+              for p in (obj.start, obj.end)]
+    if not points:
+        return (0, 0), (1, 1)
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    x0 = int(min(xs) // GRID_STEP) - MARGIN
+    y0 = int(min(ys) // GRID_STEP) - MARGIN
+    columns = int(max(xs) // GRID_STEP) - x0 + MARGIN + 1
+    rows = int(max(ys) // GRID_STEP) - y0 + MARGIN + 1
+    return (x0 * GRID_STEP, y0 * GRID_STEP), (rows, columns)
+
+
+def _cell(point, origin):
+    return (int((point[1] - origin[1]) // GRID_STEP), int((point[0] - origin[0]) // GRID_STEP))
+
+
+def _center(cell, origin):
+    return (origin[0] + (cell[1] + 0.5) * GRID_STEP, origin[1] + (cell[0] + 0.5) * GRID_STEP)
+
+
+def _paint(grid, origin, start, end, cost):
+    (r1, c1), (r2, c2) = _cell(start, origin), _cell(end, origin)
+    grid[min(r1, r2):max(r1, r2) + 1, min(c1, c2):max(c1, c2) + 1] = cost
+
+
+def obstacle_grid(floor, origin, shape):
+    """Cost of each cell of the floor (BLOCKED for windows), cached per floor version"""
+    key = (floor.version, origin, shape)
+    grids = _cached(_grids, floor, key)
+    if key not in grids:
+        grid = np.ones(shape, dtype=np.int32)
+        for wall in floor.walls:
+            _paint(grid, origin, wall.start, wall.end, WALL_COST)
+        for window in floor.windows:
+            _paint(grid, origin, window.start, window.end, BLOCKED)
+        for door in floor.doors:
+            _paint(grid, origin, door.start, door.end, 1)
+        grids[key] = grid
+    return grids[key]
+
+
+def distance_field(floor, origin, shape, source):
+    """
+    Cost of the cheapest rectilinear run from source (px) to every cell,
+    cached per floor version and source. Unreachable cells are infinite.
+    """
+    key = (floor.version, origin, shape, source)
+    fields = _cached(_fields, floor, key)
+    if key in fields:
+        return fields[key]
+
+    grid = obstacle_grid(floor, origin, shape)
+    rows, columns = shape
+    # Flat cell indexes over the grid padded with a blocked border: no bounds checks
+    width = columns + 2
+    costs = np.pad(grid, 1, constant_values=BLOCKED).ravel().tolist()
+    steps = (1, -1, width, -width)
+    best = [float("inf")] * len(costs)
+    r, c = _cell(source, origin)
+    start = (r + 1) * width + c + 1
+    best[start] = 0
+    queue = [(0, start)]
+    pop, push = heapq.heappop, heapq.heappush
+    while queue:
+        distance, index = pop(queue)
+        if distance > best[index]:
+            continue
+        for step in steps:
+            neighbour = index + step
+            cost = costs[neighbour]
+            if cost != BLOCKED and distance + cost < best[neighbour]:
+                best[neighbour] = distance + cost
+                push(queue, (distance + cost, neighbour))
+    distances = np.array(best).reshape(rows + 2, width)[1:-1, 1:-1].copy()
+    fields[key] = distances
+    return distances
+
+
+def trace(field, grid, origin, target):
+    """
+    Path (px corner points) from target down the distance field to its
+    source, or None if the target cannot be reached.
+    """
+    rows, columns = field.shape
+    cell = _cell(target, origin)
+    if not (0 <= cell[0] < rows and 0 <= cell[1] < columns) or np.isinf(field[cell]):
+        return None
+
+    cells = [cell]
+    direction = None
+    while field[cell] > 0:
+        r, c = cell
+        previous = None
+        # The next cell is one the run came from: its distance plus the cost of this cell.
+        # Keep going straight when there is a choice.
+        options = ([direction] if direction else []) + [d for d in _DIRECTIONS if d != direction]
+        for dr, dc in options:
+            nr, nc = r + dr, c + dc
+            if (0 <= nr < rows and 0 <= nc < columns
+                    and field[nr, nc] + grid[r, c] == field[r, c]):
+                previous = (nr, nc)
+                direction = (dr, dc)
+                break
+        if previous is None:
+            return None
+        cell = previous
+        cells.append(cell)
+
+    # Keep the corners only
+    corners = [cells[0]]
+    for before, here, after in zip(cells, cells[1:], cells[2:]):
+        if (here[0] - before[0], here[1] - before[1]) != (after[0] - here[0], after[1] - here[1]):
+            corners.append(here)
+    if len(cells) > 1:
+        corners.append(cells[-1])
+    return [_center(c, origin) for c in corners]
+
+
+def path_length(path):
+    """Length of a path in m"""
+    return sum(abs(x2 - x1) + abs(y2 - y1) for (x1, y1), (x2, y2) in zip(path, path[1:])) / PIXELS_PER_METER
+
+
+def route_floor(floor, origin, shape, requests):
+    """
+    Route the branches of one floor.
+
+    Args:
+        requests: list of (riser point, [(vent id, vent point), ...])
+
+    Returns:
+        dict: vent id -> path (list of points), or None when unreachable
+    """
+    grid = obstacle_grid(floor, origin, shape)
+    routes = {}
+    for source, targets in requests:
+        field = distance_field(floor, origin, shape, source)
+        for vent_id, point in targets:
+            routes[vent_id] = trace(field, grid, origin, point)
+    return routes
+
+
+def _is_cached(floor, origin, shape, requests):
+    fields = _fields.get(floor, {})
+    return all((floor.version, origin, shape, source) in fields for source, _targets in requests)
+
+
+def _route_job(job):
+    floor, origin, shape, requests = job
+    routes = route_floor(floor, origin, shape, requests)
+    # Sent back with the routes, so the calling process can cache them
+    fields = {source: distance_field(floor, origin, shape, source) for source, _targets in requests}
+    return routes, obstacle_grid(floor, origin, shape), fields
+
+
+def _keep(floor, origin, shape, grid, fields):
+    """Cache the grid and fields computed for floor in a pool worker"""
+    key = (floor.version, origin, shape)
+    _cached(_grids, floor, key)[key] = grid
+    for source, field in fields.items():
+        key = (floor.version, origin, shape, source)
+        _cached(_fields, floor, key)[key] = field
+
+
+def route_building(floors, networks=None, processes=None):
+    """
+    Route every branch of the duct networks, the floors in parallel.
+
+    Args:
+        networks: from duct_network.build_networks(); built when omitted
+        processes: size of the process pool; 1 routes in the current process
+
+    Returns:
+        dict: vent id -> path, or None for vents that could not be reached
+    """
+    if networks is None:
+        networks = build_networks(floors)
+    origin, shape = plan_bounds(floors)
+
+    requests = {}  # floor index -> riser point -> targets
+    for network in networks:
+        plenum = network.plenum
+        riser = ((plenum.start[0] + plenum.end[0]) / 2, (plenum.start[1] + plenum.end[1]) / 2)
+        for vent, floor_index, _segment in network.terminals:
+            requests.setdefault(floor_index, {}).setdefault(riser, []).append((vent.id, vent.start))
+
+    jobs = [(floors[index], origin, shape, list(by_riser.items()))
+            for index, by_riser in sorted(requests.items())]
+    # Floors whose fields are already cached here only need their paths traced
+    remote = [job for job in jobs if not _is_cached(*job)]
+    if processes == 1 or len(remote) <= 1:
+        results = [route_floor(*job) for job in jobs]
+    else:
+        results = [route_floor(*job) for job in jobs if _is_cached(*job)]
+        with Pool(processes=processes) as pool:
+            for job, (routes, grid, fields) in zip(remote, pool.map(_route_job, remote)):
+                _keep(job[0], job[1], job[2], grid, fields)
+                results.append(routes)
+
+    routes = {}
+    for result in results:
+        routes.update(result)
+    return routes
+
+
+def routed_networks(floors, processes=None):
+    """
+    Duct networks whose branch lengths follow the routed paths, solved.
+
+    Returns:
+        (networks, routes): routes as returned by route_building()
+    """
+    routes = route_building(floors, processes=processes)
+    lengths = {vent_id: path_length(path) for vent_id, path in routes.items() if path}
+    networks = build_networks(floors, lengths)
+    for network in networks:
+        network.solve()
+    return networks, routes
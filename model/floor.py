@@ -1,5 +1,49 @@
+import copy
+from collections import Counter
+
+import numpy as np
+
+from model.object import new_object_id
+from model.wall import Wall
+from model.window import Window
+from model.door import Door
+from model.vent import Vent
+from model.plenum import Plenum
+from model.ventilation import VentilationStats
+from model.wall_graph import WallGraph, snap_segments, merge_collinear, SNAP_TOLERANCE
+from model.rooms import room_outlines, rooms_from_outlines
+from model.regulation import DwellingCheck
+from model.snapping import SnapIndex
+from model.selection import SelectionIndex, object_points
+from model.geometry_check import check_structure, merged_duplicates, vents_outside
+from model.snapshot import KINDS, FloorSnapshot, ObjectRecord, PersistentList
+
+
+def kind_of(obj):
+    """Kind of a plan object: "wall", "window", "door", "vent" or "plenum" """
+    # Subclasses first: vents, doors and windows are walls too
+    for cls, kind in ((Vent, "vent"), (Door, "door"), (Window, "window"),
+                      (Plenum, "plenum"), (Wall, "wall")):
+        if isinstance(obj, cls):
+            return kind
+    raise TypeError(f"objet inconnu : {obj!r}")
+
+
+def copy_object(obj):
+    """A copy of a plan object with a new ID"""
+    duplicate = copy.copy(obj)
+    duplicate.id = new_object_id()
+    return duplicate
+
+
+def _same_structure(cache, key):
+    """Whether a (key, value) cache was made from the same wall, window and door records"""
+    return cache is not None and all(a is b for a, b in zip(cache[0], key))
+
+
 class Floor:
     def __init__(self, name):
+        self.id = new_object_id()
         self.name = name
         self.objects = []
         self.walls = []
@@ -8,27 +52,291 @@ class Floor:
         self.vents = []
         self.height = 2.5
         self.plenums = []
+        # Parts of walls that overlapped before the whole floor was normalized (reported as DUPLICATE)
+        self.merged_overlaps = []
+        self.stats = VentilationStats()
+        # Bumped by every change, so derived data (wall graph, rooms...) can be cached
+        self.version = 0
+        self._wall_graph = None
+        self._rooms = None
+        self._room_outlines = None
+        self._ventilation_check = None
+        self._snap_index = None
+        self._selection_index = None
+        self._structure_check = None
+        # observer(floor, change, obj, details) is called after every change
+        self._observers = []
+        # Frozen copy of the objects, kept up to date by _changed(), see snapshot.py
+        self._records = {kind: PersistentList() for kind in KINDS}
+        self._snapshot = None
+
+    def __getstate__(self):
+        # Observers belong to the running application, caches are rebuilt on demand
+        state = self.__dict__.copy()
+        state.update(_observers=[], _wall_graph=None, _rooms=None, _room_outlines=None, _ventilation_check=None,
+                     _snap_index=None, _selection_index=None, _structure_check=None,
+                     _snapshot=None)
+        return state
+
+    def add_observer(self, observer):
+        if observer not in self._observers:
+            self._observers.append(observer)
+
+    def remove_observer(self, observer):
+        if observer in self._observers:
+            self._observers.remove(observer)
+
+    def touch(self):
+        self.version += 1
+
+    def _changed(self, change, obj=None, position=None, **details):
+        """
+        Bump the version and tell the observers. change is "added", "removed"
+        or "moved" (obj is the object), "height" or "renamed"; details hold
+        the old and new values. position is the index of a removed or moved
+        object in the list of its kind, the same as in its records.
+        """
+        self.touch()
+        if obj is not None:
+            kind = kind_of(obj)
+            records = self._records[kind]
+            if change == "added":
+                records = records.append(ObjectRecord.of(kind, obj))
+            elif change == "removed":
+                records = records.delete(position)
+            else:
+                records = records.set(position, ObjectRecord.of(kind, obj))
+            self._records[kind] = records
+        for observer in list(self._observers):
+            observer(self, change, obj, details)
+
+    def _take(self, items, obj):
+        """Remove obj from one of the object lists, returning the index it had"""
+        position = items.index(obj)
+        del items[position]
+        return position
 
     def add_wall(self, wall):
         self.walls.append(wall)
         self.objects.append(wall)
+        self._changed("added", wall)
+
+    def remove_wall(self, wall):
+        position = self._take(self.walls, wall)
+        self.objects.remove(wall)
+        self._changed("removed", wall, position)
 
     def add_door(self, door):
         self.doors.append(door)
         self.objects.append(door)
+        self._changed("added", door)
+
+    def remove_door(self, door):
+        position = self._take(self.doors, door)
+        self.objects.remove(door)
+        self._changed("removed", door, position)
 
     def add_window(self, window):
         self.windows.append(window)
         self.objects.append(window)
+        self._changed("added", window)
+
+    def remove_window(self, window):
+        position = self._take(self.windows, window)
+        self.objects.remove(window)
+        self._changed("removed", window, position)
 
     def add_vent(self, vent):
         self.vents.append(vent)
+        self.stats.add_vent(vent)
+        self._changed("added", vent)
+
+    def remove_vent(self, vent):
+        position = self._take(self.vents, vent)
+        self.stats.remove_vent(vent)
+        self._changed("removed", vent, position)
     
     def set_height(self, value: float):
+        old = self.height
+        self.stats.change_height(self.height, value)
         self.height = value
+        self._changed("height", old=old, new=value)
+
+    def rename(self, name):
+        old = self.name
+        self.name = name
+        self._changed("renamed", old=old, new=name)
 
     def add_plenum(self, plenum):
         self.plenums.append(plenum)
+        self.stats.add_plenum(plenum, self.height)
+        self._changed("added", plenum)
+
+    def remove_plenum(self, plenum):
+        position = self._take(self.plenums, plenum)
+        self.stats.remove_plenum(plenum, self.height)
+        self._changed("removed", plenum, position)
+
+    def add_object(self, obj):
+        """Add any plan object to the list of its kind"""
+        getattr(self, f"add_{kind_of(obj)}")(obj)
+
+    def remove_object(self, obj):
+        getattr(self, f"remove_{kind_of(obj)}")(obj)
+
+    def move_object(self, obj, start, end, position=None):
+        """Move any plan object to new end points; position is its index in the list of its kind, if known"""
+        old = (obj.start, obj.end)
+        obj.start, obj.end = start, end
+        if isinstance(obj, Wall):
+            obj.orientation = obj._determine_orientation()
+        if position is None:
+            position = getattr(self, f"{kind_of(obj)}s").index(obj)
+        self._changed("moved", obj, position, old=old, new=(start, end))
+
+    def move_objects(self, objects, points):
+        """
+        Move objects to new end points, points being an array of shape (n, 2, 2)
+        as computed by model.selection.transform_points(), or a list of
+        (start, end). The positions of the objects are looked up once.
+        """
+        if hasattr(points, "tolist"):
+            points = points.tolist()
+        positions = {}
+        for kind in {kind_of(obj) for obj in objects}:
+            positions.update((id(obj), i) for i, obj in enumerate(getattr(self, f"{kind}s")))
+        for obj, (start, end) in zip(objects, points):
+            if (tuple(start), tuple(end)) != (tuple(obj.start), tuple(obj.end)):
+                self.move_object(obj, tuple(start), tuple(end), positions[id(obj)])
+
+    def _segments_around(self, edited, tolerance):
+        """Walls, windows and doors not in edited whose box comes within tolerance of an edited one"""
+        edited_ids = {id(obj) for obj in edited}
+        others = [o for o in self.walls + self.windows + self.doors if id(o) not in edited_ids]
+        if not others:
+            return []
+        points = object_points(others)
+        low, high = points.min(axis=1), points.max(axis=1)
+        near = np.zeros(len(others), dtype=bool)
+        for start, end in object_points(edited).tolist():
+            box_low = np.minimum(start, end) - tolerance
+            box_high = np.maximum(start, end) + tolerance
+            near |= ((high >= box_low) & (low <= box_high)).all(axis=1)
+        return [others[i] for i in np.flatnonzero(near)]
+
+    def normalize_walls(self, tolerance=SNAP_TOLERANCE, around=None):
+        """
+        Snap near-identical coordinates of walls, windows and doors, and merge
+        collinear walls that touch. Returns True if anything changed.
+
+        With around (the objects just drawn, moved or pasted), only those and
+        the segments within tolerance of them are looked at, and the
+        coordinates of the latter stay where they are: the rest of the floor
+        is left untouched. Without it, the overlapping parts of the walls
+        merged are kept in merged_overlaps for geometry_check().
+        """
+        if around is None:
+            walls, openings, fixed = list(self.walls), self.windows + self.doors, []
+        else:
+            present = {id(o) for o in self.walls + self.windows + self.doors}
+            edited = [o for o in around if id(o) in present]
+            if not edited:
+                return False
+            neighbours = self._segments_around(edited, tolerance)
+            local = edited + neighbours
+            walls = [o for o in local if kind_of(o) == "wall"]
+            openings = [o for o in edited if kind_of(o) != "wall"]
+            fixed = [(o.start, o.end) for o in neighbours]
+        segments = [(o.start, o.end) for o in walls + openings]
+        snapped = snap_segments(segments, tolerance, fixed)
+        overlaps = [] if around is None else None
+        wall_segments = merge_collinear(snapped[:len(walls)], overlaps)
+        if around is None:
+            self.merged_overlaps = overlaps
+
+        changed = False
+        for opening, (start, end) in zip(openings, snapped[len(walls):]):
+            if (opening.start, opening.end) != (start, end):
+                self.move_object(opening, start, end)
+                changed = True
+
+        # Only replace the walls that differ, so the change stays small
+        wanted = Counter(wall_segments)
+        for wall in walls:
+            key = tuple(sorted((wall.start, wall.end)))
+            if wanted[key] > 0:
+                wanted[key] -= 1
+            else:
+                self.remove_wall(wall)
+                changed = True
+        for (start, end), count in wanted.items():
+            for _ in range(count):
+                self.add_wall(Wall(start, end, straighten=False))
+                changed = True
+        return changed
+
+    def snapshot(self):
+        """Immutable FloorSnapshot of the current version; shares its data with the floor"""
+        if self._snapshot is None or self._snapshot.version != self.version:
+            self._snapshot = FloorSnapshot(self.name, self.height, self.version, self._records)
+        return self._snapshot
+
+    def wall_graph(self):
+        """Junction index of the walls, rebuilt only when the floor changed"""
+        if self._wall_graph is None or self._wall_graph[0] != self.version:
+            self._wall_graph = (self.version, WallGraph([(w.start, w.end) for w in self.walls]))
+        return self._wall_graph[1]
+
+    def snap_index(self):
+        """Snapping targets of the walls, doors and windows, rebuilt only when the floor changed"""
+        if self._snap_index is None or self._snap_index[0] != self.version:
+            self._snap_index = (self.version, SnapIndex(self.walls, self.windows + self.doors))
+        return self._snap_index[1]
+
+    def selection_index(self):
+        """Selection points of all the objects (see selection.py), rebuilt only when the floor changed"""
+        if self._selection_index is None or self._selection_index[0] != self.version:
+            objects = self.walls + self.windows + self.doors + self.vents + self.plenums
+            self._selection_index = (self.version, SelectionIndex(objects))
+        return self._selection_index[1]
+
+    def _structure_key(self):
+        """The wall, window and door records: replaced by every change to them"""
+        return self._records["wall"], self._records["window"], self._records["door"]
+
+    def rooms(self):
+        """
+        Rooms enclosed by the walls, doors and windows, rebuilt only when the
+        floor changed. The outlines are only traced again when the walls,
+        doors or windows changed: other changes just assign the vents.
+        """
+        if self._rooms is None or self._rooms[0] != self.version:
+            key = self._structure_key()
+            if not _same_structure(self._room_outlines, key):
+                outlines = room_outlines([(w.start, w.end) for w in self.walls],
+                                         [(o.start, o.end) for o in self.doors + self.windows])
+                self._room_outlines = (key, outlines)
+            self._rooms = (self.version, rooms_from_outlines(self._room_outlines[1], self.height, self.vents))
+        return self._rooms[1]
+
+    def ventilation_check(self):
+        """Regulatory flows of the rooms (the floor taken as one dwelling), cached like rooms()"""
+        if self._ventilation_check is None or self._ventilation_check[0] != self.version:
+            self._ventilation_check = (self.version, DwellingCheck(self.rooms()))
+        return self._ventilation_check[1]
+
+    def geometry_check(self):
+        """
+        Geometry problems of the floor (see geometry_check.py). The wall checks
+        are run again only when the walls, windows or doors changed: their
+        record lists are replaced by every change, so they tell it at once.
+        """
+        key = self._structure_key()
+        if not _same_structure(self._structure_check, key):
+            issues = check_structure(self.walls, self.windows + self.doors)
+            issues += merged_duplicates(self.merged_overlaps, self.walls, self.wall_graph())
+            self._structure_check = (key, issues)
+        return self._structure_check[1] + vents_outside(self.vents, self.rooms())
 
     def __repr__(self):
         return (f"<Floor '{self.name}' | "
@@ -39,13 +347,81 @@ class Floor:
                 f"{len(self.plenums)} plenums>")
 
     def to_dict(self):
-        return {
-            "name": self.name,
-            "height": self.height,
-            "walls":   [w.to_dict() for w in self.walls],
-            "windows": [w.to_dict() for w in self.windows],
-            "doors":   [d.to_dict() for d in self.doors],
-            "vents":   [v.to_dict() for v in self.vents],
-            "plenums": [p.to_dict() for p in self.plenums]
-        }
+        return self.snapshot().to_dict()
+
+    def clone(self, name=None):
+        """
+        A new floor with copies of the objects (new IDs), built in one go:
+        the object lists and their records are filled at once, without an
+        event per object. Used to duplicate floors.
+        """
+        floor_obj = Floor(self.name if name is None else name)
+        floor_obj.set_height(self.height)
+        copies = {}
+        for kind in KINDS:
+            items = []
+            for obj in getattr(self, f"{kind}s"):
+                copies[id(obj)] = copy_object(obj)
+                items.append(copies[id(obj)])
+            setattr(floor_obj, f"{kind}s", items)
+            floor_obj._records[kind] = PersistentList.of(ObjectRecord.of(kind, o) for o in items)
+        floor_obj.objects = [copies[id(obj)] for obj in self.objects]
+        for vent in floor_obj.vents:
+            floor_obj.stats.add_vent(vent)
+        for plenum in floor_obj.plenums:
+            floor_obj.stats.add_plenum(plenum, floor_obj.height)
+        floor_obj.touch()
+        return floor_obj
+
+    @staticmethod
+    def from_snapshot(snapshot, name=None):
+        """A new floor with new objects (new IDs) copied from a FloorSnapshot"""
+        floor_obj = Floor(snapshot.name if name is None else name)
+        floor_obj.set_height(snapshot.height)
+
+        for r in snapshot.walls:
+            floor_obj.add_wall(Wall(r.start, r.end, straighten=False))
+
+        for r in snapshot.windows:
+            floor_obj.add_window(Window(r.start, r.end, thickness=r.get("thickness")))
+
+        for r in snapshot.doors:
+            floor_obj.add_door(Door(r.start, r.end, thickness=r.get("thickness")))
+
+        for r in snapshot.vents:
+            attributes = dict(r.attributes)
+            floor_obj.add_vent(Vent(r.start, r.end, attributes["name"], attributes["diameter"],
+                                    attributes["flow_rate"], attributes["function"], attributes["color"]))
+
+        for r in snapshot.plenums:
+            plenum = Plenum(r.start, r.end, max_flow=r.get("max_flow"))
+            plenum.type = r.get("type")
+            plenum.area = r.get("area")
+            floor_obj.add_plenum(plenum)
+
+        return floor_obj
+
+    @staticmethod
+    def from_dict(data):
+        """Build a floor from a dict normalized by model.schema.normalize_floor()."""
+        floor_obj = Floor(data["name"])
+        floor_obj.set_height(data["height"])
+
+        for w in data["walls"]:
+            floor_obj.add_wall(Wall(tuple(w["start"]), tuple(w["end"]), straighten=False))
+
+        for w in data["windows"]:
+            floor_obj.add_window(Window(tuple(w["start"]), tuple(w["end"]), thickness=w["thickness"]))
+
+        for d in data["doors"]:
+            floor_obj.add_door(Door(tuple(d["start"]), tuple(d["end"]), thickness=d["thickness"]))
+
+        for v in data["vents"]:
+            floor_obj.add_vent(Vent(tuple(v["start"]), tuple(v["end"]),
+                                    v["name"], v["diameter"], v["flow_rate"],
+                                    v["function"], v["color"]))
+
+        for p in data["plenums"]:
+            floor_obj.add_plenum(Plenum.from_dict(p))
 
+        return floor_obj
@@ -0,0 +1,190 @@
+"""
+Geometry checks of a floor plan.
+
+Imported or hand-drawn plans collect mistakes that the drawing tools do
+not catch and that skew room detection. check_structure() finds, for
+the walls, windows and doors of a floor:
+
+- ZERO_LENGTH: a segment whose two ends are the same point;
+- CROSSING: a horizontal and a vertical wall crossing each other away
+  from their ends, which makes no junction;
+- GAP: a loose end (touching nothing) within GAP_TOLERANCE of another
+  segment, a wall that almost meets another;
+- ORPHAN_OPENING: a door or window with neither end on another segment,
+  so not set in any wall;
+
+merged_duplicates() adds DUPLICATE, walls on the same line that
+overlapped in the project file: Floor.normalize_walls() merges them on
+load and keeps the overlapping parts, which are reported for as long as a
+wall still covers them. vents_outside() adds VENT_OUTSIDE, a vent whose
+centre lies in no room.
+
+Nothing is modified: each problem is a GeometryIssue to show or report.
+Crossings are found with a sweep line over x (the horizontal walls alive
+at each vertical wall are kept sorted by y, so each vertical wall is a
+bisection plus the crossings it reports); loose ends are looked up in
+segments sorted by their coordinate.
+The whole pass is O((n + k) log n) for n segments and k issues.
+Diagonal walls take no part in the crossing check, and loose ends are
+only measured against horizontal and vertical segments.
+
+Floor.geometry_check() caches the issues: the wall checks are only run
+again when the walls, windows or doors changed, and so are the room
+outlines (see Floor.rooms()), so placing vents only re-checks the vents. The application and `batch.py check` run the same
+checks on the same normalized floors.
+"""
+from bisect import bisect_left, bisect_right, insort
+from collections import namedtuple
+
+from model.units import PIXELS_PER_METER
+from model.wall_graph import WallGraph, is_axis_aligned, is_horizontal
+
+# px (10 px = 0.5 m): a loose end closer than this to a segment is a gap
+GAP_TOLERANCE = 10
+
+ZERO_LENGTH = "zero_length"
+DUPLICATE = "duplicate"
+CROSSING = "crossing"
+GAP = "gap"
+ORPHAN_OPENING = "orphan_opening"
+VENT_OUTSIDE = "vent_outside"
+
+# objects: the objects at fault; point: where to look on the plan
+GeometryIssue = namedtuple("GeometryIssue", "kind message objects point")
+
+NAMES = {"Wall": "mur", "Window": "fenêtre", "Door": "porte"}
+
+
+def _where(point):
+    return f"({point[0] / PIXELS_PER_METER:.2f} m, {point[1] / PIXELS_PER_METER:.2f} m)"
+
+
+def _name(obj):
+    return NAMES.get(type(obj).__name__, "segment")
+
+
+def _lines(segments):
+    """(coordinate, low, high, obj) of the horizontal and of the vertical segments (diagonals left out)"""
+    horizontal, vertical = [], []
+    for obj in segments:
+        start, end = tuple(obj.start), tuple(obj.end)
+        if start == end or not is_axis_aligned(start, end):
+            continue
+        if is_horizontal(start, end):
+            low, high = sorted((start[0], end[0]))
+            horizontal.append((start[1], low, high, obj))
+        else:
+            low, high = sorted((start[1], end[1]))
+            vertical.append((start[0], low, high, obj))
+    return horizontal, vertical
+
+
+def _crossings(horizontal, vertical):
+    """Horizontal and vertical walls crossing strictly inside both, by a sweep over x"""
+    # At one x: ends (0) before queries (1) before starts (2), so touching ends never count
+    events = []
+    for i, (y, low, high, _obj) in enumerate(horizontal):
+        events.append((low, 2, i))
+        events.append((high, 0, i))
+    for j, (x, _low, _high, _obj) in enumerate(vertical):
+        events.append((x, 1, j))
+    events.sort()
+
+    issues = []
+    active = []     # (y, index) of the horizontal walls spanning the sweep line
+    for _x, event, i in events:
+        if event == 2:
+            insort(active, (horizontal[i][0], i))
+        elif event == 0:
+            del active[bisect_left(active, (horizontal[i][0], i))]
+        else:
+            x, low, high, wall = vertical[i]
+            first = bisect_right(active, (low, float("inf")))
+            last = bisect_left(active, (high, -1))
+            for y, k in active[first:last]:
+                point = (x, y)
+                issues.append(GeometryIssue(CROSSING, f"murs qui se croisent sans jonction en {_where(point)}",
+                                            (horizontal[k][3], wall), point))
+    return issues
+
+
+class _Near:
+    """Segments of one orientation sorted by their fixed coordinate, for the loose ends"""
+
+    def __init__(self, lines):
+        self.lines = sorted(lines, key=lambda line: line[0])
+        self.coords = [line[0] for line in self.lines]
+
+    def closest(self, coord, along, tolerance, exclude):
+        """(distance, obj) of the nearest segment within tolerance of a point, or None"""
+        best = None
+        for line_coord, low, high, obj in self.lines[bisect_left(self.coords, coord - tolerance):
+                                                     bisect_right(self.coords, coord + tolerance)]:
+            if obj is exclude:
+                continue
+            distance = max(abs(line_coord - coord), low - along, along - high)
+            if distance <= tolerance and (best is None or distance < best[0]):
+                best = (distance, obj)
+        return best
+
+
+def check_structure(walls, openings=(), gap=GAP_TOLERANCE):
+    """
+    Problems of the walls and of the openings (windows and doors).
+
+    Returns:
+        list of GeometryIssue, in the order of the checks listed above
+    """
+    walls, openings = list(walls), list(openings)
+    segments = walls + openings
+    issues = [GeometryIssue(ZERO_LENGTH, f"{_name(obj)} de longueur nulle en {_where(obj.start)}",
+                            (obj,), tuple(obj.start))
+              for obj in segments if tuple(obj.start) == tuple(obj.end)]
+
+    issues += _crossings(*_lines(walls))
+
+    # Ends touching another segment are junctions of the graph of all the segments
+    real = [obj for obj in segments if tuple(obj.start) != tuple(obj.end)]
+    graph = WallGraph([(obj.start, obj.end) for obj in real])
+    all_horizontal, all_vertical = _lines(real)
+    near_horizontal, near_vertical = _Near(all_horizontal), _Near(all_vertical)
+    opening_ids = {id(obj) for obj in openings}
+    for obj in real:
+        loose = [point for point in (tuple(obj.start), tuple(obj.end)) if graph.degree(point) <= 1]
+        if id(obj) in opening_ids and len(loose) == 2:
+            point = ((obj.start[0] + obj.end[0]) / 2, (obj.start[1] + obj.end[1]) / 2)
+            issues.append(GeometryIssue(ORPHAN_OPENING, f"{_name(obj)} posée sur aucun mur en {_where(point)}",
+                                        (obj,), point))
+            continue
+        for point in loose:
+            found = [near for near in (near_horizontal.closest(point[1], point[0], gap, obj),
+                                       near_vertical.closest(point[0], point[1], gap, obj)) if near]
+            if found:
+                distance, other = min(found, key=lambda near: near[0])
+                issues.append(GeometryIssue(GAP, f"{_name(obj)} : extrémité libre à {distance / PIXELS_PER_METER:.2f} m "
+                                                 f"d'un autre élément en {_where(point)}", (obj, other), point))
+    return issues
+
+
+def merged_duplicates(overlaps, walls, graph):
+    """
+    Overlapping parts of walls merged by Floor.normalize_walls(), with the
+    walls that cover them now (graph: WallGraph of walls); the parts no
+    wall covers any more are left out.
+    """
+    issues = []
+    for start, end in overlaps:
+        point = ((start[0] + end[0]) / 2, (start[1] + end[1]) / 2)
+        covering = tuple(walls[i] for i in graph.walls_through(point))
+        if covering:
+            issues.append(GeometryIssue(DUPLICATE, f"murs superposés, fusionnés au chargement, en {_where(point)}",
+                                        covering, point))
+    return issues
+
+
+def vents_outside(vents, rooms):
+    """Vents whose centre is in none of the rooms (as assigned by model.rooms.detect_rooms)"""
+    inside = {id(vent) for room in rooms for vent in room.vents}
+    return [GeometryIssue(VENT_OUTSIDE, f"bouche {vent.name!r} hors des pièces en {_where(vent.start)}",
+                          (vent,), tuple(vent.start))
+            for vent in vents if id(vent) not in inside]
@@ -1,4 +1,14 @@
 from abc import ABC, abstractmethod
+from itertools import count
+
+# Shared by every model object, so an ID is unique across kinds
+_object_ids = count(1)
+
+
+def new_object_id():
+    """Next stable object ID (unique for the lifetime of the application)"""
+    return next(_object_ids)
+
 
 class Object(ABC):
     def __init__(self, start, end):
@@ -9,6 +19,7 @@ class Object(ABC):
             start: (x, y) coordinate tuple representing the starting point.
             end:   (x, y) coordinate tuple representing the ending point.
         """
+        self.id = new_object_id()
         self.start = start
         self.end = end
 
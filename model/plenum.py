@@ -1,5 +1,10 @@
+from model.object import new_object_id
+from model.units import parse_quantity, UNKNOWN
+
+
 class Plenum:
     def __init__(self, start, end, max_flow=1000):
+        self.id = new_object_id()
         self.start = start  # (x1, y1)
         self.end = end      # (x2, y2)
         self.max_flow = max_flow
@@ -7,6 +12,15 @@ class Plenum:
         
         # Calculate area in square meters
         self.calculate_area()
+
+    @property
+    def max_flow(self):
+        """Maximum flow in m³/h, or units.UNKNOWN"""
+        return self._max_flow
+
+    @max_flow.setter
+    def max_flow(self, value):
+        self._max_flow = parse_quantity(value)
     
     def calculate_area(self):
         """Calculate the area of the plenum in square meters."""
@@ -36,11 +50,12 @@ class Plenum:
         plenum_obj = Plenum(
             start=tuple(data.get("start", (0,0))),
             end=tuple(data.get("end", (0,0))),
-            max_flow=data.get("max_flow", 1000)
+            max_flow=data.get("max_flow", UNKNOWN)
         )
         plenum_obj.type = data.get("type", None)
         plenum_obj.floor_index = data.get("floor_index")
-        plenum_obj.area = data.get("area", plenum_obj.area)  # Use calculated area as fallback
+        if data.get("area") is not None:
+            plenum_obj.area = data["area"]  # Otherwise keep the calculated area
 
         return plenum_obj
 
@@ -0,0 +1,156 @@
+"""
+Regulatory airflow requirements of the rooms (arrêté du 24 mars 1982).
+
+Each floor is treated as one dwelling. Its rooms (see rooms.py) are typed
+from the vents they contain:
+
+- a room with an extraction vent is a service room (kitchen, bathroom,
+  shower room, WC), told apart by the names of its vents ("cuisine",
+  "sdb", "douche", "wc"...);
+- a room with only inflow vents is a main room (living room, bedroom);
+- a room without vents (hall, corridor) has no requirement.
+
+The number of main rooms gives the dwelling size, which selects the row
+of the lookup tables below. Service rooms must extract at least their
+tabulated flow; main rooms share the total extraction of the dwelling,
+which is the air that has to come in through them.
+
+Floor.ventilation_check() caches the result per floor version.
+"""
+import unicodedata
+
+KITCHEN = "cuisine"
+BATHROOM = "salle_de_bain"
+SHOWER_ROOM = "salle_eau"
+WC = "wc"
+SERVICE_ROOM = "service"        # Service room whose use is not known
+MAIN_ROOM = "piece_principale"
+CIRCULATION = "circulation"
+
+ROOM_TYPE_NAMES = {
+    KITCHEN: "Cuisine",
+    BATHROOM: "Salle de bain",
+    SHOWER_ROOM: "Salle d'eau",
+    WC: "WC",
+    SERVICE_ROOM: "Pièce de service",
+    MAIN_ROOM: "Pièce principale",
+    CIRCULATION: "Circulation",
+}
+
+# Keywords of the vent names, first match wins (accents removed, lower case)
+ROOM_KEYWORDS = (
+    (KITCHEN, ("cuisine", "cuis", "kitchenette")),
+    (BATHROOM, ("salle de bain", "sdb", "bain")),
+    (SHOWER_ROOM, ("salle d'eau", "sde", "douche")),
+    (WC, ("wc", "toilette")),
+)
+
+# Extraction flows (m³/h) by number of main rooms, 1 to 5 and more:
+# kitchen, bathroom (with or without WC), other shower room, single WC, WC when there are several
+EXTRACTION_TABLE = {
+    1: {KITCHEN: 75, BATHROOM: 15, SHOWER_ROOM: 15, "wc_single": 15, "wc_multiple": 15},
+    2: {KITCHEN: 90, BATHROOM: 15, SHOWER_ROOM: 15, "wc_single": 15, "wc_multiple": 15},
+    3: {KITCHEN: 105, BATHROOM: 30, SHOWER_ROOM: 15, "wc_single": 15, "wc_multiple": 15},
+    4: {KITCHEN: 120, BATHROOM: 30, SHOWER_ROOM: 15, "wc_single": 30, "wc_multiple": 15},
+    5: {KITCHEN: 135, BATHROOM: 30, SHOWER_ROOM: 15, "wc_single": 30, "wc_multiple": 15},
+}
+
+# Minimum total extraction of the dwelling (m³/h) by number of main rooms, 1 to 7 and more
+DWELLING_MINIMUM = {1: 35, 2: 60, 3: 75, 4: 90, 5: 105, 6: 120, 7: 135}
+
+
+def _size_row(table, main_rooms):
+    return table[min(max(main_rooms, 1), max(table))]
+
+
+def _normalize(text):
+    # The typographic apostrophe first: the ASCII encoding would drop it
+    text = str(text or "").replace("’", "'")
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return text.lower()
+
+
+def room_type(room):
+    """Type of a room, from the vents it contains"""
+    if any(v.function in ("extraction_interne", "extraction_externe") for v in room.vents):
+        names = " ".join(_normalize(v.name) for v in room.vents)
+        for kind, keywords in ROOM_KEYWORDS:
+            if any(keyword in names for keyword in keywords):
+                return kind
+        return SERVICE_ROOM
+    if room.vents:
+        return MAIN_ROOM
+    return CIRCULATION
+
+
+class RoomCheck:
+    """Requirement of one room and whether its vents meet it"""
+
+    def __init__(self, index, room, kind, required, actual):
+        self.index = index
+        self.room = room
+        self.kind = kind
+        self.required = required    # m³/h, 0 when there is no requirement
+        self.actual = actual        # m³/h extracted (service rooms) or blown in (main rooms)
+
+    @property
+    def compliant(self):
+        return self.actual >= self.required
+
+    def to_dict(self):
+        return {
+            "room_index": self.index,
+            "type": self.kind,
+            "type_name": ROOM_TYPE_NAMES[self.kind],
+            "required": round(self.required, 1),
+            "actual": self.actual,
+            "compliant": self.compliant,
+        }
+
+
+class DwellingCheck:
+    """Requirements of a floor taken as one dwelling"""
+
+    def __init__(self, rooms):
+        kinds = [room_type(room) for room in rooms]
+        self.main_rooms = kinds.count(MAIN_ROOM)
+        extraction = _size_row(EXTRACTION_TABLE, self.main_rooms)
+        wc_flow = extraction["wc_single" if kinds.count(WC) <= 1 else "wc_multiple"]
+
+        def service_flow(kind):
+            if kind == WC:
+                return wc_flow
+            # A service room of unknown use gets the lowest wet room flow
+            return extraction.get(kind, extraction[SHOWER_ROOM])
+
+        service_total = sum(service_flow(k) for k in kinds if k not in (MAIN_ROOM, CIRCULATION))
+        self.required_total = max(service_total, _size_row(DWELLING_MINIMUM, self.main_rooms)) if rooms else 0
+        self.actual_total = sum(room.outflow for room in rooms)
+        main_share = self.required_total / self.main_rooms if self.main_rooms else 0
+
+        self.rooms = []
+        for index, (room, kind) in enumerate(zip(rooms, kinds)):
+            if kind == MAIN_ROOM:
+                required, actual = main_share, room.inflow
+            elif kind == CIRCULATION:
+                required, actual = 0, 0
+            else:
+                required, actual = service_flow(kind), room.outflow
+            self.rooms.append(RoomCheck(index, room, kind, required, actual))
+
+    @property
+    def under_ventilated(self):
+        return [check for check in self.rooms if not check.compliant]
+
+    @property
+    def compliant(self):
+        return self.actual_total >= self.required_total and not self.under_ventilated
+
+    def to_dict(self):
+        return {
+            "main_rooms": self.main_rooms,
+            "required_total": self.required_total,
+            "actual_total": self.actual_total,
+            "compliant": self.compliant,
+            "rooms": [check.to_dict() for check in self.rooms],
+        }
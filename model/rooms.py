@@ -0,0 +1,208 @@
+"""
+Rooms of a floor, detected from its walls.
+
+Doors and windows close the gaps they fill in the walls, then the wall
+graph (see wall_graph.py) is walked face by face: every bounded face of
+the planar graph is a room. Walls sticking out into a room (dead ends)
+are pruned first, so they do not end up in the room outline.
+
+Floor.rooms() caches the outlines as long as the walls, doors and windows
+are the same, so adding a vent only assigns the vents again; areas are in
+m² and volumes use the floor height. Vents belong to the room containing their
+centre, which gives the flow and the air renewal (RAH) of each room.
+
+Islands (a closed outline drawn inside a room, e.g. a duct shaft) are
+rooms of their own; their area is not subtracted from the enclosing room.
+"""
+from collections import defaultdict
+from math import atan2
+
+from model.units import PIXELS_PER_METER, known
+from model.wall_graph import WallGraph, merge_collinear
+from model.ventilation import INFLOW_FUNCTIONS, OUTFLOW_FUNCTIONS
+
+# Faces smaller than this (m²) are drawing leftovers, not rooms
+MIN_ROOM_AREA = 0.5
+
+
+def signed_area(polygon):
+    """Shoelace area of a polygon in canvas units (positive when clockwise on screen)"""
+    total = 0
+    for (x1, y1), (x2, y2) in zip(polygon, polygon[1:] + polygon[:1]):
+        total += x1 * y2 - x2 * y1
+    return total / 2
+
+
+def contains(polygon, point):
+    """Whether point lies inside polygon (even-odd rule)"""
+    x, y = point
+    inside = False
+    for (x1, y1), (x2, y2) in zip(polygon, polygon[1:] + polygon[:1]):
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+def _prune_dead_ends(edges):
+    """Drop edges leading to a point of degree 1, repeatedly"""
+    neighbours = defaultdict(set)
+    for a, b in edges:
+        neighbours[a].add(b)
+        neighbours[b].add(a)
+    stack = [p for p, n in neighbours.items() if len(n) == 1]
+    while stack:
+        point = stack.pop()
+        for other in neighbours.pop(point, ()):
+            neighbours[other].discard(point)
+            if len(neighbours[other]) == 1:
+                stack.append(other)
+    return neighbours
+
+
+def _simplify(polygon):
+    """Remove the vertices where the outline goes straight on"""
+    simplified = []
+    count = len(polygon)
+    for i, (x, y) in enumerate(polygon):
+        (px, py), (nx, ny) = polygon[i - 1], polygon[(i + 1) % count]
+        if (x - px) * (ny - y) - (y - py) * (nx - x) != 0:
+            simplified.append((x, y))
+    return simplified
+
+
+def find_faces(edges):
+    """
+    Bounded faces of a planar graph given as (start, end) edges.
+
+    Each directed edge is followed by the next edge clockwise around its
+    end point, so every face is traced once. The unbounded face of each
+    connected part comes out with the opposite orientation and is dropped.
+    """
+    neighbours = _prune_dead_ends(edges)
+    # Outgoing directions of each point, sorted by angle
+    around = {point: sorted(others, key=lambda o: atan2(o[1] - point[1], o[0] - point[0]))
+              for point, others in neighbours.items() if others}
+
+    visited = set()
+    faces = []
+    for start, others in around.items():
+        for first in others:
+            if (start, first) in visited:
+                continue
+            face = []
+            a, b = start, first
+            while (a, b) not in visited:
+                visited.add((a, b))
+                face.append(a)
+                # Turn to the edge that comes just before b -> a around b
+                ring = around[b]
+                a, b = b, ring[ring.index(a) - 1]
+            if signed_area(face) > 0:
+                faces.append(_simplify(face))
+    return faces
+
+
+class Room:
+    def __init__(self, polygon, height):
+        self.polygon = polygon          # Canvas coordinates
+        self.height = height            # m
+        self.vents = []
+
+    @property
+    def area(self):
+        """Floor area in m²"""
+        return abs(signed_area(self.polygon)) / PIXELS_PER_METER ** 2
+
+    @property
+    def volume(self):
+        """Volume in m³"""
+        return self.area * float(self.height)
+
+    def bounds(self):
+        xs = [p[0] for p in self.polygon]
+        ys = [p[1] for p in self.polygon]
+        return min(xs), min(ys), max(xs), max(ys)
+
+    def contains(self, point):
+        x1, y1, x2, y2 = self.bounds()
+        return x1 <= point[0] <= x2 and y1 <= point[1] <= y2 and contains(self.polygon, point)
+
+    @property
+    def inflow(self):
+        return sum(known(v.flow_rate) for v in self.vents if v.function in INFLOW_FUNCTIONS)
+
+    @property
+    def outflow(self):
+        return sum(known(v.flow_rate) for v in self.vents if v.function in OUTFLOW_FUNCTIONS)
+
+    @property
+    def rah(self):
+        """Air renewal per hour: the room is renewed by what is blown in or extracted, whichever is larger"""
+        volume = self.volume
+        if volume <= 0:
+            return None
+        return max(self.inflow, self.outflow) / volume
+
+    def __repr__(self):
+        return f"<Room {len(self.polygon)} corners | {self.area:.2f} m², {len(self.vents)} vents>"
+
+    def to_dict(self):
+        return {
+            "polygon": [list(p) for p in self.polygon],
+            "area": round(self.area, 2),
+            "volume": round(self.volume, 2),
+            "inflow": self.inflow,
+            "outflow": self.outflow,
+            "rah": self.rah,
+            "vents": [v.id for v in self.vents],
+        }
+
+
+def room_outlines(walls, openings=()):
+    """
+    Outlines of the rooms enclosed by walls, doors and windows, smallest
+    first (the slow part of detect_rooms).
+
+    Args:
+        walls: (start, end) segments of the walls
+        openings: (start, end) segments of the doors and windows
+    """
+    graph = WallGraph(merge_collinear(list(walls) + list(openings)))
+    outlines = [polygon for polygon in find_faces(graph.split_edges())
+                if abs(signed_area(polygon)) / PIXELS_PER_METER ** 2 >= MIN_ROOM_AREA]
+    outlines.sort(key=lambda polygon: abs(signed_area(polygon)))
+    return outlines
+
+
+def rooms_from_outlines(outlines, height=2.5, vents=()):
+    """
+    Rooms of outlines given by room_outlines(), with their vents.
+
+    Returns:
+        list of Room, largest first
+    """
+    rooms = [Room(polygon, height) for polygon in outlines]
+    # Smallest first, so a vent in an island goes to the island
+    for vent in vents:
+        for room in rooms:
+            if room.contains(vent.start):
+                room.vents.append(vent)
+                break
+    rooms.reverse()
+    return rooms
+
+
+def detect_rooms(walls, openings=(), height=2.5, vents=()):
+    """
+    Rooms enclosed by walls, doors and windows.
+
+    Args:
+        walls: (start, end) segments of the walls
+        openings: (start, end) segments of the doors and windows
+        height: floor height in m, for the volumes
+        vents: Vent objects, assigned to the room containing their centre
+
+    Returns:
+        list of Room, largest first
+    """
+    return rooms_from_outlines(room_outlines(walls, openings), height, vents)
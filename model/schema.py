@@ -0,0 +1,263 @@
+"""
+Validation and normalization of project files.
+
+A project file is a JSON list of floors, as written by Floor.to_dict().
+normalize_project() walks the whole document once, checks every field
+against the specs below, coerces numeric strings and fills defaults, and
+returns the normalized floors together with the list of problems found.
+
+Can also be run on its own to check archived projects:
+
+    python -m model.schema projet1.json projet2.json ...
+"""
+import json
+import sys
+
+from model.units import parse_number, parse_positive, parse_quantity, UNKNOWN
+
+# Defaults shared by import, duplication and the batch tools.
+DEFAULT_FLOOR_HEIGHT = 2.5
+DEFAULT_WINDOW_THICKNESS = 5
+DEFAULT_DOOR_THICKNESS = 5
+DEFAULT_VENT_FUNCTION = "extraction_interne"
+
+VENT_FUNCTIONS = (
+    "extraction_interne",
+    "insufflation_interne",
+    "extraction_externe",
+    "admission_externe",
+)
+
+VENT_COLORS = {
+    "extraction_interne": "#ff0000",    # Red
+    "insufflation_interne": "#ff9900",  # Orange
+    "extraction_externe": "#4c7093",    # Dark blue
+    "admission_externe": "#66ccff",     # Light blue
+}
+
+PLENUM_TYPES = ("Simple", "Double")
+
+
+class ProjectValidationError(Exception):
+    """Raised when a project file cannot be imported."""
+
+    def __init__(self, issues):
+        self.issues = issues
+        super().__init__("\n".join(issues))
+
+
+# --------------------------------------------------------------------------
+# Field coercers. Each one returns the normalized value or raises ValueError
+# with a short message; the caller prefixes it with the path of the field.
+# The public ones, REQUIRED and normalize_fields() let other importers
+# (model.vent_import) read their fields like those of a project file.
+# --------------------------------------------------------------------------
+
+def _point(value):
+    if not isinstance(value, (list, tuple)) or len(value) != 2:
+        raise ValueError("doit être un point [x, y]")
+    return (number(value[0]), number(value[1]))
+
+
+# Numeric fields are parsed by model.units, like the values typed in the dialogs
+number = parse_number
+positive_number = parse_positive
+optional_number = parse_quantity   # Empty or "N/A" -> UNKNOWN
+
+
+def text(value):
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise ValueError(f"texte attendu, reçu {value!r}")
+    return value
+
+
+def vent_function(value):
+    if value not in VENT_FUNCTIONS:
+        raise ValueError(f"fonction inconnue {value!r}")
+    return value
+
+
+def _plenum_type(value):
+    if value is None:
+        return None
+    if value not in PLENUM_TYPES:
+        raise ValueError(f"type de plenum inconnu {value!r}")
+    return value
+
+
+def _color(value):
+    value = text(value)
+    if value and not (value.startswith("#") and len(value) in (4, 7)):
+        raise ValueError(f"couleur invalide {value!r}")
+    return value
+
+
+REQUIRED = object()
+
+# Field specs: (output key, accepted input keys in priority order, coercer, default).
+# A default of REQUIRED means the object is rejected when the field is missing.
+_FLOOR_FIELDS = (
+    ("name", ("name",), text, "Etage ?"),
+    ("height", ("height",), positive_number, DEFAULT_FLOOR_HEIGHT),
+)
+
+_OBJECT_FIELDS = {
+    "walls": (
+        ("start", ("start",), _point, REQUIRED),
+        ("end", ("end",), _point, REQUIRED),
+    ),
+    "windows": (
+        ("start", ("start",), _point, REQUIRED),
+        ("end", ("end",), _point, REQUIRED),
+        ("thickness", ("thickness",), positive_number, DEFAULT_WINDOW_THICKNESS),
+    ),
+    "doors": (
+        ("start", ("start",), _point, REQUIRED),
+        ("end", ("end",), _point, REQUIRED),
+        ("thickness", ("thickness",), positive_number, DEFAULT_DOOR_THICKNESS),
+    ),
+    "vents": (
+        ("start", ("start",), _point, REQUIRED),
+        ("end", ("end",), _point, REQUIRED),
+        ("name", ("name",), text, ""),
+        ("diameter", ("diameter",), optional_number, UNKNOWN),
+        ("flow_rate", ("flow_rate", "flow"), optional_number, UNKNOWN),
+        ("function", ("function", "role"), vent_function, DEFAULT_VENT_FUNCTION),
+        ("color", ("color",), _color, ""),
+    ),
+    "plenums": (
+        ("start", ("start",), _point, REQUIRED),
+        ("end", ("end",), _point, REQUIRED),
+        ("max_flow", ("max_flow",), optional_number, UNKNOWN),
+        ("type", ("type",), _plenum_type, None),
+        ("area", ("area",), positive_number, None),
+        ("floor_index", ("floor_index",), number, None),
+    ),
+}
+
+
+def normalize_fields(raw, fields, path, issues):
+    """Apply a field spec to one dict. Returns None if a required field is unusable."""
+    result = {}
+    usable = True
+    for out_key, in_keys, coerce, default in fields:
+        value = None
+        for key in in_keys:
+            # Empty strings fall through to the next accepted key, like the old import did
+            candidate = raw.get(key)
+            if candidate is not None and candidate != "":
+                value = candidate
+                break
+
+        if value is None:
+            if default is REQUIRED:
+                issues.append(f"{path}.{out_key}: champ obligatoire manquant")
+                usable = False
+            else:
+                result[out_key] = default
+            continue
+
+        try:
+            result[out_key] = coerce(value)
+        except ValueError as e:
+            issues.append(f"{path}.{out_key}: {e}")
+            if default is REQUIRED:
+                usable = False
+            else:
+                result[out_key] = default
+    return result if usable else None
+
+
+def normalize_floor(raw, path, issues):
+    """Normalize one floor dict, appending problems to issues."""
+    if not isinstance(raw, dict):
+        issues.append(f"{path}: un étage doit être un objet JSON")
+        return None
+
+    floor = normalize_fields(raw, _FLOOR_FIELDS, path, issues)
+    for kind, fields in _OBJECT_FIELDS.items():
+        items = raw.get(kind, [])
+        if not isinstance(items, list):
+            issues.append(f"{path}.{kind}: doit être une liste")
+            items = []
+
+        normalized = []
+        for i, item in enumerate(items):
+            item_path = f"{path}.{kind}[{i}]"
+            if not isinstance(item, dict):
+                issues.append(f"{item_path}: doit être un objet JSON")
+                continue
+            obj = normalize_fields(item, fields, item_path, issues)
+            if obj is not None:
+                normalized.append(obj)
+        floor[kind] = normalized
+
+    # Vents without a colour get the colour of their function
+    for vent in floor["vents"]:
+        if not vent["color"]:
+            vent["color"] = VENT_COLORS.get(vent["function"], "#000000")
+
+    return floor
+
+
+def normalize_project(data):
+    """
+    Validate and normalize a whole project document in a single pass.
+
+    Returns:
+        tuple: (floors, issues) - the list of normalized floor dicts and the
+        list of problems found, each prefixed with its path
+        (e.g. "floors[1].vents[3].flow_rate: nombre attendu, reçu 'abc'")
+    """
+    issues = []
+    if not isinstance(data, list):
+        return [], ["floors: le projet doit être une liste d'étages"]
+
+    floors = []
+    for i, raw in enumerate(data):
+        floor = normalize_floor(raw, f"floors[{i}]", issues)
+        if floor is not None:
+            floors.append(floor)
+
+    if not floors and not issues:
+        issues.append("floors: aucune donnée d'étage trouvée")
+    return floors, issues
+
+
+def load_project_file(path):
+    """
+    Read and normalize a project file.
+
+    Raises:
+        ProjectValidationError: if the file is unreadable or contains problems
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ProjectValidationError([f"{path}: {e}"])
+
+    floors, issues = normalize_project(data)
+    if issues:
+        raise ProjectValidationError(issues)
+    return floors
+
+
+def main(argv=None):
+    paths = sys.argv[1:] if argv is None else argv
+    failed = 0
+    for path in paths:
+        try:
+            load_project_file(path)
+        except ProjectValidationError as e:
+            failed += 1
+            for issue in e.issues:
+                print(f"{path}: {issue}")
+    print(f"{len(paths) - failed}/{len(paths)} fichier(s) valide(s)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
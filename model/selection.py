@@ -0,0 +1,87 @@
+"""
+Selection of plan objects and their bulk transforms.
+
+Every object of a floor comes down to two points: the end points of a
+wall, window or door, the corners of a plenum, the centre and radius
+point of a vent. SelectionIndex keeps them in one NumPy array per floor
+version (Floor.selection_index()), so a rectangle or lasso query is a
+few array comparisons over the whole floor rather than a loop over
+canvas items, and moving, turning or mirroring a selection is a single
+affine transform of all its points (transform_points()).
+
+Walls stay horizontal or vertical, so rotations are quarter turns.
+"""
+import numpy as np
+
+from model.vent import Vent
+
+# Linear parts of the transforms, in canvas coordinates (y down)
+ROTATE_CLOCKWISE = np.array([[0.0, -1.0], [1.0, 0.0]])
+ROTATE_COUNTERCLOCKWISE = ROTATE_CLOCKWISE.T
+MIRROR_HORIZONTAL = np.array([[-1.0, 0.0], [0.0, 1.0]])   # Left and right swapped
+MIRROR_VERTICAL = np.array([[1.0, 0.0], [0.0, -1.0]])     # Top and bottom swapped
+IDENTITY = np.eye(2)
+
+
+def object_points(objects):
+    """(start, end) of each object, as an array of shape (n, 2, 2)"""
+    return np.array([(o.start, o.end) for o in objects], dtype=float).reshape(-1, 2, 2)
+
+
+def transform_points(points, matrix=IDENTITY, center=(0, 0), offset=(0, 0)):
+    """Points of shape (..., 2) turned or mirrored by matrix about center, then moved by offset"""
+    center = np.asarray(center, dtype=float)
+    return (points - center) @ np.asarray(matrix).T + center + np.asarray(offset, dtype=float)
+
+
+def selection_center(points):
+    """Centre of the bounding box of the points, snapped to whole pixels"""
+    flat = points.reshape(-1, 2)
+    return np.round((flat.min(axis=0) + flat.max(axis=0)) / 2)
+
+
+def _inside_polygon(points, polygon):
+    """Whether each point of shape (n, 2) is inside the polygon (m, 2), by ray casting"""
+    x, y = points[:, :1], points[:, 1:]
+    xi, yi = polygon[:, 0], polygon[:, 1]
+    xj, yj = np.roll(xi, 1), np.roll(yi, 1)
+    straddles = (yi > y) != (yj > y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crossing = x < (xj - xi) * (y - yi) / (yj - yi) + xi
+    return np.count_nonzero(straddles & crossing, axis=1) % 2 == 1
+
+
+class SelectionIndex:
+    """Objects of a floor and the points they are selected by"""
+
+    def __init__(self, objects):
+        self.objects = list(objects)
+        anchors = object_points(self.objects)
+        # A vent is selected by its centre
+        vents = np.array([isinstance(o, Vent) for o in self.objects], dtype=bool)
+        anchors[vents, 1] = anchors[vents, 0]
+        self.anchors = anchors
+
+    def _select(self, mask):
+        return [self.objects[i] for i in np.flatnonzero(mask)]
+
+    def _in_box(self, low, high):
+        return ((self.anchors >= low) & (self.anchors <= high)).all(axis=(1, 2))
+
+    def in_rectangle(self, corner, opposite):
+        """Objects lying entirely in the rectangle between two corners"""
+        corners = np.array([corner, opposite], dtype=float)
+        return self._select(self._in_box(corners.min(axis=0), corners.max(axis=0)))
+
+    def in_lasso(self, polygon):
+        """Objects lying entirely in a closed polygon (list of points)"""
+        polygon = np.asarray(polygon, dtype=float).reshape(-1, 2)
+        if len(polygon) < 3:
+            return []
+        # Only the objects in the bounding box of the lasso are tested against its edges
+        mask = self._in_box(polygon.min(axis=0), polygon.max(axis=0))
+        candidates = np.flatnonzero(mask)
+        if len(candidates):
+            inside = _inside_polygon(self.anchors[candidates].reshape(-1, 2), polygon)
+            mask[candidates] = inside.reshape(-1, 2).all(axis=1)
+        return self._select(mask)
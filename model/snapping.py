@@ -0,0 +1,177 @@
+"""
+Snapping of the drawing cursor to the plan of a floor.
+
+While a wall, window or door is drawn, every mouse move asks which point
+the cursor should stick to. In order of preference:
+
+- an end point of a wall, window or door;
+- the midpoint of a wall;
+- a wall: the cursor projected on the nearest wall line;
+- the extension lines of the wall end points: the cursor takes the x of
+  an end point above or below it, the y of one beside it, or both;
+- a node of the GRID_STEP grid, when the grid is switched on.
+
+The grid only catches the cursor within GRID_TOLERANCE of a node, well
+under half the step: between the nodes the cursor stays free, and any
+plan target within SNAP_RADIUS wins over a node.
+
+The queries run on every motion event, so a floor keeps a SnapIndex
+(Floor.snap_index(), rebuilt only when the floor version changes). Points
+are hashed into square cells of CELL_SIZE pixels; walls and end point
+coordinates are sorted on each axis and searched by bisection. A query
+only looks at the cells and the lines within the tolerance: O(log n) plus
+the candidates found, whatever the size of the floor.
+"""
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, namedtuple
+
+from model.units import PIXELS_PER_METER
+from model.wall_graph import is_axis_aligned, is_horizontal
+
+SNAP_RADIUS = 8                     # px, distance at which the cursor is pulled
+CELL_SIZE = 32                      # px, side of the point hash cells
+GRID_STEP = PIXELS_PER_METER / 2    # px, half a metre
+GRID_TOLERANCE = 2                  # px, distance at which a grid node pulls the cursor
+
+ENDPOINT = "endpoint"
+MIDPOINT = "midpoint"
+WALL = "wall"
+EXTENSION = "extension"
+GRID = "grid"
+
+# point: where the cursor goes; source: the object snapped to (end points of the
+# aligned points for EXTENSION, None for GRID)
+Snap = namedtuple("Snap", "point kind source")
+
+
+def _cell(value):
+    return int(value // CELL_SIZE)
+
+
+class _Lines:
+    """Axis-aligned segments on one axis, sorted by their fixed coordinate"""
+
+    def __init__(self, lines):
+        # (coordinate, low, high, obj): the segment from low to high at coordinate
+        self.lines = sorted(lines, key=lambda line: line[0])
+        self.coords = [line[0] for line in self.lines]
+
+    def near(self, coord, tolerance):
+        """Lines whose coordinate is within tolerance, the nearest first"""
+        found = self.lines[bisect_left(self.coords, coord - tolerance):
+                           bisect_right(self.coords, coord + tolerance)]
+        return sorted(found, key=lambda line: abs(line[0] - coord))
+
+
+class _Values:
+    """Sorted coordinates, each with the point it comes from"""
+
+    def __init__(self, pairs):
+        pairs = sorted(pairs)
+        self.values = [value for value, _point in pairs]
+        self.points = [point for _value, point in pairs]
+
+    def nearest(self, value, tolerance):
+        """(value, point) closest to value within tolerance, or None"""
+        i = bisect_left(self.values, value)
+        best = None
+        for j in (i - 1, i):
+            if 0 <= j < len(self.values) and abs(self.values[j] - value) <= tolerance:
+                if best is None or abs(self.values[j] - value) < abs(self.values[best] - value):
+                    best = j
+        return None if best is None else (self.values[best], self.points[best])
+
+
+class SnapIndex:
+    """
+    Spatial index of the snapping targets of a floor.
+
+    Args:
+        walls: Wall objects
+        openings: Window and Door objects (their end points are targets)
+    """
+
+    def __init__(self, walls, openings=()):
+        self._points = defaultdict(list)    # cell -> [(point, kind, obj)]
+        for obj in list(walls) + list(openings):
+            for point in (obj.start, obj.end):
+                self._add_point(tuple(point), ENDPOINT, obj)
+        for wall in walls:
+            middle = ((wall.start[0] + wall.end[0]) / 2, (wall.start[1] + wall.end[1]) / 2)
+            self._add_point(middle, MIDPOINT, wall)
+
+        horizontal, vertical = [], []
+        for wall in walls:
+            # Diagonal walls are only snapped to by their ends and middle
+            if wall.start == wall.end or not is_axis_aligned(wall.start, wall.end):
+                continue
+            if is_horizontal(wall.start, wall.end):
+                low, high = sorted((wall.start[0], wall.end[0]))
+                horizontal.append((wall.start[1], low, high, wall))
+            else:
+                low, high = sorted((wall.start[1], wall.end[1]))
+                vertical.append((wall.start[0], low, high, wall))
+        self.horizontal = _Lines(horizontal)
+        self.vertical = _Lines(vertical)
+
+        ends = [tuple(p) for wall in walls for p in (wall.start, wall.end)]
+        self._xs = _Values((p[0], p) for p in ends)
+        self._ys = _Values((p[1], p) for p in ends)
+
+    def _add_point(self, point, kind, obj):
+        self._points[(_cell(point[0]), _cell(point[1]))].append((point, kind, obj))
+
+    def _nearest_point(self, point, kind, tolerance):
+        x, y = point
+        best, best_distance = None, tolerance
+        for cx in range(_cell(x - tolerance), _cell(x + tolerance) + 1):
+            for cy in range(_cell(y - tolerance), _cell(y + tolerance) + 1):
+                for target, target_kind, obj in self._points.get((cx, cy), ()):
+                    if target_kind != kind:
+                        continue
+                    distance = max(abs(target[0] - x), abs(target[1] - y))
+                    if distance <= best_distance:
+                        best, best_distance = Snap(target, kind, obj), distance
+        return best
+
+    def _nearest_wall(self, point, tolerance):
+        x, y = point
+        best, best_distance = None, tolerance
+        for lines, along, across, make in ((self.horizontal, x, y, lambda c, a: (a, c)),
+                                           (self.vertical, y, x, lambda c, a: (c, a))):
+            for coord, low, high, wall in lines.near(across, tolerance):
+                if low <= along <= high and abs(coord - across) <= best_distance:
+                    best, best_distance = Snap(make(coord, along), WALL, wall), abs(coord - across)
+                    break   # The lines come nearest first
+        return best
+
+    def walls_on_line(self, horizontal, coord, tolerance):
+        """Horizontal (or vertical) walls whose line is within tolerance of coord, the nearest first"""
+        lines = self.horizontal if horizontal else self.vertical
+        return [wall for _coord, _low, _high, wall in lines.near(coord, tolerance)]
+
+    def snap(self, point, tolerance=SNAP_RADIUS, grid=False, grid_tolerance=GRID_TOLERANCE):
+        """
+        Point the cursor sticks to, as a Snap, or None when nothing is within
+        tolerance (nor, with grid, a node within grid_tolerance).
+        """
+        for kind in (ENDPOINT, MIDPOINT):
+            found = self._nearest_point(point, kind, tolerance)
+            if found:
+                return found
+        found = self._nearest_wall(point, tolerance)
+        if found:
+            return found
+
+        x, y = point
+        aligned_x = self._xs.nearest(x, tolerance)
+        aligned_y = self._ys.nearest(y, tolerance)
+        if aligned_x or aligned_y:
+            return Snap((aligned_x[0] if aligned_x else x, aligned_y[0] if aligned_y else y), EXTENSION,
+                        tuple(a[1] for a in (aligned_x, aligned_y) if a))
+
+        if grid:
+            node = (round(x / GRID_STEP) * GRID_STEP, round(y / GRID_STEP) * GRID_STEP)
+            if max(abs(node[0] - x), abs(node[1] - y)) <= min(tolerance, grid_tolerance):
+                return Snap(node, GRID, None)
+        return None
@@ -0,0 +1,250 @@
+"""
+Immutable snapshots of floors, sharing their unchanged parts.
+
+A floor keeps, next to its live objects, one PersistentList of frozen
+ObjectRecords per kind of object. The lists are never modified: an edit
+builds a new list that copies the chunk it touches (CHUNK_SIZE records)
+and the branches above it, one per level of the tree, and shares every
+other chunk and branch with the previous list. Floor.snapshot() only has
+to collect the current lists, so it costs the same whatever the size of
+the floor.
+
+A FloorSnapshot can be saved (to_dict() writes the project file format),
+compared with an older snapshot of the same floor (diff(), which skips
+the shared chunks), turned back into a floor (Floor.from_snapshot()) or
+handed to another thread, since nothing in it can change.
+"""
+from bisect import bisect_right
+from collections import namedtuple
+from itertools import accumulate
+
+CHUNK_SIZE = 32
+
+KINDS = ("wall", "window", "door", "vent", "plenum")
+
+# Attributes of each kind besides start and end
+ATTRIBUTES = {
+    "wall": (),
+    "window": ("thickness",),
+    "door": ("thickness",),
+    "vent": ("name", "diameter", "flow_rate", "function", "color"),
+    "plenum": ("max_flow", "type", "area"),
+}
+# Door.to_dict() leaves the thickness out of the project file
+UNSAVED = {"door": ("thickness",)}
+
+
+class _Branch:
+    """Inner node of a PersistentList: its children and where each one ends"""
+
+    __slots__ = ("children", "ends")
+
+    def __init__(self, children):
+        self.children = tuple(children)
+        self.ends = tuple(accumulate(_size(child) for child in self.children))
+
+
+def _size(node):
+    return node.ends[-1] if isinstance(node, _Branch) else len(node)
+
+
+def _leaves(node):
+    if isinstance(node, _Branch):
+        for child in node.children:
+            yield from _leaves(child)
+    elif node:
+        yield node
+
+
+def _append(node, item):
+    """The node with the item at its end, and a new sibling when it is full"""
+    if not isinstance(node, _Branch):
+        if len(node) < CHUNK_SIZE:
+            return node + (item,), None
+        return node, (item,)
+    last, extra = _append(node.children[-1], item)
+    children = node.children[:-1] + (last,)
+    if extra is None:
+        return _Branch(children), None
+    if len(children) < CHUNK_SIZE:
+        return _Branch(children + (extra,)), None
+    return _Branch(children), _Branch((extra,))
+
+
+def _replace(node, index, leaf_change):
+    """The node with the leaf holding index replaced by leaf_change(leaf, offset)"""
+    if not isinstance(node, _Branch):
+        return leaf_change(node, index)
+    position = bisect_right(node.ends, index)
+    offset = index - (node.ends[position - 1] if position else 0)
+    child = _replace(node.children[position], offset, leaf_change)
+    # An emptied child is dropped rather than kept
+    replacement = (child,) if _size(child) else ()
+    children = node.children[:position] + replacement + node.children[position + 1:]
+    return _Branch(children) if children else ()
+
+
+class PersistentList:
+    """
+    Immutable sequence stored as a tree: leaves are chunks of up to
+    CHUNK_SIZE items, branches hold up to CHUNK_SIZE children and the
+    running length of each. Every change returns a new list that copies
+    one chunk and the branches above it, O(CHUNK_SIZE * log n), and
+    shares the rest of the tree.
+    """
+
+    __slots__ = ("_root",)
+
+    def __init__(self, root=()):
+        # A branch with a single child adds nothing: its child is the root
+        while isinstance(root, _Branch) and len(root.children) == 1:
+            root = root.children[0]
+        self._root = root
+
+    @classmethod
+    def of(cls, items):
+        """A list of the items, built level by level in one go"""
+        items = tuple(items)
+        nodes = [items[i:i + CHUNK_SIZE] for i in range(0, len(items), CHUNK_SIZE)]
+        while len(nodes) > 1:
+            nodes = [_Branch(nodes[i:i + CHUNK_SIZE]) for i in range(0, len(nodes), CHUNK_SIZE)]
+        return cls(nodes[0] if nodes else ())
+
+    @property
+    def chunks(self):
+        """The leaves of the tree, in order; unchanged ones are shared between lists"""
+        return tuple(_leaves(self._root))
+
+    def __len__(self):
+        return _size(self._root)
+
+    def __iter__(self):
+        for chunk in _leaves(self._root):
+            yield from chunk
+
+    def _check(self, index):
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("PersistentList index out of range")
+        return index
+
+    def __getitem__(self, index):
+        index = self._check(index)
+        node = self._root
+        while isinstance(node, _Branch):
+            position = bisect_right(node.ends, index)
+            if position:
+                index -= node.ends[position - 1]
+            node = node.children[position]
+        return node[index]
+
+    def append(self, item):
+        root, extra = _append(self._root, item)
+        return PersistentList(root if extra is None else _Branch((root, extra)))
+
+    def set(self, index, item):
+        return PersistentList(_replace(self._root, self._check(index),
+                                       lambda chunk, offset: chunk[:offset] + (item,) + chunk[offset + 1:]))
+
+    def delete(self, index):
+        return PersistentList(_replace(self._root, self._check(index),
+                                       lambda chunk, offset: chunk[:offset] + chunk[offset + 1:]))
+
+    def index_of(self, record_id):
+        """Index of the record with the given object ID"""
+        for index, record in enumerate(self):
+            if record.id == record_id:
+                return index
+        raise ValueError(f"no record with id {record_id}")
+
+
+class ObjectRecord(namedtuple("ObjectRecord", "kind id start end attributes")):
+    """Frozen state of a plan object; attributes is a tuple of (name, value)"""
+
+    __slots__ = ()
+
+    @classmethod
+    def of(cls, kind, obj):
+        return cls(kind, obj.id, tuple(obj.start), tuple(obj.end),
+                   tuple((name, getattr(obj, name)) for name in ATTRIBUTES[kind]))
+
+    def __getattr__(self, name):
+        # The attributes of the kind read like those of the object (record.color, record.type...)
+        for key, value in self.attributes:
+            if key == name:
+                return value
+        raise AttributeError(name)
+
+    def get(self, name, default=None):
+        return dict(self.attributes).get(name, default)
+
+    def to_dict(self):
+        unsaved = UNSAVED.get(self.kind, ())
+        data = {"start": self.start, "end": self.end}
+        data.update((name, value) for name, value in self.attributes if name not in unsaved)
+        return data
+
+
+class FloorSnapshot:
+    """
+    State of a floor at one version. The records of each kind are in
+    self.records[kind], a PersistentList.
+    """
+
+    __slots__ = ("name", "height", "version", "records")
+
+    def __init__(self, name, height, version, records):
+        self.name = name
+        self.height = height
+        self.version = version
+        self.records = dict(records)
+
+    def __getattr__(self, name):
+        # walls, windows, doors, vents, plenums, like Floor
+        if name.endswith("s") and name[:-1] in KINDS:
+            return self.records[name[:-1]]
+        raise AttributeError(name)
+
+    def __getstate__(self):
+        return {"name": self.name, "height": self.height, "version": self.version,
+                "records": {kind: list(records) for kind, records in self.records.items()}}
+
+    def __setstate__(self, state):
+        self.name, self.height, self.version = state["name"], state["height"], state["version"]
+        self.records = {kind: PersistentList.of(records) for kind, records in state["records"].items()}
+
+    def to_dict(self):
+        """The floor in the project file format, as Floor.to_dict()"""
+        return {
+            "name": self.name,
+            "height": self.height,
+            "walls":   [r.to_dict() for r in self.records["wall"]],
+            "windows": [r.to_dict() for r in self.records["window"]],
+            "doors":   [r.to_dict() for r in self.records["door"]],
+            "vents":   [r.to_dict() for r in self.records["vent"]],
+            "plenums": [r.to_dict() for r in self.records["plenum"]],
+        }
+
+    def diff(self, older):
+        """
+        Changes since an older snapshot of the same floor.
+
+        Returns:
+            dict: kind -> (added, removed, changed) lists of records
+                (changed holds the new records)
+        """
+        changes = {}
+        for kind in KINDS:
+            new, old = self.records[kind], older.records[kind]
+            shared = {id(chunk) for chunk in new.chunks} & {id(chunk) for chunk in old.chunks}
+            # Records in shared chunks are the same on both sides
+            new_records = {r.id: r for chunk in new.chunks if id(chunk) not in shared for r in chunk}
+            old_records = {r.id: r for chunk in old.chunks if id(chunk) not in shared for r in chunk}
+            added = [r for i, r in new_records.items() if i not in old_records]
+            removed = [r for i, r in old_records.items() if i not in new_records]
+            changed = [r for i, r in new_records.items() if i in old_records and r != old_records[i]]
+            if added or removed or changed:
+                changes[kind] = (added, removed, changed)
+        return changes
@@ -0,0 +1,65 @@
+"""
+Numeric quantities of the model: diameters (mm), flow rates (m³/h),
+areas (m²) and heights (m).
+
+Values typed in the dialogs or read from project files are parsed once,
+when they enter the model. From then on they are plain int/float values,
+or UNKNOWN when the field was left empty ("", "N/A"), so the summary,
+the report and the exports never convert them again.
+"""
+
+# Sentinel of a quantity that was not filled in
+UNKNOWN = None
+
+# Values that mean "not filled in"
+EMPTY_VALUES = ("", "N/A", "n/a", "-")
+
+DIAMETER_UNIT = "mm"
+FLOW_UNIT = "m³/h"
+AREA_UNIT = "m²"
+
+# Scale of the plan: 40 px on the canvas = 2 m
+PIXELS_PER_METER = 20.0
+
+
+def parse_number(value):
+    """int or float from a number or a numeric string ("120", "2,5")"""
+    if isinstance(value, bool):
+        raise ValueError(f"nombre attendu, reçu {value!r}")
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        text = value.strip().replace(",", ".")
+        try:
+            number = float(text)
+        except ValueError:
+            raise ValueError(f"nombre attendu, reçu {value!r}")
+        return int(number) if number.is_integer() and "." not in text else number
+    raise ValueError(f"nombre attendu, reçu {value!r}")
+
+
+def parse_positive(value):
+    number = parse_number(value)
+    if number < 0:
+        raise ValueError(f"doit être positif, reçu {value!r}")
+    return number
+
+
+def parse_quantity(value):
+    """Positive number, or UNKNOWN for an empty field"""
+    if value is UNKNOWN or (isinstance(value, str) and value.strip() in EMPTY_VALUES):
+        return UNKNOWN
+    return parse_positive(value)
+
+
+def known(value):
+    """The quantity, or 0 when it is unknown (for sums)"""
+    return 0 if value is UNKNOWN else value
+
+
+def format_quantity(value, unit=None, unknown="N/A"):
+    """Display text of a quantity: "120", "2.5 m²", or "N/A" when unknown"""
+    if value is UNKNOWN:
+        return unknown
+    text = f"{value:g}" if isinstance(value, float) else str(value)
+    return f"{text} {unit}" if unit else text
@@ -1,4 +1,5 @@
 from model.wall import Wall
+from model.units import parse_quantity
 
 class Vent(Wall):
     def __init__(self, start, end, name, diameter, flow_rate, function,color):
@@ -9,6 +10,24 @@ class Vent(Wall):
         self.function = function
         self.color = color
 
+    # Diameter (mm) and flow rate (m³/h) are parsed when they are set:
+    # a number, or units.UNKNOWN when left empty.
+    @property
+    def diameter(self):
+        return self._diameter
+
+    @diameter.setter
+    def diameter(self, value):
+        self._diameter = parse_quantity(value)
+
+    @property
+    def flow_rate(self):
+        return self._flow_rate
+
+    @flow_rate.setter
+    def flow_rate(self, value):
+        self._flow_rate = parse_quantity(value)
+
     def __repr__(self):
         return (f"Vent({self.start} -> {self.end}, "
                 f"name={self.name}, diameter={self.diameter}, "
@@ -20,4 +39,4 @@ class Vent(Wall):
             "name": self.name, "diameter": self.diameter,
             "flow_rate": self.flow_rate, "function": self.function,
             "color": self.color
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,129 @@
+"""
+Vents placed in bulk: from a CSV table, or by repeating a set of vents.
+
+A CSV file has one vent per line and a header line naming the columns,
+in French or English, in any order (";" or "," separated):
+
+    etage;x;y;nom;diametre;debit;fonction
+    RDC;12.5;4;Cuisine;125;75;extraction_interne
+    1;3;8.25;Chambre;80;15;insufflation_interne
+
+etage is the floor name or its position (0 for the first floor); x and y
+are in metres. The other columns are optional and read like the fields
+of a project file (model.schema): every problem of the file is reported
+at once, with its line number.
+
+repeat_vents() copies a set of vents at regular steps, e.g. the terminal
+layout of one dwelling over the identical dwellings of a floor: all the
+copies are computed with one array operation.
+"""
+import csv
+import unicodedata
+
+import numpy as np
+
+from model.floor import copy_object
+from model.schema import (ProjectValidationError, VENT_COLORS, DEFAULT_VENT_FUNCTION, REQUIRED,
+                          normalize_fields, number, optional_number, text, vent_function)
+from model.selection import object_points
+from model.units import PIXELS_PER_METER, UNKNOWN
+from model.vent import Vent
+
+# Radius (px) of the imported vents, about the size of those drawn by hand
+VENT_RADIUS = 15
+
+# Same spec format as the project file fields in model.schema
+_CSV_FIELDS = (
+    ("floor", ("etage", "floor"), text, REQUIRED),
+    ("x", ("x",), number, REQUIRED),
+    ("y", ("y",), number, REQUIRED),
+    ("name", ("nom", "name"), text, ""),
+    ("diameter", ("diametre", "diameter"), optional_number, UNKNOWN),
+    ("flow_rate", ("debit", "flow_rate", "flow"), optional_number, UNKNOWN),
+    ("function", ("fonction", "function", "role"), vent_function, DEFAULT_VENT_FUNCTION),
+)
+
+
+def _column(name):
+    """Header name without accents, case or surrounding spaces"""
+    name = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode()
+    return name.strip().lower()
+
+
+def _floor_index(reference, floors):
+    """Index of the floor named reference, or at position reference"""
+    for index, floor in enumerate(floors):
+        if floor.name == reference:
+            return index
+    try:
+        index = int(reference)
+    except ValueError:
+        raise ValueError(f"étage inconnu {reference!r}")
+    if not 0 <= index < len(floors):
+        raise ValueError(f"étage inconnu {reference!r}")
+    return index
+
+
+def read_vent_csv(path, floors):
+    """
+    Read the vents of a CSV file.
+
+    Returns:
+        list: (floor index, Vent) pairs, in the order of the file
+
+    Raises:
+        ProjectValidationError: listing every problem found in the file
+    """
+    try:
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            content = f.read()
+    except OSError as e:
+        raise ProjectValidationError([f"{path}: {e}"])
+    try:
+        dialect = csv.Sniffer().sniff(content.split("\n", 1)[0], delimiters=";,\t")
+    except csv.Error:
+        dialect = csv.excel
+
+    issues = []
+    placements = []
+    rows = csv.DictReader(content.splitlines(), dialect=dialect)
+    # Line 1 is the header
+    for line, raw in enumerate(rows, start=2):
+        raw = {_column(key): (value or "").strip() for key, value in raw.items() if key is not None}
+        row = normalize_fields(raw, _CSV_FIELDS, f"ligne {line}", issues)
+        if row is None:
+            continue
+        try:
+            index = _floor_index(row["floor"], floors)
+        except ValueError as e:
+            issues.append(f"ligne {line}.etage: {e}")
+            continue
+        x, y = row["x"] * PIXELS_PER_METER, row["y"] * PIXELS_PER_METER
+        placements.append((index, Vent((x, y), (x + VENT_RADIUS, y), row["name"], row["diameter"],
+                                       row["flow_rate"], row["function"], VENT_COLORS[row["function"]])))
+
+    if not placements and not issues:
+        issues.append(f"{path}: aucune bouche trouvée")
+    if issues:
+        raise ProjectValidationError(issues)
+    return placements
+
+
+def repeat_vents(vents, repeats=1, step=(0, 0)):
+    """
+    Copies (new IDs) of the vents at repeats positions, each step (px)
+    further than the previous; the first copies are at the place of the
+    vents themselves.
+    """
+    if not vents or repeats < 1:
+        return []
+    points = object_points(vents)
+    offsets = np.arange(repeats)[:, None, None, None] * np.asarray(step, dtype=float)
+    moved = (points[None] + offsets).tolist()
+    copies = []
+    for positions in moved:
+        for vent, (start, end) in zip(vents, positions):
+            duplicate = copy_object(vent)
+            duplicate.start, duplicate.end = tuple(start), tuple(end)
+            copies.append(duplicate)
+    return copies
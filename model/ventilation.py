@@ -0,0 +1,303 @@
+"""
+Ventilation balance ("bilan aéraulique") of a project.
+
+collect_summary_data() builds the payload the controller publishes on
+ventilation_summary_update; compute_summary() reduces it to the figures
+shown in the summary window (counts, inflow/outflow, plenums, RAH).
+
+Those figures are kept up to date as the model changes: every Floor owns
+a VentilationStats that its add/remove methods adjust in O(1), and
+attaching it to the project's VentilationStats forwards each change, so
+the summary never rescans the vents. The vent list goes with it as the
+FloorSnapshot record lists, shared with the floors. The regulatory checks
+need room detection: they are only computed on request (floor_regulation(),
+and the report payload).
+"""
+from model.units import known, parse_quantity
+
+VENT_TYPE_NAMES = {
+    "extraction_interne": "Extraction d'air vicié",
+    "insufflation_interne": "Insufflation d'air neuf",
+    "extraction_externe": "Extraction à l'extérieur",
+    "admission_externe": "Admission d'air neuf extérieur",
+}
+
+INFLOW_FUNCTIONS = ("insufflation_interne", "admission_externe")
+OUTFLOW_FUNCTIONS = ("extraction_interne", "extraction_externe")
+
+# Minimum air renewal per hour for residential buildings
+RAH_MINIMUM = 0.35
+
+
+def _flow_value(flow_rate):
+    # Payloads built by collect_summary_data() hold numbers or UNKNOWN;
+    # older ones may still hold strings
+    if isinstance(flow_rate, str):
+        try:
+            return parse_quantity(flow_rate) or 0
+        except ValueError:
+            return 0
+    return known(flow_rate)
+
+
+class VentilationStats:
+    """
+    Running ventilation totals of a floor or of the whole project.
+
+    A floor's stats are attached to the project stats with attach(); from
+    then on every change is forwarded to the parent as well.
+    """
+
+    def __init__(self):
+        self.parent = None
+        self.category_counts = {function: 0 for function in VENT_TYPE_NAMES}
+        self.total_vents = 0
+        self.total_inflow = 0
+        self.total_outflow = 0
+        self.plenum_simple_count = 0
+        self.plenum_double_count = 0
+        self.plenum_total_area = 0.0
+        self.plenum_total_volume = 0.0
+
+    def _shift(self, function=None, vents=0, inflow=0, outflow=0,
+               simple=0, double=0, area=0.0, volume=0.0):
+        stats = self
+        while stats is not None:
+            if function in stats.category_counts:
+                stats.category_counts[function] += vents
+            stats.total_vents += vents
+            stats.total_inflow += inflow
+            stats.total_outflow += outflow
+            stats.plenum_simple_count += simple
+            stats.plenum_double_count += double
+            stats.plenum_total_area += area
+            stats.plenum_total_volume += volume
+            stats = stats.parent
+
+    def add_vent(self, vent, sign=1):
+        # Vents without a function are not counted, as in compute_summary()
+        if not vent.function:
+            return
+        flow = known(vent.flow_rate) * sign
+        self._shift(vent.function, vents=sign,
+                    inflow=flow if vent.function in INFLOW_FUNCTIONS else 0,
+                    outflow=flow if vent.function in OUTFLOW_FUNCTIONS else 0)
+
+    def remove_vent(self, vent):
+        self.add_vent(vent, sign=-1)
+
+    def add_plenum(self, plenum, height, sign=1):
+        area = (plenum.area or 0) * sign
+        is_double = plenum.type == "Double"
+        self._shift(simple=0 if is_double else sign, double=sign if is_double else 0,
+                    area=area, volume=area * float(height))
+
+    def remove_plenum(self, plenum, height):
+        self.add_plenum(plenum, height, sign=-1)
+
+    def change_height(self, old_height, new_height):
+        """The plenum volume of a floor follows its height"""
+        self._shift(volume=self.plenum_total_area * (float(new_height) - float(old_height)))
+
+    def _merge(self, other, sign):
+        counted = 0
+        for function, count in other.category_counts.items():
+            self._shift(function, vents=count * sign)
+            counted += count
+        self._shift(vents=(other.total_vents - counted) * sign,
+                    inflow=other.total_inflow * sign, outflow=other.total_outflow * sign,
+                    simple=other.plenum_simple_count * sign, double=other.plenum_double_count * sign,
+                    area=other.plenum_total_area * sign, volume=other.plenum_total_volume * sign)
+
+    def attach(self, parent):
+        """Add these totals to parent and keep forwarding changes to it"""
+        self.detach()
+        parent._merge(self, 1)
+        self.parent = parent
+
+    def detach(self):
+        if self.parent is not None:
+            self.parent._merge(self, -1)
+            self.parent = None
+
+    @staticmethod
+    def combine(stats_list):
+        """Totals of several stats, e.g. the floors of a project that is not tracked"""
+        total = VentilationStats()
+        for stats in stats_list:
+            total._merge(stats, 1)
+        return total
+
+    @property
+    def rah(self):
+        # Ignore the rounding left over by additions and removals
+        if self.plenum_total_volume <= 1e-9:
+            return None
+        # Double flux systems are rated on insufflation, simple flux on extraction
+        flow = self.total_inflow if self.plenum_double_count > 0 else self.total_outflow
+        return flow / self.plenum_total_volume
+
+    def to_dict(self):
+        """Same figures as compute_summary()"""
+        rah = self.rah
+        return {
+            "total_vents": self.total_vents,
+            "category_counts": dict(self.category_counts),
+            "total_inflow": self.total_inflow,
+            "total_outflow": self.total_outflow,
+            "plenum_simple_count": self.plenum_simple_count,
+            "plenum_double_count": self.plenum_double_count,
+            "plenum_total_area": round(self.plenum_total_area, 6),
+            "plenum_total_volume": round(self.plenum_total_volume, 6),
+            "rah": rah,
+            "rah_compliant": rah is not None and rah >= RAH_MINIMUM,
+        }
+
+
+def floor_regulation(floor):
+    """Regulatory figures of a floor taken as one dwelling (runs room detection, see Floor.rooms())"""
+    check = floor.ventilation_check()
+    return {
+        "regulation_compliant": check.compliant,
+        "required_outflow": check.required_total,
+        "under_ventilated_rooms": len(check.under_ventilated),
+    }
+
+
+def collect_summary_data(floors, stats=None, report=False):
+    """
+    Ventilation summary of the floors: the running totals of the project
+    and of each floor, and the vent records of each floor ("vents" of the
+    floor totals, the FloorSnapshot list: it is the same object as long
+    as the vents of the floor do not change). Nothing is rescanned.
+
+    Args:
+        floors: the Floor objects
+        stats: project VentilationStats the floors are attached to; when
+            omitted, the floor totals are combined
+        report: also list the vents, plenums and rooms one by one, tagged
+            with their floor, and add floor_regulation() to the floor
+            totals, for the PDF report
+    """
+    if stats is None:
+        stats = VentilationStats.combine(floor.stats for floor in floors)
+
+    floors_totals = []
+    for floor_idx, floor in enumerate(floors):
+        floor_totals = floor.stats.to_dict()
+        floor_totals["floor_name"] = floor.name
+        floor_totals["floor_index"] = floor_idx
+        floor_totals["vents"] = floor.snapshot().vents
+        if report:
+            floor_totals.update(floor_regulation(floor))
+        floors_totals.append(floor_totals)
+
+    data = {"totals": stats.to_dict(), "floors": floors_totals}
+    if report:
+        data.update(_report_lists(floors))
+    return data
+
+
+def _report_lists(floors):
+    """Vents, plenums and rooms of all floors, tagged with their floor"""
+    all_vents_data = []
+    all_plenums_data = []
+    all_rooms_data = []
+
+    for floor_idx, floor in enumerate(floors):
+        for vent in floor.vents:
+            all_vents_data.append({
+                "id": vent.id,
+                "floor_name": floor.name,
+                "floor_index": floor_idx,
+                "name": vent.name,
+                "diameter": vent.diameter,
+                "flow_rate": vent.flow_rate,
+                "function": vent.function,
+                "color": vent.color
+            })
+
+        for plenum in floor.plenums:
+            plenum_data = plenum.to_dict()
+            plenum_data["floor_name"] = floor.name
+            plenum_data["floor_index"] = floor_idx
+            plenum_data["height"] = floor.height
+            all_plenums_data.append(plenum_data)
+
+        # Cached by the floor until its geometry or vents change
+        for room_idx, check in enumerate(floor.ventilation_check().rooms):
+            room_data = check.room.to_dict()
+            room_data.update(check.to_dict())
+            room_data["name"] = f"Pièce {room_idx + 1}"
+            room_data["floor_name"] = floor.name
+            room_data["floor_index"] = floor_idx
+            all_rooms_data.append(room_data)
+
+    return {"vents": all_vents_data, "plenums": all_plenums_data, "rooms": all_rooms_data}
+
+
+def compute_summary(data):
+    """
+    Compute the ventilation balance from a collect_summary_data() payload.
+
+    Payloads carrying running totals return them directly; the vent and
+    plenum lists are only summed for payloads without them.
+
+    Returns:
+        dict: total_vents, category_counts, total_inflow, total_outflow,
+        plenum_simple_count, plenum_double_count, plenum_total_area,
+        plenum_total_volume, rah (None when there is no plenum volume)
+        and rah_compliant
+    """
+    if "totals" in data:
+        return data["totals"]
+
+    category_counts = {function: 0 for function in VENT_TYPE_NAMES}
+    total_vents = 0
+    total_inflow = 0
+    total_outflow = 0
+
+    for vent_data in data.get("vents", []):
+        vent_function = vent_data.get("function", "")
+        if not vent_function:
+            continue
+
+        total_vents += 1
+        if vent_function in category_counts:
+            category_counts[vent_function] += 1
+
+        flow_rate = _flow_value(vent_data.get("flow_rate"))
+        if vent_function in INFLOW_FUNCTIONS:
+            total_inflow += flow_rate
+        elif vent_function in OUTFLOW_FUNCTIONS:
+            total_outflow += flow_rate
+
+    simple_count = 0
+    double_count = 0
+    total_area = 0
+    total_volume = 0
+    for p in data.get("plenums", []):
+        if p.get("type", "Simple") == "Double":
+            double_count += 1
+        else:
+            simple_count += 1
+        total_area += p.get("area", 0)
+        total_volume += p.get("area", 0) * p.get("height", 2.5)
+
+    rah = None
+    if total_volume > 0:
+        # Double flux systems are rated on insufflation, simple flux on extraction
+        rah = (total_inflow if double_count > 0 else total_outflow) / total_volume
+
+    return {
+        "total_vents": total_vents,
+        "category_counts": category_counts,
+        "total_inflow": total_inflow,
+        "total_outflow": total_outflow,
+        "plenum_simple_count": simple_count,
+        "plenum_double_count": double_count,
+        "plenum_total_area": total_area,
+        "plenum_total_volume": total_volume,
+        "rah": rah,
+        "rah_compliant": rah is not None and rah >= RAH_MINIMUM,
+    }
@@ -1,16 +1,18 @@
 from model.object import Object
 
 class Wall(Object):
-    def __init__(self, start, end):
+    def __init__(self, start, end, straighten=True):
         """
-        Create a wall object.
+        Create a wall object. A drawn wall is straightened along its main
+        axis; a wall read back from a file or a snapshot (straighten=False)
+        keeps its ends, diagonal or not.
         """
         super().__init__(start, end)
         self.orientation = self._determine_orientation()
 
-        if self.orientation == "horizontal":
+        if straighten and self.orientation == "horizontal":
             self.end = (end[0], start[1])
-        else:
+        elif straighten:
             self.end = (start[0], end[1])
     
     def _determine_orientation(self):
@@ -0,0 +1,205 @@
+"""
+Wall topology of a floor.
+
+Walls are mostly axis-aligned segments drawn one by one, so a floor quickly
+collects near-duplicate coordinates (a wall ending at x=1034 against a
+wall at x=1037) and fragments left by doors and windows. This module:
+
+- snaps coordinates closer than a tolerance to a single value, per axis,
+  so walls stay horizontal/vertical and meet exactly;
+- merges collinear walls that touch or overlap into one segment;
+- indexes junctions: the walls ending at, or passing through, each point.
+
+Diagonal walls (neither horizontal nor vertical once snapped) are kept as
+they are: they are not merged, only joined to other walls at their ends
+or where a wall ends on them.
+
+Floor.normalize_walls() applies the first two steps to a whole floor on
+import, and after an edit only to the edited segments and the segments
+around them, whose coordinates stay where they are; WallGraph gives the
+junctions and the wall graph split at every junction, for room detection.
+"""
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+
+# Coordinates closer than this (canvas pixels, 20 px = 1 m) are the same
+SNAP_TOLERANCE = 5
+
+
+def is_horizontal(start, end):
+    return abs(end[0] - start[0]) >= abs(end[1] - start[1])
+
+
+def is_axis_aligned(start, end):
+    return start[0] == end[0] or start[1] == end[1]
+
+
+def snap_map(values, tolerance=SNAP_TOLERANCE, fixed=()):
+    """
+    Map each value to the representative of its cluster.
+
+    fixed values are coordinates already in the model: they map to
+    themselves, and a value within tolerance of one goes to the nearest.
+    The other values are grouped while they stay within tolerance of the
+    first value of the group; the most used value of a group represents
+    it, so existing geometry moves as little as possible.
+    """
+    counts = Counter(values)
+    anchors = sorted(set(fixed))
+    mapping = {value: value for value in anchors}
+    free = []
+    for value in sorted(counts):
+        if value in mapping:
+            continue
+        i = bisect_left(anchors, value)
+        near = [a for a in anchors[max(i - 1, 0):i + 1] if abs(a - value) <= tolerance]
+        if near:
+            mapping[value] = min(near, key=lambda a: (abs(a - value), a))
+        else:
+            free.append(value)
+
+    group = []
+    for value in free:
+        if group and value - group[0] > tolerance:
+            representative = max(group, key=lambda v: (counts[v], -v))
+            mapping.update((v, representative) for v in group)
+            group = []
+        group.append(value)
+    if group:
+        representative = max(group, key=lambda v: (counts[v], -v))
+        mapping.update((v, representative) for v in group)
+    return mapping
+
+
+def snap_segments(segments, tolerance=SNAP_TOLERANCE, fixed=()):
+    """
+    Snap the coordinates of (start, end) segments. Returns the snapped segments.
+    The coordinates of the fixed segments do not move (see snap_map()).
+    """
+    xs = [p[0] for segment in segments for p in segment]
+    ys = [p[1] for segment in segments for p in segment]
+    x_map = snap_map(xs, tolerance, [p[0] for segment in fixed for p in segment])
+    y_map = snap_map(ys, tolerance, [p[1] for segment in fixed for p in segment])
+    return [((x_map[s[0]], y_map[s[1]]), (x_map[e[0]], y_map[e[1]])) for s, e in segments]
+
+
+def merge_collinear(segments, overlaps=None):
+    """
+    Merge axis-aligned segments lying on the same line that touch or overlap.
+    Zero-length segments are dropped, diagonal ones kept unchanged (after
+    the others, a repeated one only once). Segments come out ordered (left
+    to right, top to bottom).
+
+    If overlaps is a list, the parts where segments overlapped (not just
+    touched) are appended to it as (start, end) segments.
+    """
+    horizontal = defaultdict(list)  # y -> [(x1, x2)]
+    vertical = defaultdict(list)    # x -> [(y1, y2)]
+    diagonal = Counter()
+    for start, end in segments:
+        start, end = tuple(start), tuple(end)
+        if start == end:
+            continue
+        if not is_axis_aligned(start, end):
+            diagonal[tuple(sorted((start, end)))] += 1
+        elif is_horizontal(start, end):
+            horizontal[start[1]].append(tuple(sorted((start[0], end[0]))))
+        else:
+            vertical[start[0]].append(tuple(sorted((start[1], end[1]))))
+
+    merged = []
+    for lines, make in ((horizontal, lambda c, a, b: ((a, c), (b, c))),
+                        (vertical, lambda c, a, b: ((c, a), (c, b)))):
+        for coord in sorted(lines):
+            intervals = sorted(lines[coord])
+            low, high = intervals[0]
+            for a, b in intervals[1:]:
+                if a < high and overlaps is not None:
+                    overlaps.append(make(coord, a, min(b, high)))
+                if a <= high:
+                    high = max(high, b)
+                else:
+                    merged.append(make(coord, low, high))
+                    low, high = a, b
+            merged.append(make(coord, low, high))
+    if overlaps is not None:
+        overlaps.extend(segment for segment, count in diagonal.items() if count > 1)
+    return merged + list(diagonal)
+
+
+def _on_segment(point, start, end):
+    """Whether point lies on the segment start-end (ends included)"""
+    (x, y), (x1, y1), (x2, y2) = point, start, end
+    return ((x2 - x1) * (y - y1) == (y2 - y1) * (x - x1)
+            and min(x1, x2) <= x <= max(x1, x2) and min(y1, y2) <= y <= max(y1, y2))
+
+
+class WallGraph:
+    """
+    Junction index of a set of walls.
+
+    junctions maps a point to the indexes of the walls that end at it or
+    pass through it (T junctions). Axis-aligned walls are looked up by
+    bisection; the few diagonal ones are tested one by one.
+    """
+
+    def __init__(self, segments):
+        self.segments = [(tuple(s), tuple(e)) for s, e in segments]
+        self._horizontal = defaultdict(list)  # y -> sorted [(x1, x2, index)]
+        self._vertical = defaultdict(list)    # x -> sorted [(y1, y2, index)]
+        self._diagonal = []                   # indexes
+        for i, (s, e) in enumerate(self.segments):
+            if not is_axis_aligned(s, e):
+                self._diagonal.append(i)
+            elif is_horizontal(s, e):
+                self._horizontal[s[1]].append((min(s[0], e[0]), max(s[0], e[0]), i))
+            else:
+                self._vertical[s[0]].append((min(s[1], e[1]), max(s[1], e[1]), i))
+        for lines in (self._horizontal, self._vertical):
+            for intervals in lines.values():
+                intervals.sort()
+
+        self.junctions = defaultdict(set)
+        for i, (s, e) in enumerate(self.segments):
+            for point in (s, e):
+                self.junctions[point].add(i)
+                self.junctions[point].update(self.walls_through(point))
+
+    def _through(self, intervals, position):
+        # Intervals on one line are disjoint once merged, but be lenient
+        found = []
+        k = bisect_right(intervals, (position, float("inf"), float("inf")))
+        for low, high, index in reversed(intervals[:k]):
+            if low <= position <= high:
+                found.append(index)
+            elif high < position:
+                break
+        return found
+
+    def walls_through(self, point):
+        """Indexes of the walls containing a point (ends included)"""
+        x, y = point
+        return (self._through(self._horizontal.get(y, []), x)
+                + self._through(self._vertical.get(x, []), y)
+                + [i for i in self._diagonal if _on_segment(point, *self.segments[i])])
+
+    def degree(self, point):
+        return len(self.junctions.get(point, ()))
+
+    def split_edges(self):
+        """The walls cut at every junction lying on them: the edges of the planar graph"""
+        cuts = defaultdict(set)
+        for point, indexes in self.junctions.items():
+            for i in indexes:
+                cuts[i].add(point)
+        edges = []
+        for i, (s, e) in enumerate(self.segments):
+            horizontal = is_horizontal(s, e)
+            points = sorted(cuts[i] | {s, e}, key=lambda p: p[0] if horizontal else p[1])
+            edges.extend((a, b) for a, b in zip(points, points[1:]) if a != b)
+        return edges
+
+
+def normalize_segments(segments, tolerance=SNAP_TOLERANCE):
+    """Snap then merge wall segments. Returns the new (start, end) list."""
+    return merge_collinear(snap_segments(segments, tolerance))
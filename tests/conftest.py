@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+from ivy.ivy_bus import ivy_bus
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "template.json")
+
+
+@pytest.fixture
+def bus(monkeypatch):
+    """The application bus, emptied for the test; messages() records what is published"""
+    monkeypatch.setattr(ivy_bus, "_subscribers", {})
+
+    def messages(*names):
+        received = []
+        for name in names:
+            ivy_bus.subscribe(name, lambda data, name=name: received.append((name, data)))
+        return received
+
+    ivy_bus.messages = messages
+    yield ivy_bus
+    del ivy_bus.messages
+
+
+@pytest.fixture
+def controller(bus):
+    """A Controller on the bus with the template project loaded and its first floor selected"""
+    from controller.controller import Controller, load_project
+    controller = Controller()
+    controller._set_floors(load_project(TEMPLATE))
+    controller.selected_floor_index = 0
+    return controller
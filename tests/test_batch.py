@@ -0,0 +1,58 @@
+import io
+import json
+import os
+import shutil
+
+import batch
+from model import duct_routing
+
+from tests.conftest import TEMPLATE
+
+
+def test_output_names_keep_unique_file_names():
+    names = batch.output_names(["a/projet.json", "b/autre.json"])
+    assert names == {"a/projet.json": "projet", "b/autre.json": "autre"}
+
+
+def test_output_names_disambiguate_same_file_name():
+    files = ["archive/2023/projet.json", "archive/2024/projet.json", "archive/seul.json"]
+    names = batch.output_names(files)
+    assert names["archive/2023/projet.json"] == "2023_projet"
+    assert names["archive/2024/projet.json"] == "2024_projet"
+    assert names["archive/seul.json"] == "seul"
+    assert len(set(names.values())) == len(files)
+
+
+def test_convert_does_not_overwrite_same_named_projects(tmp_path):
+    for folder in ("a", "b"):
+        os.makedirs(tmp_path / folder)
+        shutil.copy(TEMPLATE, tmp_path / folder / "projet.json")
+    out_dir = tmp_path / "out"
+    os.makedirs(out_dir)
+    files = batch.find_project_files([str(tmp_path / "a"), str(tmp_path / "b")])
+
+    with open(tmp_path / "results.json", "w", encoding="utf-8") as output:
+        failures = batch.process("convert", files, {"to": "json", "output_dir": str(out_dir)},
+                                 output, jobs=1, quiet=True)
+
+    assert failures == 0
+    assert sorted(os.listdir(out_dir)) == ["a_projet.json", "b_projet.json"]
+
+
+def test_single_project_routes_its_floors_with_the_pool(monkeypatch):
+    started = []
+    real_pool = duct_routing.Pool
+
+    def pool(*args, **kwargs):
+        started.append(kwargs.get("processes"))
+        return real_pool(*args, **kwargs)
+
+    monkeypatch.setattr(duct_routing, "Pool", pool)
+    output = io.StringIO()
+    failures = batch.process("route", [TEMPLATE], {"output_dir": None}, output, jobs=2, quiet=True)
+
+    assert failures == 0 and started == [2]
+    (result,) = json.loads(output.getvalue())
+    expected = batch.run_task(("route", TEMPLATE, {"output_dir": None}))
+    assert {key: result[key] for key in ("branches", "unrouted", "duct_length", "fan_pressure")} == \
+        {key: expected[key] for key in ("branches", "unrouted", "duct_length", "fan_pressure")}
@@ -0,0 +1,63 @@
+import xml.etree.ElementTree as ET
+
+from controller.controller import load_project
+from view.cad_export import METERS_PER_PIXEL, dxf_layer_name, iter_dxf, iter_svg
+from tests.conftest import TEMPLATE
+
+SVG = "{http://www.w3.org/2000/svg}"
+INKSCAPE = "{http://www.inkscape.org/namespaces/inkscape}"
+
+
+def _kinds(floor):
+    return [kind for kind, objects in (("wall", floor.walls), ("window", floor.windows), ("door", floor.doors),
+                                       ("vent", floor.vents), ("plenum", floor.plenums)) if objects]
+
+
+def _dxf_pairs(text):
+    lines = text.split("\n")
+    assert lines[-1] == ""
+    lines = lines[:-1]
+    assert len(lines) % 2 == 0
+    return [(int(code), value) for code, value in zip(lines[::2], lines[1::2])]
+
+
+def test_svg_has_one_layer_per_floor_and_kind():
+    floors = load_project(TEMPLATE)
+    root = ET.fromstring("".join(iter_svg(floors)).encode("utf-8"))
+
+    floor_groups = root.findall(f"{SVG}g")
+    assert [g.get(f"{INKSCAPE}label") for g in floor_groups] == [floor.name for floor in floors]
+    for index, (group, floor) in enumerate(zip(floor_groups, floors)):
+        layers = group.findall(f"{SVG}g")
+        assert [layer.get("id") for layer in layers] == [f"floor-{index}-{kind}" for kind in _kinds(floor)]
+        counts = {layer.get(f"{INKSCAPE}label"): len(layer) for layer in layers}
+        assert counts.get("wall") == len(floor.walls)
+        assert counts.get("vent") == len(floor.vents)
+
+
+def test_dxf_group_codes_pair_and_floors_sit_at_their_elevation():
+    floors = load_project(TEMPLATE)
+    pairs = _dxf_pairs("".join(iter_dxf(floors)))
+    assert pairs[-1] == (0, "EOF")
+    assert (9, "$ACADVER") in pairs
+    assert all(code != 9 or value == "$ACADVER" for code, value in pairs)
+
+    # Group the entities by layer with the z of their points
+    elevations = {}
+    layer = None
+    entities = pairs[pairs.index((2, "ENTITIES")):]
+    for code, value in entities:
+        if code == 8:
+            layer = value
+        elif code in (30, 31):
+            elevations.setdefault(layer, set()).add(float(value))
+
+    elevation = 0.0
+    for index, floor in enumerate(floors):
+        assert elevations[dxf_layer_name(index, floor.name, "wall")] == {elevation}
+        elevation += floor.height
+
+    wall = floors[0].walls[0]
+    first_line = entities.index((0, "LINE"))
+    assert entities[first_line + 2] == (10, f"{wall.start[0] * METERS_PER_PIXEL:.4f}")
+    assert entities[first_line + 3] == (20, f"{-wall.start[1] * METERS_PER_PIXEL:.4f}")
@@ -0,0 +1,72 @@
+from math import log10, pi
+
+import pytest
+
+from model.duct_network import (build_networks, riser_diameter, AIR_DENSITY, AIR_VISCOSITY,
+                                BRANCH_LOSS_FACTOR, DUCT_ROUGHNESS, EXTRACTION, INSUFFLATION)
+from model.floor import Floor
+from model.plenum import Plenum
+from model.units import PIXELS_PER_METER, UNKNOWN
+from model.vent import Vent
+
+M = PIXELS_PER_METER
+
+
+def _drop(flow, diameter, length, zeta):
+    """Darcy-Weisbach with the Swamee-Jain friction factor, one segment at a time"""
+    d = diameter / 1000
+    velocity = flow / 3600 / (pi * d ** 2 / 4)
+    reynolds = velocity * d / AIR_VISCOSITY
+    friction = 0.25 / log10(DUCT_ROUGHNESS / (3.7 * d) + 5.74 / reynolds ** 0.9) ** 2
+    return (friction * length / d + zeta) * AIR_DENSITY * velocity ** 2 / 2
+
+
+def _vent(x, y, flow, function="extraction_interne", diameter=125):
+    return Vent((x, y), (x + 15, y), "B", diameter, flow, function, "#ff0000")
+
+
+def _project(plenum_type="Simple", max_flow=UNKNOWN):
+    floors = [Floor("RDC"), Floor("R+1")]
+    plenum = Plenum((0, 0), (2 * M, 2 * M), max_flow)
+    plenum.type = plenum_type
+    floors[0].add_plenum(plenum)
+    return floors, plenum
+
+
+def test_single_branch_matches_darcy_weisbach():
+    floors, _plenum = _project()
+    floors[0].add_vent(_vent(4 * M, 1 * M, 90))   # 3 m + 0 m from the plenum centre
+    (network,) = build_networks(floors)
+    assert network.kind == EXTRACTION
+    assert network.lengths == [3]
+    assert network.fan_pressure == pytest.approx(_drop(90, 125, 3, BRANCH_LOSS_FACTOR))
+
+
+def test_riser_carries_the_upper_floor_and_worst_path_sets_the_fan():
+    floors, _plenum = _project()
+    floors[0].add_vent(_vent(M, M, 30))
+    floors[1].add_vent(_vent(6 * M, M, 60))
+    floors[1].add_vent(_vent(M, 2 * M, 15))
+    (network,) = build_networks(floors)
+    result = network.solve()
+    # Segment 0 is the riser section up to R+1: it carries both vents of that floor
+    assert result["flows"].tolist() == [75, 30, 60, 15]
+    assert network.diameters[0] == riser_diameter(75)
+    assert network.fan_pressure == pytest.approx(result["pressure_drops"][0] + result["pressure_drops"][2])
+
+
+def test_insufflation_needs_a_double_flux_plenum():
+    floors, plenum = _project()
+    floors[0].add_vent(_vent(M, M, 30, "insufflation_interne"))
+    assert build_networks(floors) == []
+    plenum.type = "Double"
+    assert [network.kind for network in build_networks(floors)] == [INSUFFLATION]
+
+
+def test_fan_capacity_against_max_flow():
+    floors, plenum = _project()
+    floors[0].add_vent(_vent(M, M, 120))
+    (network,) = build_networks(floors)
+    assert network.fan_capacity_ok
+    plenum.max_flow = 100
+    assert not network.fan_capacity_ok
@@ -0,0 +1,39 @@
+from unittest import mock
+
+from controller.controller import load_project
+from model import duct_routing
+from model.duct_routing import route_building, obstacle_grid, plan_bounds, path_length, WALL_COST
+from model.floor import Floor
+from model.wall import Wall
+
+from tests.conftest import TEMPLATE
+
+
+def test_obstacle_grid_is_cached_per_version():
+    floor = Floor("RDC")
+    floor.add_wall(Wall((0, 0), (200, 0)))
+    origin, shape = plan_bounds([floor])
+    grid = obstacle_grid(floor, origin, shape)
+    assert grid.max() == WALL_COST
+    assert obstacle_grid(floor, origin, shape) is grid
+    floor.add_wall(Wall((0, 0), (0, 200)))
+    assert obstacle_grid(floor, origin, shape) is not grid
+
+
+def test_every_template_vent_is_routed():
+    floors = load_project(TEMPLATE)
+    routes = route_building(floors, processes=1)
+    vents = [vent.id for floor in floors for vent in floor.vents]
+    assert set(routes) <= set(vents)
+    assert routes and all(path and path_length(path) > 0 for path in routes.values())
+
+
+def test_pool_results_are_cached_in_the_calling_process():
+    floors = load_project(TEMPLATE)
+    first = route_building(floors, processes=2)
+    routed = [floor for floor in floors if any(vent.id in first for vent in floor.vents)]
+    assert routed and all(duct_routing._fields.get(floor) for floor in routed)
+
+    # Nothing changed: the second routing does not start a pool
+    with mock.patch.object(duct_routing, "Pool", side_effect=AssertionError("pool started")):
+        assert route_building(floors, processes=2) == first
@@ -0,0 +1,112 @@
+import json
+
+import batch
+import model.floor
+from model.door import Door
+from model.floor import Floor
+from model.geometry_check import (check_structure, CROSSING, DUPLICATE, GAP, ORPHAN_OPENING,
+                                  VENT_OUTSIDE, ZERO_LENGTH)
+from model.vent import Vent
+from model.wall import Wall
+
+from tests.conftest import TEMPLATE
+
+
+def _vent(point):
+    return Vent(point, (point[0] + 15, point[1]), "B", None, None, "extraction_interne", "#ff0000")
+
+
+def _room():
+    floor = Floor("RDC")
+    for start, end in (((0, 0), (200, 0)), ((200, 0), (200, 200)), ((200, 200), (0, 200)), ((0, 200), (0, 0))):
+        floor.add_wall(Wall(start, end))
+    return floor
+
+
+def _kinds(issues):
+    return sorted(issue.kind for issue in issues)
+
+
+def test_closed_room_has_no_issue():
+    assert _room().geometry_check() == []
+
+
+def test_crossing_gap_and_zero_length():
+    walls = [Wall((0, 50), (100, 50)), Wall((50, 0), (50, 100)), Wall((200, 0), (200, 100)),
+             Wall((205, 50), (300, 50)), Wall((400, 0), (400, 0))]
+    issues = check_structure(walls)
+    assert _kinds(issues) == [CROSSING, GAP, ZERO_LENGTH]
+    crossing = next(issue for issue in issues if issue.kind == CROSSING)
+    assert crossing.point == (50, 50)
+
+
+def test_touching_ends_do_not_cross():
+    assert check_structure([Wall((0, 0), (100, 0)), Wall((100, 0), (100, 100))]) == []
+
+
+def test_overlapping_walls_reported_after_the_merge():
+    floor = _room()
+    floor.add_wall(Wall((50, 0), (150, 0)))
+    floor.normalize_walls()
+    issues = floor.geometry_check()
+    assert _kinds(issues) == [DUPLICATE]
+    assert issues[0].point == (100, 0)
+    assert [(wall.start, wall.end) for wall in issues[0].objects] == [((0, 0), (200, 0))]
+
+    # Gone once no wall covers the merged part
+    floor.remove_wall(issues[0].objects[0])
+    assert DUPLICATE not in _kinds(floor.geometry_check())
+
+
+def test_walls_merged_while_editing_are_not_reported():
+    floor = _room()
+    wall = Wall((50, 0), (150, 0))
+    floor.add_wall(wall)
+    floor.normalize_walls(around=[wall])
+    assert floor.geometry_check() == []
+
+
+def test_orphan_opening_and_vent_outside():
+    floor = _room()
+    floor.add_door(Door((500, 0), (540, 0)))
+    floor.add_vent(_vent((100, 100)))
+    floor.add_vent(_vent((400, 400)))
+    issues = floor.geometry_check()
+    assert _kinds(issues) == [ORPHAN_OPENING, VENT_OUTSIDE]
+    assert next(issue for issue in issues if issue.kind == VENT_OUTSIDE).objects[0].start == (400, 400)
+
+
+def test_adding_a_vent_does_not_trace_the_rooms_again(monkeypatch):
+    floor = _room()
+    floor.geometry_check()
+    traced = []
+    original = model.floor.room_outlines
+    monkeypatch.setattr(model.floor, "room_outlines", lambda *args: traced.append(args) or original(*args))
+    monkeypatch.setattr(model.floor, "check_structure", lambda *args: traced.append(args))
+
+    floor.add_vent(_vent((400, 400)))
+    assert _kinds(floor.geometry_check()) == [VENT_OUTSIDE]
+    assert len(floor.rooms()) == 1
+    assert traced == []
+
+    floor.add_wall(Wall((0, 100), (200, 100)))
+    assert len(floor.rooms()) == 2
+    assert len(traced) == 1
+
+
+def test_batch_check_agrees_with_the_application(controller):
+    result = batch.run_task(("check", TEMPLATE, {}))
+    assert result["status"] == "ok"
+    assert [floor.geometry_check() for floor in controller.floors] == [[]] * len(controller.floors)
+
+
+def test_batch_check_reports_overlapping_walls(tmp_path):
+    floor = _room()
+    floor.add_wall(Wall((50, 0), (150, 0)))
+    path = tmp_path / "projet.json"
+    path.write_text(json.dumps([floor.to_dict()]), encoding="utf-8")
+
+    result = batch.run_task(("check", str(path), {}))
+    assert result["status"] == "invalid"
+    assert result[DUPLICATE] == 1
+    assert result[CROSSING] == 0
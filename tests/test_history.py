@@ -0,0 +1,93 @@
+from controller.history import History, CHANGE_BYTES
+from model.floor import Floor
+from model.wall import Wall
+
+
+def _recorded(**options):
+    floor = Floor("RDC")
+    history = History(insert_floor=None, remove_floor=None, **options)
+    floor.add_observer(history.record)
+    return floor, history
+
+
+def _walls(floor):
+    return [(wall.start, wall.end) for wall in floor.walls]
+
+
+def test_each_change_is_one_step_undone_and_redone():
+    floor, history = _recorded()
+    wall = Wall((0, 0), (100, 0))
+    floor.add_wall(wall)
+    floor.move_object(wall, (0, 10), (100, 10))
+    floor.rename("Rez-de-chaussée")
+    floor.set_height(3.0)
+
+    assert len(history.undo_stack) == 4
+    while history.can_undo():
+        history.undo()
+    assert (floor.walls, floor.name, floor.height) == ([], "RDC", 2.5)
+    while history.can_redo():
+        history.redo()
+    assert (_walls(floor), floor.name, floor.height) == ([((0, 10), (100, 10))], "Rez-de-chaussée", 3.0)
+
+
+def test_step_groups_changes_and_undoes_them_in_reverse():
+    floor, history = _recorded()
+    wall = Wall((0, 0), (200, 0))
+    floor.add_wall(wall)
+    with history.step("Couper"):
+        floor.remove_wall(wall)
+        floor.add_wall(Wall((0, 0), (100, 0)))
+        floor.add_wall(Wall((100, 0), (200, 0)))
+    assert [step.label for step in history.undo_stack] == ["added", "Couper"]
+
+    history.undo()
+    assert floor.walls == [wall]
+    history.redo()
+    assert _walls(floor) == [((0, 0), (100, 0)), ((100, 0), (200, 0))]
+
+
+def test_a_new_change_clears_redo():
+    floor, history = _recorded()
+    floor.add_wall(Wall((0, 0), (100, 0)))
+    history.undo()
+    assert history.can_redo()
+    floor.add_wall(Wall((0, 0), (0, 100)))
+    assert not history.can_redo()
+
+
+def test_oldest_steps_dropped_over_the_memory_budget():
+    floor, history = _recorded(max_bytes=3 * CHANGE_BYTES)
+    for i in range(5):
+        floor.add_wall(Wall((i * 10, 0), (i * 10, 100)))
+    assert len(history.undo_stack) == 3
+    assert history.size == 3 * CHANGE_BYTES
+    while history.undo():
+        pass
+    assert len(floor.walls) == 2
+
+
+def test_deleted_floor_comes_back_on_undo(controller):
+    names = [floor.name for floor in controller.floors]
+    controller.handle_delete_floor_request({"floor_index": 1})
+    assert [floor.name for floor in controller.floors] == names[:1] + names[2:]
+    controller.handle_undo_request({})
+    assert [floor.name for floor in controller.floors] == names
+    controller.handle_redo_request({})
+    assert len(controller.floors) == len(names) - 1
+
+
+def test_undo_without_a_selected_floor(controller):
+    controller.floors[1].add_wall(Wall((0, 0), (100, 0)))
+    controller.selected_floor_index = None
+    controller.handle_undo_request({})
+    assert controller.selected_floor_index == 1
+
+
+def test_plenum_flag_kept_apart_from_the_plenum_object(controller, bus):
+    alerts = bus.messages("show_alert_request")
+    controller._publish_plenum_state()
+    assert controller.plenum_exists is True
+    assert controller.the_plenum is None
+    controller.handle_tool_selected_request({"tool": "plenum"})
+    assert [data["title"] for _name, data in alerts] == ["Plenum Existant"]
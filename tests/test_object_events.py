@@ -0,0 +1,139 @@
+import itertools
+
+import pytest
+
+from model.wall import Wall
+from view.graphical_view import GraphicalView
+
+OBJECT_EVENTS = ("object_added", "object_changed", "object_removed", "objects_update")
+
+
+def _click(controller, tool, *points):
+    controller.current_tool = tool
+    for x, y in points:
+        getattr(controller, f"handle_draw_{tool}_request")({"x": x, "y": y, "is_click": True})
+
+
+@pytest.fixture
+def events(controller, bus):
+    return bus.messages(*OBJECT_EVENTS)
+
+
+def _only(events):
+    (name, data), = events
+    events.clear()
+    return name, data
+
+
+def test_add_move_delete_each_send_one_event(controller, events):
+    floor = controller.floors[0]
+    _click(controller, "wall", (2000, 2000), (2300, 2000))
+    wall = floor.walls[-1]
+    assert _only(events) == ("object_added", {"id": wall.id, "kind": "wall", "start": (2000, 2000),
+                                              "end": (2300, 2000), "fill": "black"})
+
+    controller._set_selection([wall])
+    controller.handle_selection_transform_request({"operation": "move", "dx": 10, "dy": 0})
+    name, data = _only(events)
+    assert (name, data["id"], data["start"], data["end"]) == ("object_changed", wall.id, (2010, 2000), (2310, 2000))
+
+    controller._set_selection([wall])
+    controller.handle_selection_delete_request({})
+    assert _only(events) == ("object_removed", {"id": wall.id})
+
+
+def test_undo_and_redo_send_one_event(controller, events):
+    _click(controller, "wall", (2000, 2000), (2300, 2000))
+    wall = controller.floors[0].walls[-1]
+    events.clear()
+
+    controller.handle_undo_request({})
+    assert _only(events) == ("object_removed", {"id": wall.id})
+    controller.handle_redo_request({})
+    name, data = _only(events)
+    assert (name, data["id"], data["kind"]) == ("object_added", wall.id, "wall")
+
+    controller._set_selection([wall])
+    controller.handle_selection_transform_request({"operation": "move", "dx": 0, "dy": 20})
+    events.clear()
+    controller.handle_undo_request({})
+    name, data = _only(events)
+    assert (name, data["id"], data["start"]) == ("object_changed", wall.id, (2000, 2000))
+    controller.handle_redo_request({})
+    name, data = _only(events)
+    assert (name, data["id"], data["start"]) == ("object_changed", wall.id, (2000, 2020))
+
+
+def test_merged_wall_sent_as_one_update(controller, events):
+    _click(controller, "wall", (2000, 2000), (2300, 2000))
+    first = controller.floors[0].walls[-1]
+    _click(controller, "wall", (2300, 2000), (2600, 2000))
+    events.pop(0)
+
+    # The drawn wall is merged away before the View ever sees it
+    name, data = _only(events)
+    merged = controller.floors[0].walls[-1]
+    assert name == "objects_update"
+    assert data["removed"] == [first.id]
+    assert [(item["id"], item["start"], item["end"]) for item in data["drawn"]] == [(merged.id, (2000, 2000), (2600, 2000))]
+
+    controller.handle_undo_request({})
+    name, data = _only(events)
+    assert (data["removed"], [item["id"] for item in data["drawn"]]) == ([merged.id], [first.id])
+
+
+def test_other_floors_send_no_event(controller, events):
+    controller.floors[1].add_wall(Wall((0, 0), (100, 0)))
+    assert events == []
+
+
+class _Canvas:
+    def __init__(self):
+        self.items = {}
+        self._ids = itertools.count(1)
+
+    def create(self, *tags):
+        item = next(self._ids)
+        self.items[item] = tags
+        return item
+
+    def find_withtag(self, tag):
+        return [item for item, tags in self.items.items() if tag in tags]
+
+    def delete(self, item):
+        del self.items[item]
+
+    def tag_lower(self, tag):
+        pass
+
+
+class _View:
+    """The object event handlers of the View on a stand-in canvas"""
+    on_object_added = GraphicalView.on_object_added
+    on_object_removed = GraphicalView.on_object_removed
+    on_object_changed = GraphicalView.on_object_changed
+    on_objects_update = GraphicalView.on_objects_update
+    _ensure_onion_skin_below = GraphicalView._ensure_onion_skin_below
+
+    def __init__(self):
+        self.canvas = _Canvas()
+        self.canvas_item_meta = {}
+        self.vent_tooltips = {}
+
+    def on_draw_wall_update(self, data):
+        item = self.canvas.create("wall", f"obj{data['id']}")
+        self.canvas_item_meta[item] = data
+
+
+def test_view_keeps_one_item_per_object():
+    view = _View()
+    view.on_object_added({"id": 1, "kind": "wall", "start": (0, 0), "end": (10, 0)})
+    view.on_object_added({"id": 2, "kind": "wall", "start": (10, 0), "end": (20, 0)})
+    view.on_object_changed({"id": 1, "kind": "wall", "start": (0, 5), "end": (10, 5)})
+    assert sorted(data["start"] for data in view.canvas_item_meta.values()) == [(0, 5), (10, 0)]
+
+    view.on_objects_update({"removed": [2], "drawn": [{"id": 3, "kind": "wall", "start": (0, 0), "end": (20, 0)}]})
+    assert sorted(tags[1] for tags in view.canvas.items.values()) == ["obj1", "obj3"]
+    view.on_object_removed({"id": 1})
+    view.on_object_removed({"id": 1})
+    assert list(view.canvas_item_meta.values()) == [{"id": 3, "kind": "wall", "start": (0, 0), "end": (20, 0)}]
@@ -0,0 +1,36 @@
+import ast
+import inspect
+
+import controller.controller
+from view import palette
+from view.plan_renderer import render_ghost_layer
+
+
+def test_controller_does_not_import_the_view():
+    tree = ast.parse(inspect.getsource(controller.controller))
+    modules = [node.module for node in tree.body if isinstance(node, ast.ImportFrom)]
+    modules += [alias.name for node in tree.body if isinstance(node, ast.Import) for alias in node.names]
+    assert not [m for m in modules if m.split(".")[0] in ("view", "tkinter", "PIL")]
+
+
+def test_ghost_floors_are_sent_as_snapshots(controller, bus):
+    received = bus.messages("onion_skin_preview_update")
+    bus.publish("onion_skin_settings_request", {"below": 1, "above": 2})
+    controller.selected_floor_index = 1
+    controller._send_onion_skin_preview()
+
+    levels = received[-1][1]["levels"]
+    assert [level["offset"] for level in levels] == [2, -1, 1]
+    for level in levels:
+        floor = controller.floors[level["floor_index"]]
+        assert level["floor_id"] == floor.id
+        assert level["snapshot"].version == floor.version
+
+
+def test_snapshot_renders_like_its_floor(controller):
+    floor = controller.floors[0]
+    opacity = palette.onion_skin_opacity(-1)
+    from_snapshot = render_ghost_layer(floor.snapshot(), opacity, dashed=True)
+    from_floor = render_ghost_layer(floor, opacity, dashed=True)
+    assert from_snapshot[1] == from_floor[1]
+    assert from_snapshot[0].tobytes() == from_floor[0].tobytes()
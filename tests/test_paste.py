@@ -0,0 +1,34 @@
+from model.plenum import Plenum
+from model.wall import Wall
+
+
+def _plenums(controller):
+    return [plenum for floor in controller.floors for plenum in floor.plenums]
+
+
+def test_paste_to_floors_without_a_selected_floor(controller):
+    controller.clipboard = [Wall((0, 0), (0, 300))]
+    controller.selected_floor_index = None
+    before = [len(floor.walls) for floor in controller.floors]
+    controller.handle_paste_request({"floor_indexes": [0, 1]})
+    assert [len(floor.walls) for floor in controller.floors] == [before[0] + 1, before[1] + 1] + before[2:]
+
+
+def test_plenum_pasted_on_the_first_floor_only(controller, bus):
+    alerts = bus.messages("show_alert_request")
+    for floor in controller.floors:
+        for plenum in list(floor.plenums):
+            floor.remove_object(plenum)
+    controller.clipboard = [Plenum((0, 0), (40, 40))]
+    controller.handle_paste_request({"floor_indexes": [1, 2]})
+    assert [len(floor.plenums) for floor in controller.floors] == [0, 1, 0, 0]
+    assert len(alerts) == 1
+
+
+def test_plenum_not_pasted_when_the_project_has_one(controller, bus):
+    alerts = bus.messages("show_alert_request")
+    existing = _plenums(controller)
+    controller.clipboard = [Plenum((0, 0), (40, 40))]
+    controller.handle_paste_request({"floor_indexes": [0]})
+    assert _plenums(controller) == existing
+    assert "n'a pas été collé" in alerts[0][1]["message"]
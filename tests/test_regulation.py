@@ -0,0 +1,65 @@
+from model.regulation import (DwellingCheck, room_type, BATHROOM, CIRCULATION, KITCHEN, MAIN_ROOM,
+                              SERVICE_ROOM, SHOWER_ROOM, WC)
+from model.vent import Vent
+
+
+class _Room:
+    """Stand-in for model.rooms.Room: vents and the flows they give"""
+
+    def __init__(self, *vents):
+        self.vents = list(vents)
+
+    @property
+    def inflow(self):
+        return sum(v.flow_rate for v in self.vents if v.function == "insufflation_interne")
+
+    @property
+    def outflow(self):
+        return sum(v.flow_rate for v in self.vents if v.function == "extraction_interne")
+
+
+def _out(name, flow):
+    return Vent((0, 0), (15, 0), name, None, flow, "extraction_interne", "#ff0000")
+
+
+def _in(flow):
+    return Vent((0, 0), (15, 0), "Chambre", None, flow, "insufflation_interne", "#ff9900")
+
+
+def test_room_type_from_vent_names():
+    assert room_type(_Room(_out("Cuisine", 0))) == KITCHEN
+    assert room_type(_Room(_out("SdB étage", 0))) == BATHROOM
+    assert room_type(_Room(_out("Salle d’eau", 0))) == SHOWER_ROOM
+    assert room_type(_Room(_out("WC", 0))) == WC
+    assert room_type(_Room(_out("Cellier", 0))) == SERVICE_ROOM
+    assert room_type(_Room(_in(10))) == MAIN_ROOM
+    assert room_type(_Room()) == CIRCULATION
+
+
+def test_three_room_dwelling_reads_the_tables():
+    rooms = [_Room(_out("Cuisine", 105)), _Room(_out("Salle de bain", 30)), _Room(_out("WC", 15)),
+             _Room(_in(50)), _Room(_in(50)), _Room(_in(50))]
+    check = DwellingCheck(rooms)
+    assert check.main_rooms == 3
+    assert [room.required for room in check.rooms[:3]] == [105, 30, 15]
+    assert check.required_total == 150
+    assert check.compliant
+
+
+def test_under_ventilated_rooms_and_several_wcs():
+    rooms = [_Room(_out("Cuisine", 100)), _Room(_out("WC 1", 30)), _Room(_out("WC 2", 30))]
+    rooms += [_Room(_in(40)) for _ in range(4)]
+    check = DwellingCheck(rooms)
+    # Four main rooms: 120 for the kitchen, 15 for each WC when there are several
+    assert [room.required for room in check.rooms[:3]] == [120, 15, 15]
+    assert [room.kind for room in check.under_ventilated] == [KITCHEN]
+    assert not check.compliant
+
+
+def test_dwelling_minimum_over_the_service_rooms():
+    check = DwellingCheck([_Room(_out("Cellier", 20)), _Room(_in(20)), _Room(_in(20))])
+    # Two main rooms: at least 60 m³/h in all, more than the 15 of the service room
+    assert check.required_total == 60
+    assert check.rooms[1].required == 30
+    assert not check.compliant
+    assert DwellingCheck([]).required_total == 0
@@ -0,0 +1,8 @@
+def test_report_request_sends_the_floors_to_the_view(controller, bus):
+    received = bus.messages("report_data_update")
+    bus.publish("export_report_request", {"pdf_path": "/tmp/rapports/immeuble.pdf"})
+
+    (_name, data), = received
+    assert data["project_name"] == "immeuble"
+    assert data["pdf_path"] == "/tmp/rapports/immeuble.pdf"
+    assert data["floors"] == controller.floors
@@ -0,0 +1,60 @@
+from model.door import Door
+from model.floor import Floor
+from model.rooms import detect_rooms, room_outlines
+from model.units import PIXELS_PER_METER
+from model.vent import Vent
+from model.wall import Wall
+
+M = PIXELS_PER_METER
+
+
+def _square(x, y, size):
+    corners = [(x, y), (x + size, y), (x + size, y + size), (x, y + size)]
+    return list(zip(corners, corners[1:] + corners[:1]))
+
+
+def _vent(point, name="Cuisine"):
+    return Vent(point, (point[0] + 15, point[1]), name, None, 30, "extraction_interne", "#ff0000")
+
+
+def test_square_room_area_and_volume():
+    (room,) = detect_rooms(_square(0, 0, 4 * M), height=2.5)
+    assert room.area == 16
+    assert room.volume == 40
+
+
+def test_dividing_wall_and_dead_end():
+    walls = _square(0, 0, 4 * M) + [((2 * M, 0), (2 * M, 4 * M)), ((0, M), (M, M))]
+    rooms = detect_rooms(walls)
+    # The wall sticking into the left room does not split it
+    assert sorted(room.area for room in rooms) == [8, 8]
+
+
+def test_door_closes_a_gap_in_the_walls():
+    walls = [((0, 0), (M, 0)), ((2 * M, 0), (4 * M, 0))] + _square(0, 0, 4 * M)[1:]
+    assert detect_rooms(walls) == []
+    (room,) = detect_rooms(walls, [((M, 0), (2 * M, 0))])
+    assert room.area == 16
+
+
+def test_vent_goes_to_the_island_and_small_faces_are_left_out():
+    walls = _square(0, 0, 10 * M) + _square(4 * M, 4 * M, M) + _square(8 * M, 8 * M, 10)
+    island_vent, room_vent = _vent((4.5 * M, 4.5 * M)), _vent((M, M))
+    rooms = detect_rooms(walls, vents=[island_vent, room_vent])
+    # Largest first; the 10 px square is a drawing leftover
+    assert [room.area for room in rooms] == [100, 1]
+    assert rooms[0].vents == [room_vent] and rooms[1].vents == [island_vent]
+    assert rooms[1].outflow == 30
+    assert len(room_outlines(walls)) == 2
+
+
+def test_floor_rooms_follow_the_walls():
+    floor = Floor("RDC")
+    for start, end in _square(0, 0, 4 * M):
+        floor.add_wall(Wall(start, end))
+    assert [room.area for room in floor.rooms()] == [16]
+    floor.add_wall(Wall((0, 2 * M), (4 * M, 2 * M)))
+    floor.add_door(Door((M, 2 * M), (2 * M, 2 * M)))
+    assert [room.area for room in floor.rooms()] == [8, 8]
+    floor.set_height(3)
+    assert [room.volume for room in floor.rooms()] == [24, 24]
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from model.floor import Floor
+from model.schema import normalize_project, load_project_file, ProjectValidationError
+from model.units import UNKNOWN
+
+
+def _project(**plenum):
+    return [{"name": "RDC", "plenums": [dict({"start": [0, 0], "end": [40, 40]}, **plenum)]}]
+
+
+def test_unknown_plenum_max_flow_is_kept():
+    for value in (None, "", "N/A"):
+        floors, issues = normalize_project(_project(max_flow=value))
+        assert issues == []
+        assert floors[0]["plenums"][0]["max_flow"] is UNKNOWN
+
+
+def test_plenum_max_flow_is_parsed():
+    floors, issues = normalize_project(_project(max_flow="1200"))
+    assert issues == []
+    assert floors[0]["plenums"][0]["max_flow"] == 1200
+
+
+def test_negative_plenum_max_flow_is_reported():
+    _floors, issues = normalize_project(_project(max_flow=-5))
+    assert issues and issues[0].startswith("floors[0].plenums[0].max_flow")
+
+
+def test_unknown_plenum_max_flow_round_trips(tmp_path):
+    floor = Floor.from_dict(normalize_project(_project(max_flow=None))[0][0])
+    path = tmp_path / "projet.json"
+    path.write_text(json.dumps([floor.to_dict()]), encoding="utf-8")
+
+    reloaded = Floor.from_dict(load_project_file(path)[0])
+    assert reloaded.plenums[0].max_flow is UNKNOWN
+
+
+def test_defaults_filled_and_numeric_strings_coerced():
+    floors, issues = normalize_project([{"name": "RDC", "height": "2,7",
+                                         "windows": [{"start": ["0", 0], "end": [40, "0"]}],
+                                         "vents": [{"start": [0, 0], "end": [15, 0], "flow": "45",
+                                                    "role": "insufflation_interne"}]}])
+    assert issues == []
+    floor = floors[0]
+    assert floor["height"] == 2.7
+    assert floor["walls"] == [] and floor["doors"] == []
+    assert floor["windows"] == [{"start": (0, 0), "end": (40, 0), "thickness": 5}]
+    vent = floor["vents"][0]
+    assert (vent["flow_rate"], vent["function"], vent["diameter"]) == (45, "insufflation_interne", UNKNOWN)
+    assert vent["color"] == "#ff9900"
+
+
+def test_every_problem_reported_with_its_path():
+    _floors, issues = normalize_project([
+        {"name": "RDC", "walls": [{"start": [0, 0]}, {"start": [0, 0], "end": [1, "a"]}, "mur"],
+         "vents": [{"start": [0, 0], "end": [15, 0], "function": "soufflage"}]},
+        {"name": "R+1", "height": -1, "doors": {}},
+    ])
+    assert [issue.split(":")[0] for issue in issues] == [
+        "floors[0].walls[0].end", "floors[0].walls[1].end", "floors[0].walls[2]",
+        "floors[0].vents[0].function", "floors[1].height", "floors[1].doors"]
+
+
+def test_unusable_objects_dropped_and_documents_rejected():
+    floors, _issues = normalize_project([{"walls": [{"start": [0, 0]}, {"start": [0, 0], "end": [10, 0]}]}])
+    assert floors[0]["name"] == "Etage ?"
+    assert floors[0]["walls"] == [{"start": (0, 0), "end": (10, 0)}]
+    assert normalize_project({"name": "RDC"}) == ([], ["floors: le projet doit être une liste d'étages"])
+    assert normalize_project([]) == ([], ["floors: aucune donnée d'étage trouvée"])
+
+
+def test_load_project_file_raises_with_all_issues(tmp_path):
+    path = tmp_path / "projet.json"
+    path.write_text(json.dumps([{"walls": [{}]}]), encoding="utf-8")
+    with pytest.raises(ProjectValidationError) as error:
+        load_project_file(path)
+    assert error.value.issues == ["floors[0].walls[0].start: champ obligatoire manquant",
+                                  "floors[0].walls[0].end: champ obligatoire manquant"]
+    (tmp_path / "broken.json").write_text("[{", encoding="utf-8")
+    with pytest.raises(ProjectValidationError):
+        load_project_file(tmp_path / "broken.json")
@@ -0,0 +1,69 @@
+import numpy as np
+
+from controller.history import History
+from model.floor import Floor
+from model.selection import (SelectionIndex, object_points, transform_points, selection_center,
+                             ROTATE_CLOCKWISE, MIRROR_HORIZONTAL)
+from model.vent import Vent
+from model.wall import Wall
+
+
+class _NoScan(list):
+    def index(self, *args):
+        raise AssertionError("linear scan")
+
+
+def _floor(count):
+    floor = Floor("RDC")
+    for i in range(count):
+        floor.add_wall(Wall((i * 30, 0), (i * 30, 20)))
+    return floor
+
+
+def _records_match(floor):
+    return [(r.start, r.end) for r in floor.snapshot().walls] == [(w.start, w.end) for w in floor.walls]
+
+
+def test_rectangle_and_lasso_queries():
+    vent = Vent((50, 50), (65, 50), "A", None, None, "extraction_interne", "#ff0000")
+    wall = Wall((0, 0), (100, 0))
+    index = SelectionIndex([wall, vent])
+    # A vent is selected by its centre, a wall by both ends
+    assert index.in_rectangle((40, 40), (60, 60)) == [vent]
+    assert index.in_rectangle((-1, -1), (101, 60)) == [wall, vent]
+    assert index.in_lasso([(-10, -10), (110, -10), (110, 10), (-10, 10)]) == [wall]
+
+
+def test_quarter_turn_and_mirror_about_the_centre():
+    points = object_points([Wall((0, 0), (100, 0))])
+    center = selection_center(points)
+    turned = transform_points(points, ROTATE_CLOCKWISE, center)
+    assert turned.tolist() == [[[50.0, -50.0], [50.0, 50.0]]]
+    mirrored = transform_points(points, MIRROR_HORIZONTAL, center)
+    assert mirrored.tolist() == [[[100.0, 0.0], [0.0, 0.0]]]
+
+
+def test_move_objects_looks_positions_up_once():
+    floor = _floor(50)
+    floor.walls = _NoScan(floor.walls)
+    walls = list(floor.walls[10:20])
+    floor.move_objects(walls, transform_points(object_points(walls), offset=(5, 0)))
+    assert walls[0].start == (305.0, 0.0)
+    assert _records_match(floor)
+
+
+def test_bulk_move_undo_and_redo():
+    floor = _floor(200)
+    history = History(insert_floor=None, remove_floor=None)
+    floor.add_observer(history.record)
+    walls = list(floor.walls)
+    before = object_points(walls)
+    with history.step("Déplacement"):
+        floor.move_objects(walls, transform_points(before, offset=(0, 10)))
+
+    floor.walls = _NoScan(floor.walls)
+    history.undo()
+    assert np.array_equal(object_points(walls), before)
+    history.redo()
+    assert np.array_equal(object_points(walls), before + (0, 10))
+    assert _records_match(floor)
@@ -0,0 +1,43 @@
+import pytest
+
+from model.snapping import SnapIndex, ENDPOINT, MIDPOINT, WALL, EXTENSION, GRID, GRID_STEP
+from model.wall import Wall
+
+
+@pytest.fixture
+def index():
+    return SnapIndex([Wall((0, 0), (200, 0)), Wall((200, 0), (200, 100))])
+
+
+def test_plan_targets_in_order_of_preference(index):
+    assert index.snap((203, 4)).kind == ENDPOINT
+    assert index.snap((102, 3)).point == (100, 0) and index.snap((102, 3)).kind == MIDPOINT
+    assert index.snap((53, 4))[:2] == ((53, 0), WALL)
+    assert index.snap((404, 97)).kind == EXTENSION
+
+
+def test_grid_is_off_by_default(index):
+    assert index.snap((1001, 1001)) is None
+
+
+def test_grid_leaves_room_between_nodes(index):
+    node = (1000, 1000)
+    assert index.snap((node[0] + 1, node[1] - 1), grid=True) == (node, GRID, None)
+    # Half a step away from every node: the cursor stays where it is
+    assert index.snap((node[0] + GRID_STEP / 2 - 1, node[1] + 4), grid=True) is None
+
+
+def test_plan_target_beats_grid_node(index):
+    # The grid node (40, 0) is 1 px away, the wall line too: the wall wins
+    snap = index.snap((41, 1), grid=True)
+    assert snap.kind == WALL and snap.point == (41, 0)
+
+
+def test_controller_grid_setting(controller, bus):
+    floor = controller.floors[0]
+    controller.current_tool = "wall"
+    far = (-5000 + 1, -5000 + 1)
+    assert controller._snap(*far) == far
+    bus.publish("snap_settings_request", {"grid": True})
+    assert controller._snap(*far) == (-5000, -5000)
+    assert floor.snap_index() is floor.snap_index()
@@ -0,0 +1,58 @@
+from model.floor import Floor
+from model.snapshot import PersistentList, CHUNK_SIZE
+from model.wall import Wall
+
+
+def test_persistent_list_shares_untouched_chunks():
+    items = PersistentList.of(range(3 * CHUNK_SIZE))
+    changed = items.set(CHUNK_SIZE + 1, "x")
+    assert list(items)[CHUNK_SIZE + 1] == CHUNK_SIZE + 1
+    assert changed[CHUNK_SIZE + 1] == "x"
+    assert [a is b for a, b in zip(items.chunks, changed.chunks)] == [True, False, True]
+    shorter = changed.delete(0).append("y")
+    assert len(shorter) == 3 * CHUNK_SIZE and shorter[-1] == "y"
+
+
+def test_persistent_list_edits_copy_one_path_of_the_tree():
+    size = 2 * CHUNK_SIZE ** 3 + 5
+    items = PersistentList.of(range(size))
+    changed = items.set(size // 2, "x").delete(3).append("y")
+    assert list(changed) == [i for i in range(size) if i != 3][:size // 2 - 1] + ["x"] + \
+        list(range(size // 2 + 1, size)) + ["y"]
+    # Only the touched chunks are new, everything else is shared
+    shared = {id(chunk) for chunk in items.chunks}
+    assert sum(id(chunk) not in shared for chunk in changed.chunks) == 3
+
+    emptied = PersistentList.of(range(CHUNK_SIZE + 1))
+    for _ in range(CHUNK_SIZE + 1):
+        emptied = emptied.delete(0)
+    assert len(emptied) == 0 and emptied.chunks == ()
+
+
+def test_snapshot_stays_frozen_and_diffs_against_a_newer_one():
+    floor = Floor("RDC")
+    walls = [Wall((i * 10, 0), (i * 10, 100)) for i in range(100)]
+    for wall in walls:
+        floor.add_wall(wall)
+    before = floor.snapshot()
+    assert floor.snapshot() is before
+
+    floor.move_object(walls[50], (500, 0), (500, 200))
+    floor.add_wall(Wall((0, 0), (990, 0)))
+    after = floor.snapshot()
+    assert before.walls[50].end == (500, 100)
+    assert after.walls[50].end == (500, 200)
+
+    added, removed, changed = after.diff(before)["wall"]
+    assert [record.end for record in added] == [(990, 0)]
+    assert removed == [] and [record.id for record in changed] == [walls[50].id]
+
+
+def test_floor_rebuilt_from_a_snapshot():
+    floor = Floor("RDC")
+    floor.add_wall(Wall((0, 0), (100, 0)))
+    snapshot = floor.snapshot()
+    floor.add_wall(Wall((0, 0), (0, 100)))
+    restored = Floor.from_snapshot(snapshot)
+    assert [(wall.start, wall.end) for wall in restored.walls] == [((0, 0), (100, 0))]
+    assert restored.to_dict() == snapshot.to_dict()
@@ -0,0 +1,70 @@
+import pytest
+
+from model import schema
+from model.schema import ProjectValidationError
+from model.units import PIXELS_PER_METER, UNKNOWN
+from model.vent import Vent
+from model.vent_import import read_vent_csv, repeat_vents
+
+
+def _csv(tmp_path, content):
+    path = tmp_path / "bouches.csv"
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+
+def test_normalize_fields_is_public():
+    issues = []
+    fields = (("x", ("x",), schema.number, schema.REQUIRED),
+              ("flow", ("debit",), schema.optional_number, UNKNOWN))
+    assert schema.normalize_fields({"x": "1,5", "debit": "N/A"}, fields, "ligne 2", issues) == \
+        {"x": 1.5, "flow": UNKNOWN}
+    assert schema.normalize_fields({}, fields, "ligne 3", issues) is None
+    assert issues == ["ligne 3.x: champ obligatoire manquant"]
+
+
+def test_read_csv_by_floor_name_or_position(controller, tmp_path):
+    path = _csv(tmp_path, "Étage;X;Y;Nom;Débit;Fonction\n"
+                          "RDC;1;2;Cuisine;75;extraction_interne\n"
+                          "1;3;4;Chambre;;insufflation_interne\n")
+    placements = read_vent_csv(path, controller.floors)
+    assert [(index, vent.name, vent.function) for index, vent in placements] == \
+        [(0, "Cuisine", "extraction_interne"), (1, "Chambre", "insufflation_interne")]
+    assert placements[0][1].start == (1 * PIXELS_PER_METER, 2 * PIXELS_PER_METER)
+    assert placements[0][1].flow_rate == 75
+    assert placements[1][1].flow_rate is UNKNOWN
+
+
+def test_read_csv_reports_every_line(controller, tmp_path):
+    path = _csv(tmp_path, "etage,x,y,fonction\n"
+                          "RDC,a,2,extraction_interne\n"
+                          "Cave,1,2,extraction_interne\n"
+                          "RDC,1,2,soufflage\n")
+    with pytest.raises(ProjectValidationError) as error:
+        read_vent_csv(path, controller.floors)
+    issues = error.value.issues
+    assert len(issues) == 3
+    assert [issue.split(".")[0] for issue in issues] == ["ligne 2", "ligne 3", "ligne 4"]
+
+
+def test_repeat_vents_at_regular_steps():
+    vent = Vent((0, 0), (15, 0), "B", None, None, "extraction_interne", "#ff0000")
+    copies = repeat_vents([vent], 3, (100, 20))
+    assert [copy.start for copy in copies] == [(0, 0), (100, 20), (200, 40)]
+    assert len({copy.id for copy in copies} | {vent.id}) == 4
+
+
+def test_import_and_replicate_are_undone_in_one_step(controller, tmp_path):
+    counts = lambda: [len(floor.vents) for floor in controller.floors]
+    before = counts()
+    controller.handle_import_vents_request({"csv_path": _csv(tmp_path, "etage;x;y\nRDC;1;1\nRDC;2;1\n")})
+    assert counts()[0] == before[0] + 2
+
+    controller.selection = controller.floors[0].vents[-2:]
+    controller.handle_replicate_vents_request({"floor_indexes": [0, 1], "repeats": 2, "dx": 5})
+    assert counts()[:2] == [before[0] + 4, before[1] + 4]
+
+    controller.handle_undo_request({})
+    assert counts()[0] == before[0] + 2
+    controller.handle_undo_request({})
+    assert counts() == before
@@ -0,0 +1,97 @@
+import pytest
+
+from model.floor import Floor
+from model.units import known
+from model.vent import Vent
+from model.ventilation import (collect_summary_data, INFLOW_FUNCTIONS, OUTFLOW_FUNCTIONS,
+                               VENT_TYPE_NAMES)
+
+
+def _recount(floors):
+    """The project totals counted again from every vent and plenum"""
+    vents = [vent for floor in floors for vent in floor.vents if vent.function]
+    plenums = [(plenum, floor.height) for floor in floors for plenum in floor.plenums]
+    return {
+        "total_vents": len(vents),
+        "category_counts": {function: sum(v.function == function for v in vents) for function in VENT_TYPE_NAMES},
+        "total_inflow": sum(known(v.flow_rate) for v in vents if v.function in INFLOW_FUNCTIONS),
+        "total_outflow": sum(known(v.flow_rate) for v in vents if v.function in OUTFLOW_FUNCTIONS),
+        "plenum_simple_count": sum(p.type != "Double" for p, _h in plenums),
+        "plenum_double_count": sum(p.type == "Double" for p, _h in plenums),
+        "plenum_total_area": pytest.approx(sum(p.area or 0 for p, _h in plenums)),
+        "plenum_total_volume": pytest.approx(sum((p.area or 0) * float(h) for p, h in plenums)),
+    }
+
+
+def _check(controller):
+    totals = controller.stats.to_dict()
+    expected = _recount(controller.floors)
+    assert {key: totals[key] for key in expected} == expected
+
+
+def _vent(flow, function="extraction_interne"):
+    return Vent((100, 100), (115, 100), "Cuisine", 125, flow, function, "#ff0000")
+
+
+def test_running_totals_match_a_recount_through_edits_and_history(controller):
+    _check(controller)
+    floor = controller.floors[0]
+    vent = _vent(45)
+    with controller.history.step("Bouche"):
+        floor.add_vent(vent)
+        floor.add_vent(_vent(30, "insufflation_interne"))
+    _check(controller)
+
+    with controller.history.step("Supprimer"):
+        floor.remove_object(vent)
+    _check(controller)
+
+    plenum_floor = next(index for index, f in enumerate(controller.floors) if f.plenums)
+    controller.handle_set_floor_height_request({"floor_index": plenum_floor, "height": 3.1})
+    _check(controller)
+
+    controller.handle_duplicate_floor_request({"floor_index": 0, "count": 2})
+    _check(controller)
+    controller.handle_delete_floor_request({"floor_index": 1})
+    _check(controller)
+    controller.selected_floor_index = None
+    controller.handle_new_floor_request({})
+    _check(controller)
+
+    while controller.history.can_undo():
+        controller.handle_undo_request({})
+        _check(controller)
+    while controller.history.can_redo():
+        controller.handle_redo_request({})
+        _check(controller)
+
+
+class _NoScan(list):
+    def __iter__(self):
+        raise AssertionError("vents rescanned")
+
+
+def test_summary_reads_the_running_totals_only(controller, bus, monkeypatch):
+    updates = bus.messages("ventilation_summary_update")
+    monkeypatch.setattr(Floor, "ventilation_check", lambda floor: pytest.fail("regulation computed"))
+    for floor in controller.floors:
+        floor.vents = _NoScan(floor.vents)
+
+    controller.handle_get_ventilation_summary_request({})
+    (_name, data), = updates
+    assert data["totals"] == controller.stats.to_dict()
+    assert [f["vents"] is floor.snapshot().vents for f, floor in zip(data["floors"], controller.floors)] == \
+        [True] * len(controller.floors)
+
+
+def test_regulation_only_on_request(controller, bus):
+    updates = bus.messages("regulation_summary_update")
+    controller.handle_regulation_summary_request({})
+    (_name, data), = updates
+    assert [f["floor_index"] for f in data["floors"]] == list(range(len(controller.floors)))
+    assert all("under_ventilated_rooms" in f for f in data["floors"])
+
+    report = collect_summary_data(controller.floors, report=True)
+    assert len(report["vents"]) == sum(len(floor.vents) for floor in controller.floors)
+    assert [f["under_ventilated_rooms"] for f in report["floors"]] == \
+        [f["under_ventilated_rooms"] for f in data["floors"]]
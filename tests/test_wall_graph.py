@@ -0,0 +1,86 @@
+from model.floor import Floor
+from model.wall import Wall
+from model.window import Window
+from model.wall_graph import WallGraph, merge_collinear, snap_map, normalize_segments
+
+
+def _segments(floor):
+    return sorted(tuple(sorted((tuple(w.start), tuple(w.end)))) for w in floor.walls)
+
+
+def test_snap_map_groups_close_values():
+    mapping = snap_map([100, 103, 103, 200])
+    assert mapping[100] == mapping[103] == 103
+    assert mapping[200] == 200
+
+
+def test_snap_map_keeps_fixed_values():
+    # The new coordinate is used twice, the existing one once: the existing one still wins
+    mapping = snap_map([1034, 1037, 1037], fixed=[1034])
+    assert mapping[1034] == 1034
+    assert mapping[1037] == 1034
+
+
+def test_merge_collinear_joins_touching_walls_and_drops_points():
+    merged = merge_collinear([((0, 0), (100, 0)), ((100, 0), (200, 0)), ((50, 50), (50, 50))])
+    assert merged == [((0, 0), (200, 0))]
+
+
+def test_normalize_segments_snaps_then_merges():
+    assert normalize_segments([((0, 0), (100, 0)), ((100, 3), (200, 3))]) == [((0, 0), (200, 0))]
+
+
+def test_wall_graph_finds_t_junctions():
+    graph = WallGraph([((0, 0), (200, 0)), ((100, 0), (100, 100))])
+    assert graph.degree((100, 0)) == 2
+    assert sorted(graph.split_edges()) == [((0, 0), (100, 0)), ((100, 0), (100, 100)), ((100, 0), (200, 0))]
+
+
+def test_new_wall_joins_existing_line_without_moving_it():
+    floor = Floor("RDC")
+    floor.add_wall(Wall((0, 0), (100, 0)))
+    wall = Wall((100, 3), (200, 3))
+    floor.add_wall(wall)
+    floor.normalize_walls(around=[wall])
+    assert _segments(floor) == [((0, 0), (200, 0))]
+
+
+def test_edit_leaves_unrelated_walls_alone():
+    floor = Floor("RDC")
+    # Two near-duplicate lines far from the edit, as left by an old drawing
+    floor.add_wall(Wall((0, 0), (100, 0)))
+    floor.add_wall(Wall((0, 4), (100, 4)))
+    before = _segments(floor)
+    wall = Wall((1000, 1000), (1100, 1000))
+    floor.add_wall(wall)
+
+    floor.normalize_walls(around=[wall])
+
+    assert _segments(floor) == sorted(before + [((1000, 1000), (1100, 1000))])
+
+
+def test_opening_snaps_to_its_wall():
+    floor = Floor("RDC")
+    floor.add_wall(Wall((0, 0), (100, 0)))
+    floor.add_wall(Wall((140, 0), (200, 0)))
+    window = Window((100, 2), (140, 2), thickness=5)
+    floor.add_window(window)
+    floor.normalize_walls(around=[window])
+    assert (window.start, window.end) == ((100, 0), (140, 0))
+    assert _segments(floor) == [((0, 0), (100, 0)), ((140, 0), (200, 0))]
+
+
+def test_diagonal_wall_kept_on_import():
+    floor = Floor.from_dict({"name": "RDC", "height": 2.5, "walls": [
+        {"start": (0, 0), "end": (100, 60)}, {"start": (100, 60), "end": (100, 0)},
+        {"start": (100, 0), "end": (0, 0)}], "windows": [], "doors": [], "vents": [], "plenums": []})
+    floor.normalize_walls()
+    assert _segments(floor) == [((0, 0), (100, 0)), ((0, 0), (100, 60)), ((100, 0), (100, 60))]
+    assert [round(room.area, 2) for room in floor.rooms()] == [round(100 * 60 / 2 / 400, 2)]
+    assert floor.geometry_check() == []
+
+
+def test_wall_ending_on_a_diagonal_is_a_junction():
+    graph = WallGraph([((0, 0), (100, 100)), ((50, 50), (50, 100))])
+    assert graph.degree((50, 50)) == 2
+    assert sorted(graph.split_edges()) == [((0, 0), (50, 50)), ((50, 50), (50, 100)), ((50, 50), (100, 100))]
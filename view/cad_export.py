@@ -0,0 +1,207 @@
+"""
+SVG and DXF export of floor plans.
+
+Both formats are produced by generators that yield the file piece by
+piece, one object at a time, so a building with hundreds of floors is
+written without ever holding the whole document in memory.
+
+Each floor gets one layer per kind of object ("wall", "window", "door",
+"vent", "plenum", the item types of the onion skin preview) with the
+colours of the canvas.
+"""
+import math
+import re
+from xml.sax.saxutils import escape, quoteattr
+
+from model.units import PIXELS_PER_METER
+from view import palette
+from view.plan_renderer import building_bounds
+
+LAYER_KINDS = ("wall", "window", "door", "vent", "plenum")
+
+LAYER_COLORS = {
+    "wall": palette.WALL_COLOR,
+    "window": palette.WINDOW_COLOR,
+    "door": palette.DOOR_COLOR,
+    "vent": palette.VENT_DEFAULT_COLOR,
+    "plenum": palette.PLENUM_COLOR,
+}
+
+SVG_FLOOR_GAP = 80  # Vertical space between stacked floors, in canvas pixels
+
+
+def _floor_items(floor):
+    """Yield (kind, object) for every object of a floor, grouped by kind"""
+    for kind, objects in (("wall", floor.walls), ("window", floor.windows), ("door", floor.doors),
+                          ("vent", floor.vents), ("plenum", floor.plenums)):
+        for obj in objects:
+            yield kind, obj
+
+
+def _vent_radius(vent):
+    return math.hypot(vent.end[0] - vent.start[0], vent.end[1] - vent.start[1])
+
+
+# ------------------------------------------------------------------------------------
+# SVG
+# ------------------------------------------------------------------------------------
+
+def _svg_element(kind, obj):
+    if kind == "wall":
+        return (f'<line x1="{obj.start[0]}" y1="{obj.start[1]}" x2="{obj.end[0]}" y2="{obj.end[1]}" '
+                f'stroke="{palette.WALL_COLOR}" stroke-width="{palette.WALL_WIDTH}"/>')
+    if kind in ("window", "door"):
+        color = palette.WINDOW_COLOR if kind == "window" else palette.DOOR_COLOR
+        return (f'<line x1="{obj.start[0]}" y1="{obj.start[1]}" x2="{obj.end[0]}" y2="{obj.end[1]}" '
+                f'stroke="{color}" stroke-width="{obj.thickness or 5}"/>')
+    if kind == "vent":
+        title = escape(f"{obj.name} - {obj.function}")
+        return (f'<circle cx="{obj.start[0]}" cy="{obj.start[1]}" r="{_vent_radius(obj):.2f}" fill="none" '
+                f'stroke="{obj.color or palette.VENT_DEFAULT_COLOR}" stroke-width="{palette.VENT_WIDTH}">'
+                f'<title>{title}</title></circle>')
+    x, y = min(obj.start[0], obj.end[0]), min(obj.start[1], obj.end[1])
+    w, h = abs(obj.end[0] - obj.start[0]), abs(obj.end[1] - obj.start[1])
+    return (f'<rect x="{x}" y="{y}" width="{w}" height="{h}" fill="none" '
+            f'stroke="{palette.plenum_color(obj.type)}" stroke-width="{palette.PLENUM_WIDTH}"/>')
+
+
+def iter_svg(floors):
+    """
+    Yield an SVG document for the floors, piece by piece.
+
+    Floors are stacked vertically, each in its own group containing one
+    Inkscape layer per kind of object.
+    """
+    x1, y1, x2, y2 = building_bounds(floors)
+    margin = 40
+    floor_height = (y2 - y1) + SVG_FLOOR_GAP
+    width = (x2 - x1) + 2 * margin
+    height = floor_height * len(floors) + 2 * margin
+
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield (f'<svg xmlns="http://www.w3.org/2000/svg" '
+           f'xmlns:inkscape="http://www.inkscape.org/namespaces/inkscape" '
+           f'width="{width}" height="{height}" '
+           f'viewBox="{x1 - margin} {y1 - margin} {width} {height}">\n')
+
+    for index, floor in enumerate(floors):
+        dy = index * floor_height
+        yield (f'<g id="floor-{index}" inkscape:groupmode="layer" inkscape:label={quoteattr(floor.name)} '
+               f'transform="translate(0 {dy})">\n')
+        yield (f'  <text x="{x1}" y="{y1 - 10}" font-family="Helvetica" font-size="14">'
+               f'{escape(floor.name)} ({floor.height} m)</text>\n')
+
+        current_kind = None
+        for kind, obj in _floor_items(floor):
+            if kind != current_kind:
+                if current_kind is not None:
+                    yield '  </g>\n'
+                yield (f'  <g id="floor-{index}-{kind}" inkscape:groupmode="layer" '
+                       f'inkscape:label="{kind}">\n')
+                current_kind = kind
+            yield '    ' + _svg_element(kind, obj) + '\n'
+        if current_kind is not None:
+            yield '  </g>\n'
+        yield '</g>\n'
+
+    yield '</svg>\n'
+
+
+# ------------------------------------------------------------------------------------
+# DXF (AutoCAD R12, ASCII)
+# ------------------------------------------------------------------------------------
+
+# AutoCAD Color Index entries used to approximate the palette
+_ACI_COLORS = {
+    1: (255, 0, 0), 2: (255, 255, 0), 3: (0, 255, 0), 4: (0, 255, 255), 5: (0, 0, 255),
+    6: (255, 0, 255), 7: (0, 0, 0), 8: (128, 128, 128), 30: (255, 127, 0), 40: (255, 191, 0),
+    42: (204, 165, 102), 94: (76, 175, 80), 150: (102, 204, 255), 152: (76, 112, 147),
+    200: (156, 39, 176), 221: (255, 175, 204),
+}
+
+METERS_PER_PIXEL = 1.0 / PIXELS_PER_METER
+
+
+def aci_color(color):
+    """Nearest AutoCAD Color Index for a hex colour"""
+    r, g, b = palette.hex_to_rgb(color)
+    return min(_ACI_COLORS, key=lambda i: (_ACI_COLORS[i][0] - r) ** 2
+               + (_ACI_COLORS[i][1] - g) ** 2 + (_ACI_COLORS[i][2] - b) ** 2)
+
+
+def dxf_layer_name(floor_index, floor_name, kind):
+    name = re.sub(r"[^A-Za-z0-9_-]", "_", floor_name)
+    return f"E{floor_index:02d}_{name}_{kind}".upper()
+
+
+def _group(code, value):
+    return f"{code}\n{value}\n"
+
+
+def _dxf_point(point, elevation, base=10):
+    # Canvas y axis points down, DXF y axis points up; coordinates in meters
+    return (_group(base, f"{point[0] * METERS_PER_PIXEL:.4f}")
+            + _group(base + 10, f"{-point[1] * METERS_PER_PIXEL:.4f}")
+            + _group(base + 20, f"{elevation:.4f}"))
+
+
+def _dxf_entities(kind, obj, layer, elevation):
+    if kind in ("wall", "window", "door"):
+        yield (_group(0, "LINE") + _group(8, layer)
+               + _dxf_point(obj.start, elevation) + _dxf_point(obj.end, elevation, base=11))
+    elif kind == "vent":
+        color = aci_color(obj.color or palette.VENT_DEFAULT_COLOR)
+        yield (_group(0, "CIRCLE") + _group(8, layer) + _group(62, color)
+               + _dxf_point(obj.start, elevation)
+               + _group(40, f"{_vent_radius(obj) * METERS_PER_PIXEL:.4f}"))
+    else:
+        color = aci_color(palette.plenum_color(obj.type))
+        (xa, ya), (xb, yb) = obj.start, obj.end
+        yield _group(0, "POLYLINE") + _group(8, layer) + _group(62, color) + _group(66, 1) + _group(70, 1)
+        for corner in ((xa, ya), (xb, ya), (xb, yb), (xa, yb)):
+            yield _group(0, "VERTEX") + _group(8, layer) + _dxf_point(corner, elevation)
+        yield _group(0, "SEQEND") + _group(8, layer)
+
+
+def iter_dxf(floors):
+    """
+    Yield a DXF (R12) drawing of the floors, piece by piece.
+
+    Coordinates are in meters; each floor sits at its elevation (sum of the
+    heights of the floors below) on its own set of layers.
+    """
+    yield _group(0, "SECTION") + _group(2, "HEADER")
+    yield _group(9, "$ACADVER") + _group(1, "AC1009")
+    yield _group(0, "ENDSEC")
+
+    yield _group(0, "SECTION") + _group(2, "TABLES")
+    yield _group(0, "TABLE") + _group(2, "LAYER") + _group(70, len(floors) * len(LAYER_KINDS))
+    for index, floor in enumerate(floors):
+        for kind in LAYER_KINDS:
+            yield (_group(0, "LAYER") + _group(2, dxf_layer_name(index, floor.name, kind))
+                   + _group(70, 0) + _group(62, aci_color(LAYER_COLORS[kind])) + _group(6, "CONTINUOUS"))
+    yield _group(0, "ENDTAB") + _group(0, "ENDSEC")
+
+    yield _group(0, "SECTION") + _group(2, "ENTITIES")
+    elevation = 0.0
+    for index, floor in enumerate(floors):
+        for kind, obj in _floor_items(floor):
+            yield from _dxf_entities(kind, obj, dxf_layer_name(index, floor.name, kind), elevation)
+        elevation += float(floor.height)
+    yield _group(0, "ENDSEC") + _group(0, "EOF")
+
+
+def write_stream(chunks, path):
+    """Write the pieces of a generator to a file as they are produced"""
+    with open(path, "w", encoding="utf-8") as f:
+        for chunk in chunks:
+            f.write(chunk)
+    return path
+
+
+def export_svg(floors, path):
+    return write_stream(iter_svg(floors), path)
+
+
+def export_dxf(floors, path):
+    return write_stream(iter_dxf(floors), path)
@@ -0,0 +1,197 @@
+"""
+Floor list of the right panel.
+
+The floor buttons are drawn straight on the panel's canvas, and only the
+rows in view exist: a small pool of rows is moved and relabelled as the
+list scrolls, so a project with hundreds of floors costs no more than the
+handful of buttons that fit on screen. Selecting a floor only restyles
+the two rows concerned.
+"""
+
+BUTTON_HEIGHT = 40
+ROW_SPACING = 3     # Space above and below each button
+ROW_HEIGHT = BUTTON_HEIGHT + 2 * ROW_SPACING
+RADIUS = 5          # Same corner radius as the "+ Nouvel etage" button
+TEXT_PADDING = 20
+
+
+class FloorList:
+    def __init__(self, canvas, width, colors, truncate, on_click, on_right_click, tooltip):
+        """
+        Args:
+            canvas: the scrollable canvas of the panel
+            width: width of a button
+            colors: the view's colour table ("selected_floor", "floor_text")
+            truncate: truncate(text, max_width, font) -> text that fits (memoized,
+                see text_metrics.truncate)
+            on_click: on_click(floor_index)
+            on_right_click: on_right_click(event, floor_index)
+            tooltip: Tooltip used to show names that do not fit
+        """
+        self.canvas = canvas
+        self.width = width
+        self.colors = colors
+        self.truncate = truncate
+        self.on_click = on_click
+        self.on_right_click = on_right_click
+        self.tooltip = tooltip
+
+        self.floors = []
+        self.selected_index = None
+        self.rows = []              # Pool of drawn rows
+        self._hover_index = None
+
+        canvas.configure(yscrollincrement=ROW_HEIGHT)
+        canvas.bind("<Configure>", lambda e: self.refresh())
+        canvas.bind("<Button-1>", self._on_click)
+        canvas.bind("<Button-2>", self._on_right_click)  # For macOS
+        canvas.bind("<Button-3>", self._on_right_click)  # For Windows/Linux
+        # For Control+click on macOS (another way to right-click)
+        canvas.bind("<Control-Button-1>", self._on_right_click)
+        canvas.bind("<Motion>", self._on_motion)
+        canvas.bind("<Leave>", lambda e: self._hide_tooltip())
+
+    # ------------------------------------------------------------------
+    # Content
+    # ------------------------------------------------------------------
+
+    def set_floors(self, floors, selected_index=None):
+        self.floors = list(floors)
+        self.selected_index = selected_index
+        self.canvas.configure(scrollregion=(0, 0, self.width, self.content_height()))
+        self.see(selected_index)
+        self.refresh()
+
+    def select(self, index):
+        self.selected_index = index
+        self.see(index)
+        self.refresh()
+
+    def content_height(self):
+        return len(self.floors) * ROW_HEIGHT
+
+    def see(self, index):
+        """Scroll just enough for a floor to be in view"""
+        if index is None or not 0 <= index < len(self.floors) or not self.floors:
+            return
+        top = self.canvas.canvasy(0)
+        view_height = self.canvas.winfo_height()
+        row_top = index * ROW_HEIGHT
+        if row_top < top:
+            self.canvas.yview_moveto(row_top / self.content_height())
+        elif row_top + ROW_HEIGHT > top + view_height > 1:
+            self.canvas.yview_moveto((row_top + ROW_HEIGHT - view_height) / self.content_height())
+
+    def index_at(self, y):
+        """Floor under a y coordinate of the canvas widget, or None"""
+        index = int(self.canvas.canvasy(y) // ROW_HEIGHT)
+        return index if 0 <= index < len(self.floors) else None
+
+    # ------------------------------------------------------------------
+    # Drawing
+    # ------------------------------------------------------------------
+
+    def _label(self, text, font):
+        return self.truncate(text, self.width - 2 * TEXT_PADDING, font)
+
+    def _create_row(self):
+        """Draw the items of one button at the top of the list; they are moved into place later"""
+        c = self.canvas
+        x1, y1 = 5, ROW_SPACING + 5
+        x2, y2 = self.width - 5, ROW_SPACING + BUTTON_HEIGHT - 5
+        r = RADIUS
+        shapes = [
+            # Rounded corners
+            c.create_oval(x1, y1, x1 + 2 * r, y1 + 2 * r, outline=""),
+            c.create_oval(x2 - 2 * r, y1, x2, y1 + 2 * r, outline=""),
+            c.create_oval(x1, y2 - 2 * r, x1 + 2 * r, y2, outline=""),
+            c.create_oval(x2 - 2 * r, y2 - 2 * r, x2, y2, outline=""),
+            # Rectangles completing the rounded shape
+            c.create_rectangle(x1 + r, y1, x2 - r, y1 + 2 * r, outline=""),
+            c.create_rectangle(x1, y1 + r, x2, y2 - r, outline=""),
+            c.create_rectangle(x1 + r, y2 - 2 * r, x2 - r, y2, outline=""),
+        ]
+        text = c.create_text(TEXT_PADDING, ROW_SPACING + BUTTON_HEIGHT / 2, anchor="w",
+                             fill=self.colors["floor_text"])
+        row = {"shapes": shapes, "text": text, "y": 0, "shown": None}
+        self.rows.append(row)
+        return row
+
+    def _show_row(self, row, index):
+        state = (index, self.floors[index], index == self.selected_index)
+        if row["shown"] == state:
+            return
+        c = self.canvas
+        y = index * ROW_HEIGHT
+        if y != row["y"]:
+            for item in row["shapes"] + [row["text"]]:
+                c.move(item, 0, y - row["y"])
+            row["y"] = y
+
+        is_selected = state[2]
+        bg_color = self.colors["selected_floor"] if is_selected else "white"
+        font = ("Helvetica", 12, "bold" if is_selected else "normal")
+        for item in row["shapes"]:
+            c.itemconfigure(item, fill=bg_color, state="normal")
+        c.itemconfigure(row["text"], text=self._label(state[1], font), font=font, state="normal")
+        row["shown"] = state
+
+    def _hide_row(self, row):
+        if row["shown"] is not None:
+            for item in row["shapes"] + [row["text"]]:
+                self.canvas.itemconfigure(item, state="hidden")
+            row["shown"] = None
+
+    def refresh(self):
+        """Draw the rows in view, reusing the row items of the pool"""
+        top = self.canvas.canvasy(0)
+        view_height = max(self.canvas.winfo_height(), ROW_HEIGHT)
+        first = max(0, int(top // ROW_HEIGHT))
+        last = min(len(self.floors), int((top + view_height) // ROW_HEIGHT) + 1)
+        visible = range(first, last)
+
+        # Rows already showing a visible floor stay where they are
+        by_index = {row["shown"][0]: row for row in self.rows if row["shown"] is not None}
+        free = [row for row in self.rows
+                if row["shown"] is None or row["shown"][0] not in visible]
+        for index in visible:
+            row = by_index.get(index)
+            if row is None:
+                row = free.pop() if free else self._create_row()
+            self._show_row(row, index)
+        for row in free:
+            self._hide_row(row)
+
+    # ------------------------------------------------------------------
+    # Events
+    # ------------------------------------------------------------------
+
+    def _on_click(self, event):
+        index = self.index_at(event.y)
+        if index is not None:
+            self.on_click(index)
+
+    def _on_right_click(self, event):
+        index = self.index_at(event.y)
+        if index is not None:
+            self.on_right_click(event, index)
+
+    def _on_motion(self, event):
+        index = self.index_at(event.y)
+        self.canvas.configure(cursor="hand2" if index is not None else "")
+        if index == self._hover_index:
+            self.tooltip.update_position(event.x_root, event.y_root)
+            return
+        self._hide_tooltip()
+        self._hover_index = index
+        if index is None:
+            return
+        # Names that do not fit get a tooltip with the full text
+        name = self.floors[index]
+        font = ("Helvetica", 12, "bold" if index == self.selected_index else "normal")
+        if self._label(name, font) != name:
+            self.tooltip.show_delayed(name, event.x_root, event.y_root)
+
+    def _hide_tooltip(self):
+        self._hover_index = None
+        self.tooltip.hide()
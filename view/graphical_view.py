@@ -2,13 +2,31 @@ import os
 import tkinter as tk
 import tkinter.simpledialog as simpledialog
 import tkinter.font
+from collections import OrderedDict
 from tkinter import ttk, PhotoImage
 from tkinter import messagebox
+from PIL import ImageTk
 from ivy.ivy_bus import ivy_bus
 from view.tooltip import Tooltip 
+from view.floor_list import FloorList
+from view import text_metrics
+from model.units import format_quantity
+from model.snapping import GRID_STEP
+from view import palette
+from view.plan_renderer import render_ghost_layer
+from view.report import export_report
 from tkinter import filedialog
 from tkinter import Toplevel, Label, StringVar, Frame
 
+# Most copies made by "Dupliquer plusieurs fois"
+MAX_FLOOR_COPIES = 100
+
+# Ghost layer bitmaps kept for reuse (a few levels times the floors browsed)
+GHOST_PHOTO_CACHE_SIZE = 24
+
+# Pause in the edits (ms) before the summary window asks for the regulatory check again
+REGULATION_REFRESH_DELAY = 500
+
 class GraphicalView(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -48,7 +66,6 @@ class GraphicalView(tk.Tk):
         self.currentFloorLabel = None
         self.floor_count = 0
         self.current_floor = None
-        self.floor_buttons = []
         self.current_tool = 'select'  
         self.vent_role = None
         self.vent_color = None
@@ -61,7 +78,12 @@ class GraphicalView(tk.Tk):
 
         # Onion skin related variables
         self.onion_skin_items = []  # To track items drawn as part of onion skin
-        self.onion_skin_opacity = 0.3  # 30% opacity for onion skin items
+        self._ghost_items = {}  # Floor offset -> canvas image item of the ghost layer
+        self._ghost_photos = OrderedDict()  # Ghost layer key -> (PhotoImage, origin)
+
+        # Select tool: IDs of the selected objects, and the drag in progress
+        self.selected_ids = set()
+        self._select_drag = None
 
         self.hover_after_id = None
         self.current_hover_item = None 
@@ -98,6 +120,31 @@ class GraphicalView(tk.Tk):
         # Add Esc key binding to cancel drawing operations
         self.bind("<Escape>", self.on_escape_key)
 
+        # Undo / redo
+        for sequence in ("<Control-z>", "<Command-z>"):
+            self._bind_shortcut(sequence, lambda event: ivy_bus.publish("undo_request", {}))
+        for sequence in ("<Control-y>", "<Control-Z>", "<Command-y>", "<Command-Z>"):
+            self._bind_shortcut(sequence, lambda event: ivy_bus.publish("redo_request", {}))
+
+        # Edits of the selection, while the plan has the keyboard focus (the select tool gives it)
+        for sequence in ("<Delete>", "<BackSpace>"):
+            self.canvas.bind(sequence, lambda event: self._publish_selection_edit("selection_delete_request", {}))
+        for sequence, (dx, dy) in (("<Left>", (-GRID_STEP, 0)), ("<Right>", (GRID_STEP, 0)),
+                                   ("<Up>", (0, -GRID_STEP)), ("<Down>", (0, GRID_STEP))):
+            self.canvas.bind(sequence, lambda event, dx=dx, dy=dy: self._publish_selection_edit(
+                "selection_transform_request", {"operation": "move", "dx": dx, "dy": dy}))
+        for sequence in ("<Control-c>", "<Command-c>"):
+            self._bind_canvas_shortcut(sequence, lambda event: self._publish_selection_edit(
+                "copy_selection_request", {}))
+        for sequence in ("<Control-v>", "<Command-v>"):
+            self._bind_canvas_shortcut(sequence, lambda event: ivy_bus.publish("paste_request", {}))
+        for sequence, edit in (("<r>", {"operation": "rotate", "direction": "clockwise"}),
+                               ("<R>", {"operation": "rotate", "direction": "counterclockwise"}),
+                               ("<h>", {"operation": "mirror", "flip": "horizontal"}),
+                               ("<v>", {"operation": "mirror", "flip": "vertical"})):
+            self.canvas.bind(sequence, lambda event, edit=edit: self._publish_selection_edit(
+                "selection_transform_request", edit))
+
         # Subscribe to events from controller
         ivy_bus.subscribe("draw_wall_update",         self.on_draw_wall_update)
         ivy_bus.subscribe("floor_selected_update",    self.on_floor_selected_update)
@@ -116,6 +163,13 @@ class GraphicalView(tk.Tk):
         ivy_bus.subscribe("draw_plenum_update",         self.on_draw_plenum_update)
         ivy_bus.subscribe("disable_tool_button",        self.on_disable_tool_button)
         ivy_bus.subscribe("enable_tool_button",         self.on_enable_tool_button)
+        ivy_bus.subscribe("object_added",               self.on_object_added)
+        ivy_bus.subscribe("object_removed",             self.on_object_removed)
+        ivy_bus.subscribe("object_changed",             self.on_object_changed)
+        ivy_bus.subscribe("snap_indicator_update",      self.on_snap_indicator_update)
+        ivy_bus.subscribe("objects_update",             self.on_objects_update)
+        ivy_bus.subscribe("selection_update",           self.on_selection_update)
+        ivy_bus.subscribe("report_data_update",         self.on_report_data_update)
 
 
         # Set initial cursor
@@ -465,9 +519,16 @@ class GraphicalView(tk.Tk):
         # Pack the canvas first
         self.floorCanvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
-        # Create the floor frame
-        self.floorFrame = tk.Frame(self.floorCanvas, bg="white")
-        self.floorCanvas.create_window((0, 0), window=self.floorFrame, anchor="nw")
+        # Floor buttons, drawn on the canvas (only the visible ones)
+        self.floor_list = FloorList(
+            self.floorCanvas,
+            width=200 - 20,  # Container width minus padding (10px on each side)
+            colors=self.colors,
+            truncate=text_metrics.truncate,
+            on_click=self.on_floor_button_click,
+            on_right_click=self.on_floor_button_right_click,
+            tooltip=Tooltip(self)
+        )
 
         # Restore the mousewheel bindings for scrolling
         def _on_mousewheel(event):
@@ -481,6 +542,28 @@ class GraphicalView(tk.Tk):
 
         # Bottom border for right panel
         tk.Frame(rightContainer, height=1, bg="#cccccc").pack(side=tk.BOTTOM, fill=tk.X)
+
+        # Ghost layers: how many floors to show below and above the selected one
+        onionFrame = tk.Frame(rightContainer, bg="white")
+        onionFrame.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=(5, 10))
+        tk.Label(onionFrame, text="Calques fantômes :", font=("Helvetica", 12),
+                 fg="#2f3039", bg="white").grid(row=0, column=0, columnspan=2, sticky="w", pady=(0, 5))
+        self.onion_below_var = tk.StringVar(value="1")
+        self.onion_above_var = tk.StringVar(value="0")
+        for row, (text, variable) in enumerate((("Dessous", self.onion_below_var),
+                                                ("Dessus", self.onion_above_var)), start=1):
+            tk.Label(onionFrame, text=text, bg="white").grid(row=row, column=0, sticky="w")
+            spinbox = ttk.Spinbox(onionFrame, from_=0, to=5, width=4, textvariable=variable,
+                                  state="readonly", command=self.on_onion_skin_spinbox_change)
+            spinbox.grid(row=row, column=1, sticky="e", pady=2)
+        onionFrame.columnconfigure(1, weight=1)
+
+        # Snapping to the grid, off by default so points can be placed freely
+        snapFrame = tk.Frame(rightContainer, bg="white")
+        snapFrame.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=(5, 0))
+        self.snap_grid_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(snapFrame, text="Accrocher à la grille (0,5 m)", variable=self.snap_grid_var,
+                       bg="white", command=self.on_snap_grid_toggle).pack(side=tk.LEFT)
         
     # Custom scroll handlers that update grid when scrolling
     def _on_canvas_x_scroll(self, *args):
@@ -717,6 +800,10 @@ class GraphicalView(tk.Tk):
         canvas_x = self.canvas.canvasx(event.x)
         canvas_y = self.canvas.canvasy(event.y)
 
+        if self.current_tool == "select":
+            self.canvas.focus_set()
+            self._start_selection_drag(canvas_x, canvas_y, event.state)
+
         if self.current_tool == "wall":
             ivy_bus.publish("draw_wall_request", {
                 "x": canvas_x,
@@ -808,6 +895,9 @@ class GraphicalView(tk.Tk):
         canvas_x = self.canvas.canvasx(event.x)
         canvas_y = self.canvas.canvasy(event.y)
 
+        if self.current_tool == "select" and self._select_drag:
+            self._update_selection_drag(canvas_x, canvas_y)
+
         if self.current_tool == "wall":
             ivy_bus.publish("draw_wall_request", {
                 "x": canvas_x,
@@ -915,6 +1005,9 @@ class GraphicalView(tk.Tk):
             print("[View] Plenum drawing cancelled by right-click")
 
     def on_canvas_release(self, event):
+        if self.current_tool == "select" and self._select_drag:
+            self._finish_selection_drag(self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
+
         if self.current_tool == "plenum" and hasattr(self, "plenum_start_x") and self.plenum_start_x is not None:
             end_x = self.canvas.canvasx(event.x)
             end_y = self.canvas.canvasy(event.y)
@@ -1001,6 +1094,35 @@ class GraphicalView(tk.Tk):
             command=lambda: self.on_duplicate_floor(floor_index)
         )
 
+        menu.add_command(
+            label="Dupliquer plusieurs fois...",
+            command=lambda: self.on_duplicate_floor_many(floor_index)
+        )
+
+        menu.add_separator()
+
+        menu.add_command(
+            label="Coller ici",
+            command=lambda: self.on_paste_to_floors([floor_index])
+        )
+
+        menu.add_command(
+            label="Coller ici et aux etages au-dessus",
+            command=lambda: self.on_paste_to_floors(list(range(floor_index, len(self.floor_list.floors))))
+        )
+
+        menu.add_command(
+            label="Repeter les bouches selectionnees ici et au-dessus...",
+            command=lambda: self.on_replicate_vents(list(range(floor_index, len(self.floor_list.floors))))
+        )
+
+        menu.add_separator()
+
+        menu.add_command(
+            label="Verifier la geometrie",
+            command=lambda: ivy_bus.publish("check_geometry_request", {"floor_index": floor_index})
+        )
+
         menu.add_separator()
 
         menu.add_command(
@@ -1016,6 +1138,56 @@ class GraphicalView(tk.Tk):
             "floor_index": floor_index
         })
 
+    def on_duplicate_floor_many(self, floor_index):
+        """Duplicate a floor several times, e.g. the typical floor of a building"""
+        count = simpledialog.askinteger(
+            "Dupliquer l'etage",
+            "Nombre de copies :",
+            parent=self, minvalue=1, maxvalue=MAX_FLOOR_COPIES
+        )
+        if count:
+            ivy_bus.publish("duplicate_floor_request", {
+                "floor_index": floor_index,
+                "count": count
+            })
+
+    def on_paste_to_floors(self, floor_indexes):
+        """Paste the copied objects on several floors at once"""
+        ivy_bus.publish("paste_request", {"floor_indexes": floor_indexes})
+
+    def on_replicate_vents(self, floor_indexes):
+        """Repeat the selected vents over identical dwellings: copies per floor and their spacing"""
+        repeats = simpledialog.askinteger(
+            "Repeter les bouches",
+            "Nombre de logements identiques par etage :",
+            parent=self, minvalue=1, maxvalue=MAX_FLOOR_COPIES, initialvalue=1
+        )
+        if not repeats:
+            return
+        dx = dy = 0.0
+        if repeats > 1:
+            value = simpledialog.askstring(
+                "Repeter les bouches",
+                "Decalage entre deux logements (m), x;y :",
+                parent=self, initialvalue="10;0"
+            )
+            if not value:
+                return
+            try:
+                dx, dy = (float(v.replace(",", ".")) for v in value.split(";"))
+            except ValueError:
+                self.on_show_alert_request({
+                    "title": "Valeur incorrecte",
+                    "message": "Entrez deux nombres separes par un point-virgule, par exemple 10;0"
+                })
+                return
+        ivy_bus.publish("replicate_vents_request", {
+            "floor_indexes": floor_indexes,
+            "repeats": repeats,
+            "dx": dx,
+            "dy": dy
+        })
+
     def on_rename_floor(self, floor_index):
         new_name = simpledialog.askstring(
             title="Renommer l'etage",
@@ -1065,6 +1237,149 @@ class GraphicalView(tk.Tk):
         self.vent_color = color
 
     # ----------------------------- GET FROM CONTROLLER --------------------------------------------------------
+    def _bind_shortcut(self, sequence, callback):
+        try:
+            self.bind(sequence, callback)
+        except tk.TclError:
+            # Command is only known on macOS
+            pass
+
+    def _bind_canvas_shortcut(self, sequence, callback):
+        try:
+            self.canvas.bind(sequence, callback)
+        except tk.TclError:
+            # Command is only known on macOS
+            pass
+
+    def _object_tags(self, data):
+        """Canvas tag of a model object, so it can be removed or redrawn on its own"""
+        return (f"obj{data['id']}",) if data.get("id") is not None else ()
+
+    def on_object_added(self, data):
+        """An object was added to the selected floor: draw it, data["kind"] gives the kind"""
+        getattr(self, f"on_draw_{data['kind']}_update")(data)
+
+    def on_object_removed(self, data):
+        """Delete the canvas items of a model object (it may already be gone, e.g. erased)"""
+        for item in self.canvas.find_withtag(f"obj{data['id']}"):
+            self.canvas_item_meta.pop(item, None)
+            tooltip = self.vent_tooltips.pop(item, None)
+            if tooltip is not None:
+                tooltip.hide()
+            self.canvas.delete(item)
+
+    def on_object_changed(self, data):
+        """An object was moved or edited: draw it again"""
+        self.on_object_removed(data)
+        self.on_object_added(data)
+
+    def on_objects_update(self, data):
+        """Several objects changed in one edit (e.g. of a selection): remove them, then draw them again"""
+        for obj_id in data.get("removed", []):
+            self.on_object_removed({"id": obj_id})
+        for item in data.get("drawn", []):
+            self.on_object_removed(item)
+            self.on_object_added(item)
+        self._ensure_onion_skin_below()
+
+    def on_selection_update(self, data):
+        """Outline the selected objects; their items get the "selected" tag, to be dragged together"""
+        self.canvas.dtag("selected", "selected")
+        self.canvas.delete("selection_marker")
+        self.selected_ids = set(data.get("ids", []))
+        for obj_id in self.selected_ids:
+            tag = f"obj{obj_id}"
+            self.canvas.addtag_withtag("selected", tag)
+            box = self.canvas.bbox(tag)
+            if box:
+                x1, y1, x2, y2 = box
+                self.canvas.create_rectangle(x1 - 2, y1 - 2, x2 + 2, y2 + 2, outline=palette.SELECTION_COLOR,
+                                             dash=(3, 2), tags="selection_marker")
+
+    def _publish_selection_edit(self, message, data):
+        if self.current_tool == "select" and self.selected_ids:
+            ivy_bus.publish(message, data)
+
+    def _start_selection_drag(self, x, y, state):
+        """
+        Pressing on a selected object drags the selection; elsewhere it starts
+        a rubber band, or a lasso with Shift held. Control adds to the selection.
+        """
+        near = self.canvas.find_overlapping(x - 3, y - 3, x + 3, y + 3)
+        if any("selected" in self.canvas.gettags(item) for item in near):
+            mode = "move"
+        else:
+            mode = "lasso" if state & 0x0001 else "rectangle"
+        self._select_drag = {"mode": mode, "start": (x, y), "last": (x, y), "points": [(x, y)],
+                             "add": bool(state & 0x0004), "band": None}
+
+    def _update_selection_drag(self, x, y):
+        drag = self._select_drag
+        if drag["mode"] == "move":
+            # Only the canvas items follow the mouse; the model moves on release
+            dx, dy = x - drag["last"][0], y - drag["last"][1]
+            self.canvas.move("selected", dx, dy)
+            self.canvas.move("selection_marker", dx, dy)
+            drag["last"] = (x, y)
+            return
+
+        if drag["mode"] == "lasso":
+            last = drag["points"][-1]
+            if abs(x - last[0]) + abs(y - last[1]) >= 3:
+                drag["points"].append((x, y))
+            coords = [c for point in drag["points"] + [(x, y)] for c in point]
+        else:
+            (x0, y0) = drag["start"]
+            coords = [x0, y0, x, y0, x, y, x0, y, x0, y0]
+        if drag["band"] is None:
+            drag["band"] = self.canvas.create_line(*coords, fill=palette.SELECTION_COLOR, dash=(4, 2),
+                                                   tags="selection_band")
+        else:
+            self.canvas.coords(drag["band"], *coords)
+
+    def _finish_selection_drag(self, x, y):
+        drag, self._select_drag = self._select_drag, None
+        self.canvas.delete("selection_band")
+        if drag["mode"] == "move":
+            dx, dy = round(x - drag["start"][0]), round(y - drag["start"][1])
+            if dx or dy:
+                ivy_bus.publish("selection_transform_request", {"operation": "move", "dx": dx, "dy": dy})
+            else:
+                # Put back the items moved by less than a pixel
+                back = (drag["start"][0] - drag["last"][0], drag["start"][1] - drag["last"][1])
+                self.canvas.move("selected", *back)
+                self.canvas.move("selection_marker", *back)
+            return
+        if drag["mode"] == "lasso":
+            points = drag["points"] + [(x, y)]
+        else:
+            points = [drag["start"], (x, y)]
+        ivy_bus.publish("select_request", {"mode": drag["mode"], "points": points, "add": drag["add"]})
+
+    def on_snap_indicator_update(self, data):
+        """
+        Marker of the point the cursor snapped to: a square on an end point,
+        a diamond on a midpoint, a cross on a wall, the grid or an alignment.
+        No point clears it.
+        """
+        self.canvas.delete("snap_indicator")
+        point = data.get("point")
+        if point is None:
+            return
+        x, y = point
+        r = palette.SNAP_MARKER_SIZE
+        kind = data.get("kind")
+        style = {"outline": palette.SNAP_COLOR, "width": 2, "fill": "", "tags": "snap_indicator"}
+        if kind == "endpoint":
+            self.canvas.create_rectangle(x - r, y - r, x + r, y + r, **style)
+        elif kind == "midpoint":
+            self.canvas.create_polygon(x, y - r, x + r, y, x, y + r, x - r, y, **style)
+        else:
+            dash = (2, 2) if kind == "grid" else None
+            for coords in ((x - r, y - r, x + r, y + r), (x - r, y + r, x + r, y - r)):
+                self.canvas.create_line(*coords, fill=palette.SNAP_COLOR, width=2, dash=dash,
+                                        tags="snap_indicator")
+
     def on_draw_wall_update(self, data):
         """
         Called when the Controller publishes 'draw_wall_update' to actually operate the Canvas to draw the wall
@@ -1107,7 +1422,7 @@ class GraphicalView(tk.Tk):
 
             item = self.canvas.create_line(
                 start[0], start[1], end[0], end[1],
-                fill=fill ,width=6,tags=("wall",)
+                fill=fill ,width=6,tags=("wall",) + self._object_tags(data)
             )
 
             # Calculate wall length in meters (using scale where 40px = 2m from _create_compass_layer)
@@ -1157,7 +1472,7 @@ class GraphicalView(tk.Tk):
 
             item = self.canvas.create_line(
                 start[0], start[1], end[0], end[1],
-                fill=fill ,width=thickness, tags=("window",)
+                fill=fill ,width=thickness, tags=("window",) + self._object_tags(data)
             )
 
             # Calculate window length in meters (using scale where 40px = 2m from _create_compass_layer)
@@ -1207,7 +1522,7 @@ class GraphicalView(tk.Tk):
 
             item = self.canvas.create_line(
                 start[0], start[1], end[0], end[1],
-                fill=fill,width=thickness,tags=("door",)
+                fill=fill,width=thickness,tags=("door",) + self._object_tags(data)
             )
 
             # Calculate door length in meters (using scale where 40px = 2m from _create_compass_layer)
@@ -1285,7 +1600,7 @@ class GraphicalView(tk.Tk):
             item = self.canvas.create_oval(
                 start[0] - radius, start[1] - radius,
                 start[0] + radius, start[1] + radius,
-                outline=color, width=2, fill="", tags=("vent",)
+                outline=color, width=2, fill="", tags=("vent",) + self._object_tags(data)
             )
 
             self.canvas.configure(scrollregion=self.canvas.bbox("all"))
@@ -1296,7 +1611,7 @@ class GraphicalView(tk.Tk):
             flow = data.get('flow', '')
             role = data.get('role', '')
 
-            meta = f"{name}\nO {diameter} mm\n{flow} m3/h\n{role}"
+            meta = f"{name}\nO {format_quantity(diameter, 'mm')}\n{format_quantity(flow, 'm3/h')}\n{role}"
 
             # Ensure meta data is not empty
             if meta and meta.strip():
@@ -1464,47 +1779,8 @@ class GraphicalView(tk.Tk):
         # Update the label text
         self.currentFloorLabel.config(text=f"Etage selectionne : {floor_name}")
 
-        # Update the styling of floor buttons
-        for i, btn_frame in enumerate(self.floor_buttons):
-            # Find the canvas in the button frame
-            canvas = None
-            for widget in btn_frame.winfo_children():
-                if isinstance(widget, tk.Canvas):
-                    canvas = widget
-                    break
-
-            if canvas and hasattr(canvas, 'shape_id') and hasattr(canvas, 'text_id'):
-                # Update button appearance based on selection state
-                is_selected = (i == selected_index)
-                bg_color = self.colors["selected_floor"] if is_selected else "white"
-
-                # Update the shape color for all canvas items that are shapes
-                for item in canvas.find_all():
-                    if canvas.type(item) in ["rectangle", "oval", "polygon"] and item != canvas.text_id:
-                        canvas.itemconfig(item, fill=bg_color, outline=bg_color)
-
-                # Update text weight and possibly truncate text again with new font weight
-                font_spec = ("Helvetica", 11, "bold" if is_selected else "normal")
-
-                # Get the available width for text
-                available_width = 200 - 20  # Container width minus padding
-                text_padding = 20
-                max_text_width = available_width - (text_padding * 2)
-
-                # Get the full text and truncate if needed
-                if hasattr(canvas, 'full_text'):
-                    full_text = canvas.full_text
-                else:
-                    full_text = canvas.itemcget(canvas.text_id, 'text')
-                    if full_text.endswith('...'):  # Best effort to recover original text
-                        full_text = floor_name
-
-                display_text = self._truncate_text_with_ellipsis(full_text, max_text_width, font_spec)
-
-                # Update text and font
-                canvas.itemconfig(canvas.text_id, 
-                                  text=display_text,
-                                  font=font_spec)
+        # Restyle the previous and the new selected buttons
+        self.floor_list.select(selected_index)
 
         # After updating floor, request onion skin if available
         self.after(10, self._request_onion_skin_preview)
@@ -1519,104 +1795,7 @@ class GraphicalView(tk.Tk):
         floors = data.get("floors", [])
         selected_index = data.get("selected_floor_index", None)
 
-        # Clear existing buttons
-        for btn in self.floor_buttons:
-            for widget in btn.winfo_children():
-                widget.destroy()
-            btn.destroy()
-
-        self.floor_buttons = []
-
-        # Create new buttons with the custom style
-        for i, floor_name in enumerate(floors):
-            # Create a frame for each button with white background
-            btn_frame = tk.Frame(self.floorFrame, bg="white")
-            btn_frame.pack(side=tk.TOP, fill=tk.X, pady=3, padx=0)
-
-            # Create button with rounded corners using a canvas
-            button_height = 40
-
-            # Calculate available width - use full width
-            available_width = 200 - 20  # Container width minus padding (10px on each side)
-
-            canvas = tk.Canvas(
-                btn_frame, 
-                height=button_height,
-                width=available_width,
-                bg="white",
-                highlightthickness=0,
-                cursor="hand2"
-            )
-            canvas.pack(fill=tk.X)
-
-            # Determine if this is the selected button
-            is_selected = (i == selected_index)
-            button_bg = self.colors["selected_floor"] if is_selected else "white"
-
-            # Update to match the "+ Nouvel etage" button radius (5px)
-            radius = 5  # Changed from 20 to 5 to match the "+ Nouvel etage" button
-
-            # Define the box with some padding
-            x1 = 5
-            y1 = 5
-            x2 = available_width - 5
-            y2 = button_height - 5
-
-            # Create rounded corners using ovals (similar to "+ Nouvel etage" button)
-            canvas.create_oval(x1, y1, x1 + 2*radius, y1 + 2*radius, fill=button_bg, outline="")
-            canvas.create_oval(x2 - 2*radius, y1, x2, y1 + 2*radius, fill=button_bg, outline="")
-            canvas.create_oval(x1, y2 - 2*radius, x1 + 2*radius, y2, fill=button_bg, outline="")
-            canvas.create_oval(x2 - 2*radius, y2 - 2*radius, x2, y2, fill=button_bg, outline="")
-
-            # Create rectangles to complete the rounded shape
-            canvas.create_rectangle(x1 + radius, y1, x2 - radius, y1 + 2*radius, fill=button_bg, outline="")  # Top
-            canvas.create_rectangle(x1, y1 + radius, x2, y2 - radius, fill=button_bg, outline="")  # Middle
-            canvas.create_rectangle(x1 + radius, y2 - 2*radius, x2 - radius, y2, fill=button_bg, outline="")  # Bottom
-
-            # Store the background shape ID (use the first rectangle as reference)
-            shape_id = canvas.create_rectangle(x1, y1 + radius, x2, y2 - radius, fill=button_bg, outline="")
-            canvas.tag_lower(shape_id)  # Move it to the back
-
-            # Add text, left-aligned with padding
-            text_padding = 20
-            max_text_width = available_width - (text_padding * 2)  # Available width for text
-            font_spec = ("Helvetica", 12, "bold" if is_selected else "normal")
-
-            # Truncate text if needed
-            display_text = self._truncate_text_with_ellipsis(floor_name, max_text_width, font_spec)
-
-            text_id = canvas.create_text(
-                text_padding,
-                button_height / 2,
-                text=display_text, 
-                anchor="w",  # Left-aligned
-                fill=self.colors["floor_text"],
-                font=font_spec
-            )
-
-            # Store IDs for later updates
-            canvas.tag_raise(text_id)   # Ensure text is on top
-
-            # Save references to the shape and text for easy updates
-            canvas.shape_id = shape_id
-            canvas.text_id = text_id
-            canvas.full_text = floor_name  # Store the original full text
-
-            # Bind click events
-            canvas.bind("<Button-1>", lambda e, idx=i: self.on_floor_button_click(idx))
-            canvas.bind("<Button-2>", lambda e, idx=i: self.on_floor_button_right_click(e, idx))  # For macOS
-            canvas.bind("<Button-3>", lambda e, idx=i: self.on_floor_button_right_click(e, idx))  # For Windows/Linux
-            
-            # For Control+click on macOS (another way to right-click)
-            canvas.bind("<Control-Button-1>", lambda e, idx=i: self.on_floor_button_right_click(e, idx))
-
-            # Add tooltip with full text if truncated
-            if display_text != floor_name:
-                floor_tooltip = Tooltip(self)
-                floor_tooltip._attach_to_widget(canvas, floor_name)
-                self.tooltips.append(floor_tooltip)
-
-            self.floor_buttons.append(btn_frame)
+        self.floor_list.set_floors(floors, selected_index)
 
         if selected_index is not None and 0 <= selected_index < len(floors):
             self.currentFloorLabel.config(text=f"Etage selectionne : {floors[selected_index]}")
@@ -1640,6 +1819,9 @@ class GraphicalView(tk.Tk):
         if tool != self.current_tool:
             # Set the current tool
             self.current_tool = tool
+            self.canvas.delete("snap_indicator")
+            self.canvas.delete("selection_band")
+            self._select_drag = None
             
             # Update cursor
             self._update_cursor()
@@ -1854,10 +2036,8 @@ class GraphicalView(tk.Tk):
 
     def _update_floor_scroll(self):
         """Update floor canvas scrollregion and determine if scrollbar is needed"""
-        self.floorCanvas.configure(scrollregion=self.floorCanvas.bbox("all"))
-
         # Check if content exceeds the visible area
-        content_height = self.floorFrame.winfo_reqheight()
+        content_height = self.floor_list.content_height()
         canvas_height = self.floorCanvas.winfo_height()
 
         if content_height > canvas_height:
@@ -1871,8 +2051,11 @@ class GraphicalView(tk.Tk):
         """Custom scrollcommand for floor canvas that updates scrollbar and checks visibility"""
         self.floor_vsb.set(*args)
 
+        # Draw the floor buttons scrolled into view
+        self.floor_list.refresh()
+
         # After updating scrollbar position, check if it should be visible
-        content_height = self.floorFrame.winfo_reqheight()
+        content_height = self.floor_list.content_height()
         canvas_height = self.floorCanvas.winfo_height()
 
         if content_height > canvas_height:
@@ -1927,16 +2110,50 @@ class GraphicalView(tk.Tk):
 
         file_path = filedialog.askopenfilename(
         title="Importer un projet",
-        filetypes=[("Fichier JSON", "*.json")],
+        filetypes=[("Fichier JSON", "*.json"), ("Bouches (CSV)", "*.csv")],
         defaultextension=".json"
         )
         if not file_path:
             return
 
+        # A CSV file adds vents to the current project, see model/vent_import.py
+        if file_path.lower().endswith(".csv"):
+            ivy_bus.publish("import_vents_request", {"csv_path": file_path})
+            return
+
         ivy_bus.publish("import_project_request", {
             "json_path": file_path
         })
 
+    def on_export_report_button_click(self):
+        pdf_path = filedialog.asksaveasfilename(
+            title="Exporter le rapport PDF",
+            defaultextension=".pdf",
+            filetypes=[("Fichier PDF", "*.pdf")],
+            initialdir=os.getcwd(),
+            initialfile="rapport_ventilation.pdf"
+        )
+        if not pdf_path:
+            return
+
+        ivy_bus.publish("export_report_request", {
+            "pdf_path": pdf_path
+        })
+
+    def on_report_data_update(self, data):
+        """Write the PDF report of the floors sent by the controller"""
+        pdf_path = data["pdf_path"]
+        try:
+            # Render the plans in this process, the interface is waiting anyway
+            export_report(data["floors"], pdf_path, project_name=data["project_name"], processes=1)
+        except OSError as e:
+            self.on_show_alert_request({
+                "title": "L'exportation a échoué",
+                "message": str(e)
+            })
+            return
+        print(f"[View] Ventilation report exported to: {pdf_path}")
+
     def on_document_button_click(self):
         """Open a window displaying the ventilation summary view"""
         # Check if there's already a window open - if so, focus on it instead of creating a new one
@@ -2182,6 +2399,11 @@ class GraphicalView(tk.Tk):
                 font=("Helvetica", 12)).grid(row=2, column=0, sticky="w", pady=5)
         rah_compliance = ttk.Label(rah_frame, text="N/A", font=("Helvetica", 12, "bold"))
         rah_compliance.grid(row=2, column=1, sticky="w", pady=5, padx=(10, 0))
+
+        ttk.Label(rah_frame, text="Pièces sous-ventilées:", 
+                font=("Helvetica", 12)).grid(row=3, column=0, sticky="w", pady=5)
+        under_ventilated_value = ttk.Label(rah_frame, text="N/A", font=("Helvetica", 12, "bold"))
+        under_ventilated_value.grid(row=3, column=1, sticky="w", pady=5, padx=(10, 0))
         
         # Add separator
         ttk.Separator(metrics_frame, orient="horizontal").pack(fill="x", pady=10)
@@ -2220,6 +2442,9 @@ class GraphicalView(tk.Tk):
         
         close_button = ttk.Button(button_frame, text="Fermer", command=summary_window.destroy)
         close_button.pack(side=tk.RIGHT)
+
+        export_button = ttk.Button(button_frame, text="Exporter PDF", command=self.on_export_report_button_click)
+        export_button.pack(side=tk.RIGHT, padx=(0, 10))
         
         # Store references to widgets for updating
         summary_window.vent_data = {
@@ -2231,21 +2456,48 @@ class GraphicalView(tk.Tk):
             "total_outflow_value": total_outflow_value,
             "rah_value": rah_value,
             "rah_compliance": rah_compliance,
+            "under_ventilated_value": under_ventilated_value,
             "plenum_simple_count": plenum_simple_count,
             "plenum_double_count": plenum_double_count,
             "plenum_total_area": plenum_total_area
         }
         
         # Create a callback handler for ventilation updates 
+        # Updates are coalesced: only the latest one is applied, once, when Tk is idle
+        summary_window.pending_summary = None
+
+        def apply_pending_summary():
+            data = summary_window.pending_summary
+            summary_window.pending_summary = None
+            if data is not None:
+                self.populate_ventilation_summary(data=data, summary_window=summary_window)
+
+        # The regulatory check runs room detection: it is asked for once the edits pause
+        summary_window.regulation_job = None
+
+        def request_regulation():
+            summary_window.regulation_job = None
+            ivy_bus.publish("regulation_summary_request", {})
+
         def handle_ventilation_update(data):
             print("[View] Received ventilation summary update")
-            self.populate_ventilation_summary(data=data, summary_window=summary_window)
-        
+            if summary_window.pending_summary is None:
+                summary_window.after_idle(apply_pending_summary)
+            summary_window.pending_summary = data
+            if summary_window.regulation_job is not None:
+                summary_window.after_cancel(summary_window.regulation_job)
+            summary_window.regulation_job = summary_window.after(REGULATION_REFRESH_DELAY, request_regulation)
+
+        def handle_regulation_update(data):
+            self._show_under_ventilated(summary_window, data)
+
         # Store the update handler reference so we can access it later to remove
         summary_window.ventilation_update_handler = handle_ventilation_update
+        summary_window.regulation_update_handler = handle_regulation_update
         
         # Subscribe to ventilation summary updates
         ivy_bus.subscribe("ventilation_summary_update", handle_ventilation_update)
+        ivy_bus.subscribe("regulation_summary_update", handle_regulation_update)
         
         # When the window is closed, manage cleanup
         summary_window.protocol("WM_DELETE_WINDOW", 
@@ -2294,10 +2546,10 @@ class GraphicalView(tk.Tk):
         
         drawn_rect_id = self.canvas.create_rectangle(
             start[0], start[1], end[0], end[1],
-            outline=plenum_color, fill="", width=3, tags=("plenum",)
+            outline=plenum_color, fill="", width=3, tags=("plenum",) + self._object_tags(data)
         )
 
-        tooltip_text = f"Plenum\nType: {plenum_type if plenum_type else 'N/A'}\nDébit Max: {max_flow} m3/h\nSuperficie: {area} m²"
+        tooltip_text = f"Plenum\nType: {plenum_type if plenum_type else 'N/A'}\nDébit Max: {format_quantity(max_flow, 'm3/h')}\nSuperficie: {area} m²"
         self.canvas_item_meta[drawn_rect_id] = {
             "type": "plenum",
             "max_flow": max_flow,
@@ -2320,6 +2572,10 @@ class GraphicalView(tk.Tk):
                 summary_window.unbind_all("<Button-5>")
             
             # Now that we have an unsubscribe method, use it to clean up properly
+            if getattr(summary_window, 'regulation_job', None) is not None:
+                summary_window.after_cancel(summary_window.regulation_job)
+            if hasattr(summary_window, 'regulation_update_handler'):
+                ivy_bus.unsubscribe("regulation_summary_update", summary_window.regulation_update_handler)
             if hasattr(summary_window, 'ventilation_update_handler'):
                 ivy_bus.unsubscribe("ventilation_summary_update", summary_window.ventilation_update_handler)
                 # Remove the reference to prevent future calls to a non-existent window
@@ -2368,8 +2624,6 @@ class GraphicalView(tk.Tk):
             return
             
         widgets = summary_window.vent_data
-        all_vents_tree = widgets["all_vents_tree"]
-        category_trees = widgets["category_trees"]
         
         # Check if the window still exists by trying to access its state
         try:
@@ -2381,28 +2635,6 @@ class GraphicalView(tk.Tk):
             print("[View] Warning: Error checking if summary window exists")
             return
             
-        # Check if the treeview widgets still exist
-        try:
-            # Clear existing data
-            all_vents_tree.delete(*all_vents_tree.get_children())
-            for tree in category_trees.values():
-                tree.delete(*tree.get_children())
-        except Exception as e:
-            print(f"[View] Warning: Error accessing treeview widgets: {e}")
-            return
-            
-        # Variables to track statistics
-        total_vents = 0
-        category_counts = {
-            "extraction_interne": 0,
-            "insufflation_interne": 0,
-            "extraction_externe": 0,
-            "admission_externe": 0
-        }
-        
-        total_inflow = 0  # insufflation_interne + admission_externe
-        total_outflow = 0  # extraction_interne + extraction_externe
-        
         vent_types = {
             "extraction_interne": "Extraction d'air vicié",
             "insufflation_interne": "Insufflation d'air neuf",
@@ -2410,175 +2642,141 @@ class GraphicalView(tk.Tk):
             "admission_externe": "Admission d'air neuf extérieur"
         }
         
-        # If we received ventilation data, use it
-        vents_data = []
-        if data and "vents" in data:
-            vents_data = data["vents"]
-            print(f"[View] Processing {len(vents_data)} vents for summary display")
-        else:
-            print("[View] Warning: No ventilation data received")
-        
-        # Process all vents
-        for vent_data in vents_data:
-            vent_function = vent_data.get("function", "")
-            if not vent_function:
-                print(f"[View] Warning: Vent missing function: {vent_data}")
-                continue
-                
-            total_vents += 1
-            
-            # Increment category count
-            if vent_function in category_counts:
-                category_counts[vent_function] += 1
-            
-            # Calculate flow rates
-            try:
-                flow_rate = int(vent_data.get("flow_rate", 0)) if vent_data.get("flow_rate") else 0
-            except ValueError:
-                flow_rate = 0
-                
-            if vent_function in ["insufflation_interne", "admission_externe"]:
-                total_inflow += flow_rate
-            elif vent_function in ["extraction_interne", "extraction_externe"]:
-                total_outflow += flow_rate
-            
-            # Add to all vents tree
-            try:
-                vent_type = vent_types.get(vent_function, "")
-                all_vents_tree.insert("", tk.END, values=(
-                    vent_data.get("floor_name", ""),
-                    vent_data.get("name", ""),
-                    vent_type,
-                    vent_data.get("diameter", ""),
-                    vent_data.get("flow_rate", "")
-                ))
-                
-                # Add to category tree
-                if vent_function in category_trees:
-                    category_trees[vent_function].insert("", tk.END, values=(
-                        vent_data.get("floor_name", ""),
-                        vent_data.get("name", ""),
-                        vent_data.get("diameter", ""),
-                        vent_data.get("flow_rate", "")
-                    ))
-            except Exception as e:
-                print(f"[View] Error adding vent to treeview: {e}")
-                continue
+        # Rows of the tables, keyed by vent ID. A floor's rows are only built
+        # again when its vent records changed (a new list), and only the
+        # differences with the rows already shown are applied
+        floors_data = (data or {}).get("floors", [])
+        shown_floors = getattr(summary_window, "floor_rows", {})
+        floor_rows = {}
+        for floor_totals in floors_data:
+            records, floor_name = floor_totals.get("vents", ()), floor_totals["floor_name"]
+            cached = shown_floors.get(floor_totals["floor_index"])
+            if cached is None or cached[0] is not records or cached[1] != floor_name:
+                rows = {}
+                for record in records:
+                    if not record.function:
+                        continue
+                    diameter = format_quantity(record.diameter)
+                    flow = format_quantity(record.flow_rate)
+                    rows[str(record.id)] = (
+                        record.function,
+                        (floor_name, record.name, vent_types.get(record.function, ""), diameter, flow),
+                        (floor_name, record.name, diameter, flow),
+                    )
+                cached = (records, floor_name, rows)
+            floor_rows[floor_totals["floor_index"]] = cached
+        summary_window.floor_rows = floor_rows
+        rows = {}
+        for _records, _floor_name, floor_vent_rows in floor_rows.values():
+            rows.update(floor_vent_rows)
+
+        try:
+            self._apply_summary_rows(summary_window, rows)
+        except tk.TclError as e:
+            print(f"[View] Warning: Error accessing treeview widgets: {e}")
+            return
         
+        totals = (data or {}).get("totals")
+        if totals is None:
+            print("[View] Warning: No ventilation totals received")
+            return
+
         # Update statistics display - with error handling
         try:
-            widgets["total_vents_value"].config(text=str(total_vents))
+            widgets["total_vents_value"].config(text=str(totals["total_vents"]))
             
-            for category, count in category_counts.items():
+            for category, count in totals["category_counts"].items():
                 if category in widgets["category_labels"]:
                     widgets["category_labels"][category].config(text=str(count))
             
-            widgets["total_inflow_value"].config(text=f"{total_inflow} m³/h")
-            widgets["total_outflow_value"].config(text=f"{total_outflow} m³/h")
+            widgets["total_inflow_value"].config(text=f"{totals['total_inflow']} m³/h")
+            widgets["total_outflow_value"].config(text=f"{totals['total_outflow']} m³/h")
             
-            # Calculate air renewal rates and professional metrics
-            if "plenum_simple_count" in widgets and "plenum_double_count" in widgets and "plenum_total_area" in widgets and "rah_value" in widgets and "rah_compliance" in widgets:
-                # Get plenum data if available
-                simple_count = 0
-                double_count = 0
-                total_area = 0
-                
-                if data and "plenums" in data:
-                    plenums_data = data["plenums"]
-                    print(f"[View] Found {len(plenums_data)} plenums in data")
-                    
-                    if plenums_data:
-                        # Count plenum types
-                        simple_count = 0
-                        double_count = 0
-                        total_area = 0
-                        
-                        for p in plenums_data:
-                            p_type = p.get("type", "Simple")  # Default to Simple if not specified
-                            if p_type == "Double":
-                                double_count += 1
-                            else:
-                                simple_count += 1
-                                
-                            # Add to total area
-                            total_area += p.get("area", 0)
-                        
-                        # Update plenum counts
-                        widgets["plenum_simple_count"].config(text=str(simple_count))
-                        widgets["plenum_double_count"].config(text=str(double_count))
-                        
-                        # Update total plenum area
-                        if total_area > 0:
-                            widgets["plenum_total_area"].config(text=f"{total_area:.2f} m²")
-                        
-                        # Calculate total volume of all plenums
-                        total_volume = 0
-                        for p in plenums_data:
-                            p_area = p.get("area", 0)
-                            p_height = p.get("height", 2.5)
-                            total_volume += (p_area * p_height)
-                        
-                        if total_volume > 0:
-                            # Use appropriate flow based on plenum types
-                            # For RAH calculation, we'll use the largest value 
-                            # between extraction (simple flux) and insufflation (double flux)
-                            extraction_rah = total_outflow / total_volume if total_volume > 0 else 0
-                            insufflation_rah = total_inflow / total_volume if total_volume > 0 else 0
-                            
-                            # Use appropriate RAH based on plenum types
-                            if double_count > 0:
-                                # If at least one plenum is Double, use insufflation for RAH
-                                rah = insufflation_rah
-                                rah_text = f"{rah:.2f}"
-                                print(f"[View] Calculated RAH for Double flux: {rah_text} (inflow: {total_inflow} m³/h, volume: {total_volume:.2f} m³)")
-                            else:
-                                # Otherwise use extraction (simple flux standard)
-                                rah = extraction_rah
-                                rah_text = f"{rah:.2f}"
-                                print(f"[View] Calculated RAH for Simple flux: {rah_text} (outflow: {total_outflow} m³/h, volume: {total_volume:.2f} m³)")
-                            
-                            widgets["rah_value"].config(text=rah_text)
-                            
-                            # Check compliance
-                            if rah >= 0.35:
-                                widgets["rah_compliance"].config(text="Conforme", foreground="green")
-                            else:
-                                widgets["rah_compliance"].config(text="Non conforme", foreground="red")
-                        else:
-                            print("[View] Warning: Total volume is zero, cannot calculate RAH")
-                
-                # Update plenum information
-                widgets["plenum_simple_count"].config(text=str(simple_count))
-                widgets["plenum_double_count"].config(text=str(double_count))
-                widgets["plenum_total_area"].config(text=f"{total_area:.2f} m²")
-            
-            print(f"[View] Summary populated with {total_vents} vents. Inflow: {total_inflow}, Outflow: {total_outflow}")
+            # Plenums and air renewal
+            widgets["plenum_simple_count"].config(text=str(totals["plenum_simple_count"]))
+            widgets["plenum_double_count"].config(text=str(totals["plenum_double_count"]))
+            widgets["plenum_total_area"].config(text=f"{totals['plenum_total_area']:.2f} m²")
+
+            rah = totals["rah"]
+            if rah is None:
+                widgets["rah_value"].config(text="N/A")
+                widgets["rah_compliance"].config(text="N/A", foreground="")
+            else:
+                widgets["rah_value"].config(text=f"{rah:.2f}")
+                if totals["rah_compliant"]:
+                    widgets["rah_compliance"].config(text="Conforme", foreground="green")
+                else:
+                    widgets["rah_compliance"].config(text="Non conforme", foreground="red")
+
+            print(f"[View] Summary populated with {totals['total_vents']} vents. Inflow: {totals['total_inflow']}, Outflow: {totals['total_outflow']}")
         except Exception as e:
             print(f"[View] Error updating statistics widgets: {e}")
             return
 
-    def _truncate_text_with_ellipsis(self, text, max_width, font):
-        """Truncates text with ellipsis if it exceeds max_width pixels"""
-        # Get Tkinter font object to measure text width
-        font_obj = tk.font.Font(family=font[0], size=font[1], weight=font[2] if len(font) > 2 else "normal")
-
-        # If text fits, return it as is
-        if font_obj.measure(text) <= max_width:
-            return text
-
-        # Truncate with ellipsis
-        ellipsis = "..."
-        ellipsis_width = font_obj.measure(ellipsis)
-
-        # Start with empty result and add characters one by one
-        result = ""
-        for char in text:
-            # Check if adding this character + ellipsis would exceed max width
-            if font_obj.measure(result + char) + ellipsis_width > max_width:
-                return result + ellipsis
-            result += char
+    def _show_under_ventilated(self, summary_window, data):
+        """Rooms below their regulatory flow, per floor (regulation_summary_update)"""
+        try:
+            if not summary_window.winfo_exists():
+                return
+            label = summary_window.vent_data["under_ventilated_value"]
+            under_ventilated = [(f["floor_name"], f["under_ventilated_rooms"])
+                                for f in data.get("floors", []) if f.get("under_ventilated_rooms")]
+            if under_ventilated:
+                total = sum(count for _name, count in under_ventilated)
+                detail = ", ".join(f"{name} : {count}" for name, count in under_ventilated)
+                label.config(text=f"{total} ({detail})", foreground="red")
+            else:
+                label.config(text="0", foreground="green")
+        except tk.TclError as e:
+            print(f"[View] Warning: Error updating the regulatory check: {e}")
 
-        return result  # Shouldn't reach here, but just in case
+    def _apply_summary_rows(self, summary_window, rows):
+        """
+        Bring the summary tables to rows = {vent ID: (function, all-vents values,
+        category values)}, inserting, updating or deleting only the rows that changed.
+        """
+        widgets = summary_window.vent_data
+        all_vents_tree = widgets["all_vents_tree"]
+        category_trees = widgets["category_trees"]
+        shown = getattr(summary_window, "summary_rows", {})
+
+        # Removed vents, and vents that moved to another category
+        for iid, (function, _values, _cat_values) in shown.items():
+            new_row = rows.get(iid)
+            if new_row is None:
+                all_vents_tree.delete(iid)
+            if (new_row is None or new_row[0] != function) and function in category_trees:
+                category_trees[function].delete(iid)
+
+        # New and changed rows, at their position in the payload order
+        category_positions = {function: 0 for function in category_trees}
+        for position, (iid, row) in enumerate(rows.items()):
+            function, values, cat_values = row
+            old_row = shown.get(iid)
+            if old_row is None:
+                all_vents_tree.insert("", position, iid=iid, values=values)
+            elif old_row[1] != values:
+                all_vents_tree.item(iid, values=values)
+
+            if function in category_trees:
+                tree = category_trees[function]
+                if old_row is None or old_row[0] != function:
+                    tree.insert("", category_positions[function], iid=iid, values=cat_values)
+                elif old_row[2] != cat_values:
+                    tree.item(iid, values=cat_values)
+                category_positions[function] += 1
+
+        summary_window.summary_rows = rows
+
+        # Fit the floor and name columns to their longest entry
+        def fit_columns(tree, values_list):
+            for column, position in (("floor", 0), ("name", 1)):
+                tree.column(column, width=text_metrics.column_width(
+                    [values[position] for values in values_list], "TkDefaultFont", minimum=120, maximum=300))
+
+        fit_columns(all_vents_tree, [row[1] for row in rows.values()])
+        for function, tree in category_trees.items():
+            fit_columns(tree, [row[2] for row in rows.values() if row[0] == function])
 
     def _center_window(self, width, height):
         """Center the window on the screen"""
@@ -2598,158 +2796,84 @@ class GraphicalView(tk.Tk):
         if hasattr(self, 'currentFloorLabel') and self.currentFloorLabel:
             ivy_bus.publish("onion_skin_preview_request", {})
 
-    def draw_onion_skin_item(self, item_type, coords, fill_color=None, thickness=None, additional_data=None):
-        """Draw an item as part of the onion skin with reduced opacity"""
-        # Remove any existing onion skin items
-        item_id = None
-        opacity_color = self._apply_opacity_to_color(fill_color, self.onion_skin_opacity)
-
-        if item_type == "wall":
-            start, end = coords
-            item_id = self.canvas.create_line(
-                start[0], start[1], end[0], end[1],
-                fill=opacity_color, width=3, tags=("onion_skin",)
-            )
-        elif item_type == "window":
-            start, end = coords
-            thickness = thickness or 5
-            item_id = self.canvas.create_line(
-                start[0], start[1], end[0], end[1],
-                fill=opacity_color, width=thickness, tags=("onion_skin",)
-            )
-        elif item_type == "door":
-            start, end = coords
-            thickness = thickness or 5
-            item_id = self.canvas.create_line(
-                start[0], start[1], end[0], end[1],
-                fill=opacity_color, width=thickness, tags=("onion_skin",)
-            )
-        elif item_type == "vent":
-            start, end = coords
-            # Calculate the radius based on the distance between start and end points
-            import math
-            dx = end[0] - start[0]
-            dy = end[1] - start[1]
-            radius = math.sqrt(dx*dx + dy*dy)
-            
-            # Create a hollow circle with reduced opacity
-            item_id = self.canvas.create_oval(
-                start[0] - radius, start[1] - radius,
-                start[0] + radius, start[1] + radius,
-                outline=opacity_color, width=2, fill="", tags=("onion_skin",)
-            )
-            
-            # Store this onion skin item
-            self.onion_skin_items.append(item_id)
-        elif item_type == "plenum":
-            start, end = coords
-            # Get plenum type from additional data if available
-            plenum_type = None
-            if additional_data:
-                plenum_type = additional_data.get("type")
-            
-            # Choose color based on plenum type (same as in on_draw_plenum_update)
-            plenum_color = "blue"  # Default color
-            if plenum_type:
-                if plenum_type == "Simple":
-                    plenum_color = "#4CAF50"  # Material Green
-                elif plenum_type == "Double":
-                    plenum_color = "#9C27B0"  # Material Purple
-            
-            # Apply opacity to the color
-            plenum_color = self._apply_opacity_to_color(plenum_color, self.onion_skin_opacity)
-            
-            # Create the rectangle for plenum with reduced opacity
-            item_id = self.canvas.create_rectangle(
-                start[0], start[1], end[0], end[1],
-                outline=plenum_color, width=3, fill="", tags=("onion_skin",)
-            )
-
-        if item_id:
-            self.onion_skin_items.append(item_id)
-
-    def _apply_opacity_to_color(self, color, opacity):
-        """Convert color to rgba with opacity"""
-        if not color or color == "":
-            color = "#000000"  # Default to black
-
-        # Handle named colors
-        if color == "black":
-            color = "#000000"
-        elif color == "blue":
-            color = "#0000FF"  # Standard blue for plenum
-        elif color == "#ffafcc":  # Window color
-            color = "#ffafcc"
-        elif color == "#dda15e":  # Door color
-            color = "#dda15e"
-
-        # For hex colors, mix with white background to create opacity effect
-        if color.startswith("#"):
-            r = int(color[1:3], 16)
-            g = int(color[3:5], 16) if len(color) >= 5 else r
-            b = int(color[5:7], 16) if len(color) >= 7 else g
-
-            # Mix with white (255,255,255) based on opacity
-            r = int(r * opacity + 255 * (1 - opacity))
-            g = int(g * opacity + 255 * (1 - opacity))
-            b = int(b * opacity + 255 * (1 - opacity))
-
-            return f"#{r:02x}{g:02x}{b:02x}"
-
-        return color  # Return original if we can't process it
+    def _ghost_layer(self, level):
+        """
+        (PhotoImage, origin) of a ghost floor, (None, None) when it is empty.
+        The floor is rendered once per version, opacity and dash (the floors
+        above are dashed); the PhotoImage is then kept by that key and reused.
+        """
+        snapshot, offset = level["snapshot"], level["offset"]
+        opacity = palette.onion_skin_opacity(offset)
+        key = (level["floor_id"], snapshot.version, opacity, offset > 0)
+        layer = self._ghost_photos.pop(key, None)
+        if layer is None:
+            image, origin = render_ghost_layer(snapshot, opacity, dashed=offset > 0)
+            layer = (ImageTk.PhotoImage(image), origin) if image is not None else (None, None)
+        self._ghost_photos[key] = layer  # Most recently used last
+        while len(self._ghost_photos) > GHOST_PHOTO_CACHE_SIZE:
+            self._ghost_photos.popitem(last=False)
+        return layer
 
     def clear_onion_skin(self):
         """Clear all onion skin preview items"""
-        # Delete items by ID list
-        for item_id in self.onion_skin_items:
-            self.canvas.delete(item_id)
-        
-        # Also find and delete any items that might have the onion_skin tag but weren't tracked
-        onion_items = self.canvas.find_withtag("onion_skin")
-        for item in onion_items:
-            self.canvas.delete(item)
-            
-        # Reset the tracking list
+        self.canvas.delete("onion_skin")
         self.onion_skin_items = []
+        self._ghost_items = {}
 
     def on_onion_skin_preview_update(self, data):
-        """Handle onion skin preview update from controller"""
-        # Clear any existing onion skin items
-        self.clear_onion_skin()
-
-        # Check if we have data to draw
-        if not data or "items" not in data:
-            return
-
-        # Draw each item in the onion skin preview
-        for item in data["items"]:
-            item_type = item.get("type")
-            coords = item.get("coords")
-            fill = item.get("fill", "")
-            thickness = item.get("thickness")
-            additional_data = item.get("additional_data")
+        """
+        Handle onion skin preview update from controller: one image per ghost
+        floor. The canvas item of a level is kept and only gets a new bitmap.
+        """
+        shown = set()
+        # Farthest floors come first, each raised above the previous one
+        for level in (data or {}).get("levels", []):
+            offset = level["offset"]
+            photo, origin = self._ghost_layer(level)
+            if photo is None:
+                continue
+            x, y = origin
+            item_id = self._ghost_items.get(offset)
+            if item_id is not None and self.canvas.type(item_id) == "image":
+                self.canvas.itemconfigure(item_id, image=photo)
+                self.canvas.coords(item_id, x, y)
+                self.canvas.tag_raise(item_id)
+            else:
+                item_id = self.canvas.create_image(x, y, image=photo, anchor="nw",
+                                                   tags=("onion_skin", f"onion_level{offset}"))
+                self._ghost_items[offset] = item_id
+            shown.add(offset)
 
-            self.draw_onion_skin_item(item_type, coords, fill, thickness, additional_data)
+        for offset in [o for o in self._ghost_items if o not in shown]:
+            self.canvas.delete(self._ghost_items.pop(offset))
+        self.onion_skin_items = list(self._ghost_items.values())
 
         # Ensure all onion skin items are at the bottom of the z-order
         self._ensure_onion_skin_below()
 
     def _ensure_onion_skin_below(self):
-        """Ensure all onion skin items are below all other canvas items"""
-        # First, lower all onion skin items
-        for item_id in self.onion_skin_items:
-            self.canvas.tag_lower(item_id)
-
-        # Then raise all regular items (walls, windows, doors, vents) above onion skin
-        all_items = self.canvas.find_all()
-        for item in all_items:
-            tags = self.canvas.gettags(item)
-            if tags and "onion_skin" not in tags:
-                self.canvas.tag_raise(item)
+        """
+        Put the onion skin items below all other canvas items. Lowering the
+        tag keeps the order of the ghost levels and of the other items.
+        """
+        self.canvas.tag_lower("onion_skin")
+
+    def on_onion_skin_spinbox_change(self, event=None):
+        """Floors shown as ghost layers below and above the selected floor"""
+        try:
+            below, above = int(self.onion_below_var.get()), int(self.onion_above_var.get())
+        except (ValueError, tk.TclError):
+            return
+        ivy_bus.publish("onion_skin_settings_request", {"below": below, "above": above})
+
+    def on_snap_grid_toggle(self):
+        ivy_bus.publish("snap_settings_request", {"grid": self.snap_grid_var.get()})
 
     def on_escape_key(self, event):
         """Handle Esc key press to cancel the current drawing operation"""
-        if self.current_tool == 'wall':
+        if self.current_tool == 'select' and self.selected_ids:
+            ivy_bus.publish("select_request", {"mode": "rectangle", "points": []})
+        elif self.current_tool == 'wall':
             ivy_bus.publish("cancal_to_draw_wall_request", {})
             self._hide_placement_tooltip()
         elif self.current_tool == 'window':
@@ -2912,6 +3036,7 @@ class GraphicalView(tk.Tk):
         self.canvas_item_meta = {}  # Clear meta data
         self.vent_tooltips = {}  # Clear vent tooltips
         self.onion_skin_items = []  # Clear onion skin items
+        self._ghost_items = {}
         
         if self.height_text_id:
             self.height_text_id = None
@@ -0,0 +1,76 @@
+"""
+Colours and line widths of the plan elements.
+
+Same values as the canvas drawing in graphical_view.py and the
+controller's draw/onion skin updates, for the renderers and exporters
+that work without Tk.
+"""
+from functools import lru_cache
+
+WALL_COLOR = "#000000"      # Black
+WINDOW_COLOR = "#ffafcc"    # Pink
+DOOR_COLOR = "#dda15e"      # Dark orange
+PLENUM_COLOR = "#0000ff"    # Blue, plenum without type
+PLENUM_TYPE_COLORS = {
+    "Simple": "#4CAF50",    # Material Green
+    "Double": "#9C27B0",    # Material Purple
+}
+VENT_DEFAULT_COLOR = "#000000"
+
+WALL_WIDTH = 6
+ONION_WALL_WIDTH = 3
+VENT_WIDTH = 2
+PLENUM_WIDTH = 3
+
+SNAP_COLOR = "#ff8c00"      # Dark orange, snapping marker
+SNAP_MARKER_SIZE = 5
+SELECTION_COLOR = "#1e90ff" # Dodger blue, selection outlines and rubber band
+
+ONION_SKIN_OPACITY = 0.3
+# Each further floor of the ghost layers is this much fainter
+ONION_SKIN_FADE = 0.6
+# Colours the controller sends by name
+NAMED_COLORS = {"black": WALL_COLOR, "blue": PLENUM_COLOR, "": WALL_COLOR}
+
+
+def plenum_color(plenum_type):
+    return PLENUM_TYPE_COLORS.get(plenum_type, PLENUM_COLOR)
+
+
+def onion_skin_opacity(offset):
+    """Opacity of the ghost layer offset floors away (-1: just below, 1: just above)"""
+    return ONION_SKIN_OPACITY * ONION_SKIN_FADE ** (abs(offset) - 1)
+
+
+def hex_to_rgb(color):
+    """Parse '#rgb' or '#rrggbb' into an (r, g, b) tuple"""
+    color = color.lstrip("#")
+    if len(color) == 3:
+        color = "".join(c * 2 for c in color)
+    return (int(color[0:2], 16), int(color[2:4], 16), int(color[4:6], 16))
+
+
+@lru_cache(maxsize=512)
+def with_alpha(color, opacity):
+    """(r, g, b, a) of a colour (hex or one of NAMED_COLORS) drawn at an opacity"""
+    color = NAMED_COLORS.get(color or "", color)
+    if not color.startswith("#"):
+        return color  # A colour name, drawn opaque
+    return hex_to_rgb(color) + (int(round(255 * opacity)),)
+
+
+@lru_cache(maxsize=512)
+def blend_with_white(color, opacity):
+    """
+    Mix a colour (hex or one of NAMED_COLORS) with a white background, like
+    the onion skin does on the canvas. Cached by (colour, opacity): a plan
+    only uses a handful of colours.
+    """
+    color = NAMED_COLORS.get(color or "", color)
+    if not color.startswith("#"):
+        return color  # A Tk colour name we cannot blend
+    r, g, b = hex_to_rgb(color)
+    r = int(r * opacity + 255 * (1 - opacity))
+    g = int(g * opacity + 255 * (1 - opacity))
+    b = int(b * opacity + 255 * (1 - opacity))
+    return f"#{r:02x}{g:02x}{b:02x}"
@@ -0,0 +1,263 @@
+"""
+Offscreen rendering of floor plans with Pillow.
+
+Draws floors straight from the model, the same way the canvas does
+(onion skin of the floor below, vents, plenums, compass and scale bar),
+so plan images can be produced without a display.
+
+    images = render_building(floors)
+    export_png(floors, "plans/")
+    export_pdf(floors, "plans.pdf")
+
+render_ghost_layer() renders a floor alone on a transparent image, for
+the onion skin of the canvas. Like the other functions here it reads a
+Floor or a FloorSnapshot (model/snapshot.py), which is what the canvas
+gets from the controller.
+"""
+import math
+import os
+from functools import lru_cache
+from multiprocessing import Pool
+
+from PIL import Image, ImageDraw, ImageFont
+
+from model.units import PIXELS_PER_METER
+from view import palette
+
+MARGIN = 60
+MIN_SIZE = (800, 500)
+GHOST_DASH = (8, 4)     # Dash and gap (canvas pixels) of the ghost floors above
+
+
+@lru_cache(maxsize=None)
+def get_font(size, bold=False):
+    """Load a scalable font, falling back to Pillow's default one"""
+    names = ("DejaVuSans-Bold.ttf", "Arial Bold.ttf") if bold else ("DejaVuSans.ttf", "Arial.ttf")
+    for name in names:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+def floor_bounds(floor):
+    """Bounding box (x1, y1, x2, y2) of everything drawn on a floor, or None if empty"""
+    xs, ys = [], []
+    for objects in (floor.walls, floor.windows, floor.doors, floor.plenums):
+        for obj in objects:
+            xs += (obj.start[0], obj.end[0])
+            ys += (obj.start[1], obj.end[1])
+    for vent in floor.vents:
+        radius = _vent_radius(vent)
+        xs += (vent.start[0] - radius, vent.start[0] + radius)
+        ys += (vent.start[1] - radius, vent.start[1] + radius)
+    if not xs:
+        return None
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+def building_bounds(floors):
+    """Common bounding box of several floors, so all plans share the same frame"""
+    boxes = [b for b in (floor_bounds(f) for f in floors) if b]
+    if not boxes:
+        return (0, 0, MIN_SIZE[0], MIN_SIZE[1])
+    return (min(b[0] for b in boxes), min(b[1] for b in boxes),
+            max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+
+def _vent_radius(vent):
+    return math.hypot(vent.end[0] - vent.start[0], vent.end[1] - vent.start[1])
+
+
+class PlanPainter:
+    """Draws model objects on a Pillow image, in canvas coordinates shifted by an offset"""
+
+    def __init__(self, image, offset=(0, 0), scale=1.0, dash=None):
+        self.draw = ImageDraw.Draw(image)
+        self.offset = offset
+        self.scale = scale
+        self.dash = dash        # (dash, gap) in canvas pixels for lines and rectangles
+
+    def _pt(self, point):
+        return ((point[0] - self.offset[0]) * self.scale, (point[1] - self.offset[1]) * self.scale)
+
+    def _width(self, width):
+        return max(1, int(round(float(width) * self.scale)))
+
+    def line(self, start, end, color, width):
+        if self.dash:
+            self._dashed_line(start, end, color, width)
+            return
+        self.draw.line([self._pt(start), self._pt(end)], fill=color, width=self._width(width))
+
+    def _dashed_line(self, start, end, color, width):
+        length = math.hypot(end[0] - start[0], end[1] - start[1])
+        if length == 0:
+            return
+        dash, gap = self.dash
+        ux, uy = (end[0] - start[0]) / length, (end[1] - start[1]) / length
+        position = 0.0
+        while position < length:
+            stop = min(position + dash, length)
+            self.draw.line([self._pt((start[0] + ux * position, start[1] + uy * position)),
+                            self._pt((start[0] + ux * stop, start[1] + uy * stop))],
+                           fill=color, width=self._width(width))
+            position = stop + gap
+
+    def circle(self, center, radius, color, width):
+        cx, cy = self._pt(center)
+        r = radius * self.scale
+        self.draw.ellipse([cx - r, cy - r, cx + r, cy + r], outline=color, width=self._width(width))
+
+    def rectangle(self, start, end, color, width):
+        if self.dash:
+            corners = [start, (end[0], start[1]), end, (start[0], end[1])]
+            for a, b in zip(corners, corners[1:] + corners[:1]):
+                self._dashed_line(a, b, color, width)
+            return
+        (x1, y1), (x2, y2) = self._pt(start), self._pt(end)
+        self.draw.rectangle([min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)],
+                            outline=color, width=self._width(width))
+
+    def floor(self, floor, opacity=None, translucent=False):
+        """
+        Draw every object of a floor; with an opacity, draw it as onion skin:
+        blended with white, or with that alpha when translucent (RGBA images).
+        """
+        def color(c):
+            if opacity is None:
+                return c
+            if translucent:
+                return palette.with_alpha(c, opacity)
+            return palette.blend_with_white(c, opacity)
+
+        wall_width = palette.ONION_WALL_WIDTH if opacity is not None else palette.WALL_WIDTH
+        for wall in floor.walls:
+            self.line(wall.start, wall.end, color(palette.WALL_COLOR), wall_width)
+        for window in floor.windows:
+            self.line(window.start, window.end, color(palette.WINDOW_COLOR), window.thickness or 5)
+        for door in floor.doors:
+            self.line(door.start, door.end, color(palette.DOOR_COLOR), door.thickness or 5)
+        for vent in floor.vents:
+            self.circle(vent.start, _vent_radius(vent),
+                        color(vent.color or palette.VENT_DEFAULT_COLOR), palette.VENT_WIDTH)
+        for plenum in floor.plenums:
+            self.rectangle(plenum.start, plenum.end, color(palette.plenum_color(plenum.type)),
+                           palette.PLENUM_WIDTH)
+
+
+def draw_compass(draw, x, y, scale=1.0):
+    """Compass and 2 m scale bar, as drawn in the top-left corner of the canvas"""
+    radius = 20
+    cx, cy = x + 40, y + 40
+    draw.ellipse([cx - radius, cy - radius, cx + radius, cy + radius], outline="black", width=2)
+    draw.line([cx, cy - radius, cx, cy + radius], fill="black", width=2)
+    draw.line([cx - radius, cy, cx + radius, cy], fill="black", width=2)
+    font = get_font(10, bold=True)
+    for label, (lx, ly) in (("N", (cx, cy - radius - 10)), ("E", (cx + radius + 10, cy)),
+                            ("S", (cx, cy + radius + 10)), ("O", (cx - radius - 10, cy))):
+        draw.text((lx, ly), label, fill="black", font=font, anchor="mm")
+
+    # The bar is 2 m long at the plan scale
+    bar = 2 * PIXELS_PER_METER * scale
+    line_y = cy + radius + 25
+    draw.text((cx, line_y), "2m", fill="black", font=get_font(11, bold=True), anchor="mm")
+    draw.line([cx - bar / 2, line_y + 10, cx + bar / 2, line_y + 10], fill="black", width=2)
+
+
+def render_floor(floor, floor_below=None, bounds=None, scale=1.0):
+    """
+    Render one floor to an RGB image.
+
+    Args:
+        floor: the Floor to draw
+        floor_below: optional Floor shown as onion skin underneath
+        bounds: plan area (x1, y1, x2, y2) in canvas coordinates; defaults to the
+            floor's own extent. Pass building_bounds() to align several floors.
+        scale: output pixels per canvas pixel
+    """
+    if bounds is None:
+        bounds = building_bounds([f for f in (floor, floor_below) if f is not None])
+    x1, y1, x2, y2 = bounds
+    width = max(MIN_SIZE[0], int((x2 - x1 + 2 * MARGIN) * scale))
+    height = max(MIN_SIZE[1], int((y2 - y1 + 2 * MARGIN) * scale) + 40)
+
+    image = Image.new("RGB", (width, height), "white")
+    painter = PlanPainter(image, offset=(x1 - MARGIN, y1 - MARGIN), scale=scale)
+    if floor_below is not None:
+        painter.floor(floor_below, opacity=palette.ONION_SKIN_OPACITY)
+    painter.floor(floor)
+
+    draw = painter.draw
+    draw_compass(draw, 1, 1, scale)
+    draw.text((width - 10, height - 10), f"{floor.name} - Hauteur de cet etage : {floor.height} m",
+              fill="#444444", font=get_font(12), anchor="rs")
+    return image
+
+
+def render_ghost_layer(floor, opacity, scale=1.0, dashed=False):
+    """
+    Render a floor as onion skin on a transparent RGBA image.
+
+    Returns:
+        (image, origin): origin is the canvas point of the image's top-left
+        corner; (None, None) for an empty floor
+    """
+    bounds = floor_bounds(floor)
+    if bounds is None:
+        return None, None
+    # Room for the line widths around the objects
+    pad = max(palette.WALL_WIDTH, palette.PLENUM_WIDTH, 5)
+    x1, y1, x2, y2 = bounds
+    origin = (math.floor(x1) - pad, math.floor(y1) - pad)
+    size = (int((math.ceil(x2) - origin[0] + pad) * scale) + 1,
+            int((math.ceil(y2) - origin[1] + pad) * scale) + 1)
+    image = Image.new("RGBA", size, (255, 255, 255, 0))
+    painter = PlanPainter(image, offset=origin, scale=scale, dash=GHOST_DASH if dashed else None)
+    painter.floor(floor, opacity=opacity, translucent=True)
+    return image, origin
+
+
+def _render_job(job):
+    floor, floor_below, bounds, scale = job
+    return render_floor(floor, floor_below, bounds, scale)
+
+
+def render_building(floors, scale=1.0, onion_skin=True, processes=None):
+    """
+    Render every floor, each with the floor below as onion skin.
+
+    Floors are independent, so they are rendered in a process pool;
+    processes=1 renders in the current process (e.g. inside another pool).
+    """
+    bounds = building_bounds(floors)
+    jobs = [(floor, floors[i - 1] if onion_skin and i > 0 else None, bounds, scale)
+            for i, floor in enumerate(floors)]
+
+    if processes == 1 or len(jobs) <= 1:
+        return [_render_job(job) for job in jobs]
+    with Pool(processes=processes) as pool:
+        return pool.map(_render_job, jobs)
+
+
+def _safe_name(name):
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in name)
+
+
+def export_png(floors, out_dir, prefix="", **kwargs):
+    """Write one PNG per floor into out_dir. Returns the written paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for i, image in enumerate(render_building(floors, **kwargs)):
+        path = os.path.join(out_dir, f"{prefix}{i:02d}_{_safe_name(floors[i].name)}.png")
+        image.save(path)
+        paths.append(path)
+    return paths
+
+
+def export_pdf(floors, path, **kwargs):
+    """Write all floors into a PDF, one page per floor"""
+    images = render_building(floors, **kwargs)
+    images[0].save(path, save_all=True, append_images=images[1:], resolution=72.0)
+    return path
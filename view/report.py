@@ -0,0 +1,260 @@
+"""
+PDF ventilation report ("bilan aéraulique").
+
+Builds a multi-page PDF with Pillow from the report payload of
+collect_summary_data(): overall balance and RAH compliance, the rooms
+and vents of each floor with their regulatory check, the duct networks
+and the rendered floor plans.
+Runs without a display, so it can be used from batch.py.
+
+The page background (header band and footer rule) is drawn once per
+title and page size and copied for each page.
+"""
+from datetime import datetime
+from functools import lru_cache
+
+from PIL import Image, ImageDraw
+
+from model.ventilation import (collect_summary_data, compute_summary, VENT_TYPE_NAMES,
+                               INFLOW_FUNCTIONS, OUTFLOW_FUNCTIONS, RAH_MINIMUM)
+from model.units import format_quantity, known
+from model.duct_network import project_networks, EXTRACTION
+from view import plan_renderer
+from view.plan_renderer import get_font
+
+# A4 at 150 dpi
+PAGE_SIZE = (1240, 1754)
+RESOLUTION = 150.0
+MARGIN = 90
+HEADER_HEIGHT = 110
+ROW_HEIGHT = 34
+
+HEADER_COLOR = "#dde1f7"
+TEXT_COLOR = "#2f3039"
+RULE_COLOR = "#cccccc"
+
+
+@lru_cache(maxsize=16)
+def _page_template(title, size=PAGE_SIZE):
+    """Blank page with the header band and footer rule, shared by all pages of a report"""
+    page = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(page)
+    width, height = size
+    draw.rectangle([0, 0, width, HEADER_HEIGHT], fill=HEADER_COLOR)
+    draw.text((MARGIN, HEADER_HEIGHT // 2), title, fill=TEXT_COLOR, font=get_font(34, bold=True), anchor="lm")
+    draw.line([MARGIN, height - 70, width - MARGIN, height - 70], fill=RULE_COLOR, width=2)
+    return page
+
+
+class ReportBuilder:
+    """Lays out text, tables and images on successive pages"""
+
+    def __init__(self, title, subtitle=""):
+        self.title = title
+        self.subtitle = subtitle
+        self.pages = []
+        self.page = None
+        self.draw = None
+        self.y = 0
+
+    def new_page(self):
+        self.page = _page_template(self.title).copy()
+        self.draw = ImageDraw.Draw(self.page)
+        self.pages.append(self.page)
+        self.y = HEADER_HEIGHT + 50
+
+    def _ensure_space(self, height):
+        if self.page is None or self.y + height > PAGE_SIZE[1] - 100:
+            self.new_page()
+
+    def heading(self, text):
+        self._ensure_space(80)
+        self.y += 10
+        self.draw.text((MARGIN, self.y), text, fill=TEXT_COLOR, font=get_font(28, bold=True))
+        self.y += 50
+
+    def line(self, label, value, color=TEXT_COLOR):
+        self._ensure_space(ROW_HEIGHT)
+        self.draw.text((MARGIN, self.y), label, fill=TEXT_COLOR, font=get_font(22))
+        self.draw.text((MARGIN + 620, self.y), value, fill=color, font=get_font(22, bold=True))
+        self.y += ROW_HEIGHT
+
+    def table(self, columns, rows):
+        """columns: list of (title, width); rows: list of value tuples"""
+        def header():
+            x = MARGIN
+            self.draw.rectangle([MARGIN, self.y - 4, PAGE_SIZE[0] - MARGIN, self.y + ROW_HEIGHT - 6],
+                                fill="#f0f3ff")
+            for title, width in columns:
+                self.draw.text((x + 6, self.y), title, fill=TEXT_COLOR, font=get_font(20, bold=True))
+                x += width
+            self.y += ROW_HEIGHT
+
+        self._ensure_space(ROW_HEIGHT * 2)
+        header()
+        for row in rows:
+            if self.y + ROW_HEIGHT > PAGE_SIZE[1] - 100:
+                self.new_page()
+                header()
+            x = MARGIN
+            for (_title, width), value in zip(columns, row):
+                self.draw.text((x + 6, self.y), str(value), fill=TEXT_COLOR, font=get_font(20))
+                x += width
+            self.draw.line([MARGIN, self.y + ROW_HEIGHT - 6, PAGE_SIZE[0] - MARGIN, self.y + ROW_HEIGHT - 6],
+                           fill=RULE_COLOR)
+            self.y += ROW_HEIGHT
+        self.y += 20
+
+    def image_page(self, caption, image):
+        """Put an image on a page of its own, scaled to fit"""
+        self.new_page()
+        self.draw.text((MARGIN, self.y), caption, fill=TEXT_COLOR, font=get_font(28, bold=True))
+        self.y += 60
+        max_w = PAGE_SIZE[0] - 2 * MARGIN
+        max_h = PAGE_SIZE[1] - self.y - 120
+        ratio = min(max_w / image.width, max_h / image.height)
+        scaled = image.resize((int(image.width * ratio), int(image.height * ratio)), Image.LANCZOS)
+        self.page.paste(scaled, (MARGIN, self.y))
+        self.y += scaled.height + 20
+
+    def finish(self):
+        """Stamp subtitle and page numbers on every page"""
+        total = len(self.pages)
+        for number, page in enumerate(self.pages, 1):
+            draw = ImageDraw.Draw(page)
+            draw.text((MARGIN, PAGE_SIZE[1] - 55), self.subtitle, fill="#666666", font=get_font(18))
+            draw.text((PAGE_SIZE[0] - MARGIN, PAGE_SIZE[1] - 55), f"Page {number}/{total}",
+                      fill="#666666", font=get_font(18), anchor="ra")
+        return self.pages
+
+
+def _room_flow_text(room_data):
+    """Flow of a room against its regulatory flow, e.g. "30 / 45" """
+    flow = room_data.get("actual", max(room_data["inflow"], room_data["outflow"]))
+    if not room_data.get("required"):
+        return str(flow)
+    return f"{flow:g} / {room_data['required']:g}"
+
+
+def _floor_name(summary_data, floor_index):
+    for floor_totals in summary_data.get("floors", []):
+        if floor_totals["floor_index"] == floor_index:
+            return floor_totals["floor_name"]
+    return f"Étage {floor_index}"
+
+
+def build_report_pages(summary_data, floors=None, project_name="Projet", processes=None):
+    """
+    Lay out the report pages.
+
+    Args:
+        summary_data: collect_summary_data() payload, with report=True
+        floors: the Floor objects, to add the plans; None to skip them
+        project_name: shown in the footer
+        processes: passed to plan_renderer.render_building()
+    """
+    summary = compute_summary(summary_data)
+    subtitle = f"{project_name} - {datetime.now().strftime('%d/%m/%Y %H:%M')}"
+    builder = ReportBuilder("Bilan Aéraulique", subtitle)
+
+    builder.heading("Statistiques de ventilation")
+    builder.line("Nombre total de bouches :", str(summary["total_vents"]))
+    for function, name in VENT_TYPE_NAMES.items():
+        builder.line(f"{name} :", str(summary["category_counts"][function]))
+    builder.line("Débit total insufflé :", f"{summary['total_inflow']} m³/h")
+    builder.line("Débit total extrait :", f"{summary['total_outflow']} m³/h")
+    balance = summary["total_inflow"] - summary["total_outflow"]
+    builder.line("Équilibre insufflation - extraction :", f"{balance:+} m³/h")
+
+    builder.heading("Indicateurs techniques")
+    builder.line("Plenums Simple Flux :", str(summary["plenum_simple_count"]))
+    builder.line("Plenums Double Flux :", str(summary["plenum_double_count"]))
+    builder.line("Surface totale des plenums :", f"{summary['plenum_total_area']:.2f} m²")
+    builder.line("Volume total des plenums :", f"{summary['plenum_total_volume']:.2f} m³")
+    if summary["rah"] is None:
+        builder.line("Renouvellement d'air par heure (RAH) :", "N/A")
+        builder.line("Conformité aux normes :", "N/A")
+    else:
+        builder.line("Renouvellement d'air par heure (RAH) :", f"{summary['rah']:.2f}")
+        builder.line("RAH recommandé (résidentiel) :", f"{RAH_MINIMUM:.2f}".replace(".", ",") + " min.")
+        if summary["rah_compliant"]:
+            builder.line("Conformité aux normes :", "Conforme", color="green")
+        else:
+            builder.line("Conformité aux normes :", "Non conforme", color="red")
+
+    # One table per floor, in floor order
+    vents_by_floor = {}
+    for vent_data in summary_data.get("vents", []):
+        vents_by_floor.setdefault((vent_data["floor_index"], vent_data["floor_name"]), []).append(vent_data)
+    rooms_by_floor = {}
+    for room_data in summary_data.get("rooms", []):
+        rooms_by_floor.setdefault((room_data["floor_index"], room_data["floor_name"]), []).append(room_data)
+
+    columns = [("Nom", 330), ("Type", 400), ("Diamètre (mm)", 180), ("Débit (m³/h)", 150)]
+    # Running totals of each floor, when the payload carries them
+    floor_totals = {f["floor_index"]: f for f in summary_data.get("floors", [])}
+    room_columns = [("Pièce", 150), ("Type", 260), ("Surface (m²)", 180), ("Volume (m³)", 170),
+                    ("Débit / requis", 190), ("RAH", 110)]
+    for index, floor_name in sorted(set(vents_by_floor) | set(rooms_by_floor)):
+        vents = vents_by_floor.get((index, floor_name), [])
+        rooms = rooms_by_floor.get((index, floor_name), [])
+        builder.heading(f"Étage : {floor_name}")
+        if rooms:
+            builder.table(room_columns, [(r["name"], r.get("type_name", ""), f"{r['area']:.2f}",
+                                          f"{r['volume']:.2f}", _room_flow_text(r),
+                                          "N/A" if r["rah"] is None else f"{r['rah']:.2f}")
+                                         for r in rooms])
+            under_ventilated = [r["name"] for r in rooms if not r.get("compliant", True)]
+            if under_ventilated:
+                builder.line("Pièces sous-ventilées :", ", ".join(under_ventilated), color="red")
+            else:
+                builder.line("Pièces sous-ventilées :", "Aucune", color="green")
+        if not vents:
+            continue
+        builder.table(columns, [(v.get("name", ""), VENT_TYPE_NAMES.get(v.get("function"), ""),
+                                 format_quantity(v.get("diameter")), format_quantity(v.get("flow_rate")))
+                                for v in vents])
+        totals = floor_totals.get(index)
+        if totals is not None:
+            inflow, outflow = totals["total_inflow"], totals["total_outflow"]
+        else:
+            inflow = sum(known(v.get("flow_rate")) for v in vents if v.get("function") in INFLOW_FUNCTIONS)
+            outflow = sum(known(v.get("flow_rate")) for v in vents if v.get("function") in OUTFLOW_FUNCTIONS)
+        builder.line("Insufflé / extrait :", f"{inflow} / {outflow} m³/h")
+
+    networks = summary_data.get("networks", [])
+    if networks:
+        builder.heading("Réseaux de gaines")
+        network_columns = [("Plénum", 240), ("Réseau", 170), ("Débit (m³/h)", 160),
+                           ("Max. (m³/h)", 150), ("Pression (Pa)", 170), ("Vitesse max.", 130)]
+        builder.table(network_columns, [
+            (f"{n['plenum_type'] or 'Plénum'} ({_floor_name(summary_data, n['floor_index'])})",
+             "Extraction" if n["kind"] == EXTRACTION else "Insufflation",
+             n["total_flow"], format_quantity(n["max_flow"]), f"{n['fan_pressure']:.0f}",
+             f"{n['max_velocity']:.1f} m/s")
+            for n in networks])
+        overloaded = [n for n in networks if not n["fan_capacity_ok"]]
+        if overloaded:
+            builder.line("Capacité des plénums :", "Dépassée", color="red")
+        else:
+            builder.line("Capacité des plénums :", "Suffisante", color="green")
+        noisy = [label for n in networks for label in n["noisy_branches"]]
+        if noisy:
+            builder.line("Piquages trop rapides :", str(len(noisy)), color="red")
+            for label in noisy:
+                builder.line("", label, color="red")
+
+    if floors:
+        for floor, image in zip(floors, plan_renderer.render_building(floors, processes=processes)):
+            builder.image_page(f"Plan : {floor.name}", image)
+
+    return builder.finish()
+
+
+def export_report(floors, path, project_name="Projet", plans=True, processes=None):
+    """Write the ventilation report of a project to a PDF file"""
+    summary_data = collect_summary_data(floors, report=True)
+    summary_data["networks"] = [network.to_dict() for network in project_networks(floors)]
+    pages = build_report_pages(summary_data, floors if plans else None, project_name, processes)
+    pages[0].save(path, save_all=True, append_images=pages[1:], resolution=RESOLUTION)
+    return path
@@ -0,0 +1,56 @@
+"""
+Memoized text measurement for the Tk interface.
+
+Widths are cached per (text, font), so the floor list and the summary
+tables measure each label once instead of on every redraw. Truncation
+searches the longest prefix that fits by bisection, reusing the cached
+prefix widths.
+
+Fonts are given as Tk font tuples, e.g. ("Helvetica", 12, "bold"), or
+as names of Tk fonts ("TkDefaultFont").
+A Tk root window must exist before the first call.
+"""
+import tkinter.font
+from functools import lru_cache
+
+ELLIPSIS = "..."
+
+
+@lru_cache(maxsize=None)
+def _font(font):
+    if isinstance(font, str):
+        return tkinter.font.nametofont(font)
+    family, size = font[0], font[1]
+    weight = font[2] if len(font) > 2 else "normal"
+    return tkinter.font.Font(family=family, size=size, weight=weight)
+
+
+@lru_cache(maxsize=16384)
+def text_width(text, font):
+    """Width in pixels of text drawn with font"""
+    return _font(font).measure(text)
+
+
+@lru_cache(maxsize=4096)
+def truncate(text, max_width, font):
+    """text, or its longest prefix followed by "..." that fits in max_width pixels"""
+    if text_width(text, font) <= max_width:
+        return text
+
+    room = max_width - text_width(ELLIPSIS, font)
+    # Longest prefix length n with width(text[:n]) <= room
+    low, high = 0, len(text) - 1
+    while low < high:
+        middle = (low + high + 1) // 2
+        if text_width(text[:middle], font) <= room:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low] + ELLIPSIS
+
+
+def column_width(texts, font, minimum=0, maximum=None, padding=16):
+    """Width of a table column that fits the widest of texts, within bounds"""
+    width = max((text_width(str(t), font) for t in texts), default=0) + padding
+    width = max(minimum, width)
+    return min(width, maximum) if maximum is not None else width